@@ -0,0 +1,377 @@
+"""Benchmarks for the pipeline and dashboard data paths on synthetic reviews.
+
+Every stage runs on reviews from synthetic.py (through a temporary CSV and
+Parquet table, never output/) and is timed and measured for peak resident
+memory: the highest RSS above the level at stage start, sampled from
+/proc/self/statm (Linux only; LdaMulticore workers are separate processes
+and not counted). Results go to benchmarks/results/bench_{rows}.json and are
+compared with benchmarks/baselines/bench_{rows}.json; the run exits 1 when
+any stage is slower or uses more memory than the baseline allows.
+
+    python3 benchmarks/run_benchmarks.py                          # 10k rows
+    python3 benchmarks/run_benchmarks.py --rows 100000 1000000 --skip topics
+    python3 benchmarks/run_benchmarks.py --rows 10000 --update-baseline
+
+Baselines are machine-specific: regenerate them with --update-baseline on
+the machine that runs the comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from importlib.metadata import PackageNotFoundError, version as package_version
+from pathlib import Path
+
+import folium
+import numpy as np
+from gensim import corpora
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCH_DIR.parent
+for _sub in ("scripts", "dashboard"):
+    if str(BASE_DIR / _sub) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR / _sub))
+from artifact_store import atomic_write, read_reviews, write_reviews_table  # noqa: E402
+from data_layer import build_topic_geo, read_dashboard_reviews, search_rows  # noqa: E402
+from filter_index import FilterIndex  # noqa: E402
+from geo_pyramid import build_pyramid, query_cells  # noqa: E402
+from map_layers import (  # noqa: E402
+    aggregate_places, aggregate_topic_places, cell_popups, clip_to_viewport, estimate_bounds,
+    fast_marker_layer, place_popups, topic_colors, topic_place_popups, viewport,
+)
+from place_keywords import SOURCE_COLS as KEYWORD_COLS, build_keywords, update_keywords  # noqa: E402
+from precompute_topics import (  # noqa: E402
+    KEEP_N, NO_ABOVE, doc_topic_matrix, dominant_topics_df, prepare_texts, topics_to_df, train_lda,
+)
+from review_cube import (  # noqa: E402
+    build_cube, rating_counts, sentiment_hist, sentiment_stats, slice_cube, summary, top_places,
+)
+from review_search import build_index, load_index, query_terms, save_index, search  # noqa: E402
+from synthetic import generate_reviews  # noqa: E402
+from tracing import rss_mb  # noqa: E402
+
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINES_DIR = BENCH_DIR / "baselines"
+DEFAULT_ROWS = [10_000]
+
+# A stage fails when it is this much slower / larger than its baseline...
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+# ...and the difference is above these floors (timer noise, allocator slack)
+MIN_SECONDS = 0.05
+MIN_MB = 16.0
+SAMPLE_INTERVAL = 0.002
+
+# Sidebar filter combinations: (langs, rating range, primary types, place query)
+FILTER_QUERIES = [
+    (["en", "pt"], (1.0, 5.0), None, ""),
+    (["en"], (4.0, 5.0), None, ""),
+    (["pt"], (1.0, 3.0), ["restaurant", "cafe", "bar"], ""),
+    (["en", "pt"], (1.0, 5.0), None, "café"),
+]
+# Dashboard map defaults (app.py)
+MAP_CENTER = [40.6405, -8.6538]
+MAP_ZOOM = 13
+MAP_WIDTH, MAP_HEIGHT = 1200, 550
+CLUSTER_DISABLE_ZOOM = 16
+HEATMAP_ZOOMS = [11, 13, 15, 17]
+# Review text searches, run against both languages
+SEARCH_QUERIES = ["parking", "ovos moles", "preço caro", "friendly staff"]
+# Share of places that gain a review in the incremental keyword stage (1 in N)
+KEYWORD_UPDATE_EVERY = 100
+TOPIC_LANG = "pt"
+TOPIC_COUNT = 5
+MIN_WORD_FREQ = 2
+
+
+# ---------- Measurement ----------
+class PeakRSS:
+    """Samples RSS in a background thread while the block runs."""
+
+    def __enter__(self):
+        self.start = rss_mb()
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = None
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, rss_mb() or 0.0)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, rss_mb() or 0.0)
+
+    @property
+    def delta_mb(self):
+        return None if self.start is None else self.peak - self.start
+
+
+# ---------- Stages ----------
+# Each stage reads and extends the shared context dict.
+def stage_generate(ctx):
+    ctx["reviews"] = generate_reviews(ctx["rows"], ctx["seed"])
+
+
+def stage_write_csv(ctx):
+    ctx.pop("reviews").to_csv(ctx["csv"], index=False)
+
+
+def stage_reviews_table(ctx):
+    write_reviews_table(ctx["csv"], ctx["parquet"])
+
+
+def stage_load(ctx):
+    ctx["df"] = read_dashboard_reviews(ctx["csv"], ctx["parquet"])
+
+
+def stage_filter_index(ctx):
+    ctx["index"] = FilterIndex(ctx["df"])
+
+
+def stage_filter_query(ctx):
+    for query in FILTER_QUERIES:
+        rows, _ = ctx["index"].query(*query)
+        ctx["df"].iloc[rows]
+
+
+def stage_cube_build(ctx):
+    ctx["cube"] = build_cube(ctx["df"])
+
+
+def stage_cube_query(ctx):
+    for langs, rating_range, ptypes, _ in FILTER_QUERIES:
+        cube = slice_cube(ctx["cube"], langs, rating_range, ptypes)
+        summary(cube)
+        rating_counts(cube)
+        top_places(cube)
+        for lang_code in ("en", "pt"):
+            sentiment_stats(cube, lang_code)
+            sentiment_hist(cube, lang_code)
+
+
+def stage_pyramid_build(ctx):
+    ctx["pyramid"] = build_pyramid(ctx["df"])
+
+
+def stage_heatmap_query(ctx):
+    for zoom in HEATMAP_ZOOMS:
+        for query in FILTER_QUERIES:
+            cell_popups(query_cells(ctx["pyramid"], zoom, *query))
+
+
+def render_places(places, colors, popups):
+    view = viewport(estimate_bounds(MAP_CENTER, MAP_ZOOM, MAP_WIDTH, MAP_HEIGHT))
+    inside = clip_to_viewport(places, view).index
+    # No tile layer: tiles load in the browser and do not affect the cost here
+    m = folium.Map(location=MAP_CENTER, zoom_start=MAP_ZOOM, tiles=None)
+    fast_marker_layer(
+        places.loc[inside], colors[places.index.get_indexer(inside)], popups.loc[inside], name="Places",
+        disable_clustering_at_zoom=CLUSTER_DISABLE_ZOOM,
+    ).add_to(m)
+    m.get_root().render()
+
+
+def stage_markers(ctx):
+    places = aggregate_places(ctx["df"])
+    render_places(places, np.full(len(places), "#3186cc"), place_popups(places))
+
+
+def stage_keywords_build(ctx):
+    ctx["keywords"], ctx["vocab"] = build_keywords(read_reviews(KEYWORD_COLS, ctx["parquet"]))
+
+
+def stage_keywords_update(ctx):
+    # Every KEYWORD_UPDATE_EVERY-th place gains a copy of its first review
+    df = read_reviews(KEYWORD_COLS, ctx["parquet"])
+    first = np.flatnonzero(~df["place_id"].duplicated().to_numpy())[::KEYWORD_UPDATE_EVERY]
+    update_keywords(df.iloc[np.concatenate([np.arange(len(df)), first])], ctx["keywords"], ctx["vocab"])
+
+
+def stage_search_build(ctx):
+    df = read_reviews(["lang", "text_processed"], ctx["parquet"])
+    root = ctx["parquet"].parent / "search"
+    for lang_code in ("en", "pt"):
+        save_index(build_index(df.loc[df["lang"].eq(lang_code), "text_processed"]), lang_code, root)
+    ctx["search"] = {lang_code: load_index(lang_code, root) for lang_code in ("en", "pt")}
+
+
+def stage_search_query(ctx):
+    for query in SEARCH_QUERIES:
+        for lang_code, index in ctx["search"].items():
+            search_rows(ctx["df"], lang_code, *search(index, query_terms(index, query, lang_code)))
+
+
+def stage_topic_corpus(ctx):
+    df = read_reviews(["lang", "text_processed"], ctx["parquet"])
+    texts = prepare_texts(df[df["lang"].eq(TOPIC_LANG)])
+    dictionary = corpora.Dictionary(texts)
+    dictionary.filter_extremes(no_below=MIN_WORD_FREQ, no_above=NO_ABOVE, keep_n=KEEP_N)
+    ctx["dictionary"] = dictionary
+    ctx["corpus"] = [dictionary.doc2bow(text) for text in texts]
+
+
+def stage_topic_train(ctx):
+    ctx["lda"] = train_lda(ctx["corpus"], ctx["dictionary"], TOPIC_COUNT, ctx["passes"])
+
+
+def stage_topic_assign(ctx):
+    ctx["assign"] = dominant_topics_df(doc_topic_matrix(ctx["corpus"], ctx["lda"]))
+    ctx["topics"] = topics_to_df(ctx["lda"])
+
+
+def stage_topic_view(ctx):
+    merged = build_topic_geo(ctx["df"], ctx["assign"], ctx["topics"], TOPIC_LANG)
+    places = aggregate_topic_places(merged)
+    render_places(places, topic_colors(places["topic_id"]), topic_place_popups(places))
+
+
+# (group, stage, fn); the "data" group always runs, the others can be skipped
+STAGES = [
+    ("data", "generate", stage_generate),
+    ("data", "write csv", stage_write_csv),
+    ("data", "reviews table", stage_reviews_table),
+    ("data", "load data", stage_load),
+    ("filters", "filter index", stage_filter_index),
+    ("filters", "filter query", stage_filter_query),
+    ("cube", "cube build", stage_cube_build),
+    ("cube", "cube query", stage_cube_query),
+    ("pyramid", "pyramid build", stage_pyramid_build),
+    ("pyramid", "heatmap query", stage_heatmap_query),
+    ("markers", "markers", stage_markers),
+    ("keywords", "keyword build", stage_keywords_build),
+    ("keywords", "keyword update", stage_keywords_update),
+    ("search", "search build", stage_search_build),
+    ("search", "search query", stage_search_query),
+    ("topics", "topic corpus", stage_topic_corpus),
+    ("topics", "topic train", stage_topic_train),
+    ("topics", "topic assign", stage_topic_assign),
+    ("topics", "topic view", stage_topic_view),
+]
+SKIPPABLE = sorted({group for group, _, _ in STAGES} - {"data"})
+
+
+def environment() -> dict:
+    versions = {}
+    for dist in ("numpy", "pandas", "pyarrow", "gensim", "folium", "scikit-learn"):
+        try:
+            versions[dist] = package_version(dist)
+        except PackageNotFoundError:
+            versions[dist] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+def run_size(rows: int, seed: int, passes: int, skip: list) -> dict:
+    stages = {}
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        ctx = {"rows": rows, "seed": seed, "passes": passes,
+               "csv": Path(tmp) / "reviews_enriched.csv", "parquet": Path(tmp) / "reviews.parquet"}
+        for group, name, fn in STAGES:
+            if group in skip:
+                continue
+            gc.collect()
+            with PeakRSS() as mem:
+                t0 = time.perf_counter()
+                fn(ctx)
+                seconds = time.perf_counter() - t0
+            stages[name] = {
+                "seconds": round(seconds, 4),
+                "peak_mb": None if mem.delta_mb is None else round(mem.delta_mb, 1),
+                "rss_mb": None if mem.peak is None else round(mem.peak, 1),
+            }
+            peak = "n/a" if mem.delta_mb is None else f"{mem.delta_mb:,.1f} MB"
+            print(f"  {name:<14} {seconds:9.3f}s  +{peak}")
+    return {
+        "rows": rows,
+        "seed": seed,
+        "passes": passes,
+        "skipped": sorted(skip),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "stages": stages,
+    }
+
+
+# ---------- Baselines ----------
+def compare(result: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list:
+    """Regression messages for stages that exceed their baseline; [] if none."""
+    failures = []
+    for name, cur in result["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+        if (cur["seconds"] > base["seconds"] * (1 + time_tolerance)
+                and cur["seconds"] - base["seconds"] > MIN_SECONDS):
+            failures.append(f"{name}: {cur['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+        if cur["peak_mb"] is not None and base["peak_mb"] is not None:
+            if (cur["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance)
+                    and cur["peak_mb"] - base["peak_mb"] > MIN_MB):
+                failures.append(f"{name}: +{cur['peak_mb']:,.1f} MB vs baseline +{base['peak_mb']:,.1f} MB")
+    return failures
+
+
+def write_json(path: Path, data: dict) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return atomic_write(path, lambda p: p.write_text(json.dumps(data, indent=2) + "\n"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline and dashboard stages on synthetic reviews")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="Dataset sizes to run (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed (default: 0)")
+    parser.add_argument("--passes", type=int, default=2, help="LDA passes in the topic stages (default: 2)")
+    parser.add_argument("--skip", nargs="+", choices=SKIPPABLE, default=[], help="Stage groups to leave out")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run as the baseline instead of comparing")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help=f"Allowed slowdown as a fraction of the baseline (default: {TIME_TOLERANCE})")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE,
+                        help=f"Allowed peak memory growth as a fraction (default: {MEMORY_TOLERANCE})")
+    args = parser.parse_args()
+
+    regressions = []
+    for rows in args.rows:
+        print(f"{rows:,} rows")
+        result = run_size(rows, args.seed, args.passes, args.skip)
+        name = f"bench_{rows}.json"
+        print(f"✓ Saved results -> {write_json(RESULTS_DIR / name, result)}")
+
+        if args.update_baseline:
+            print(f"✓ Saved baseline -> {write_json(BASELINES_DIR / name, result)}")
+            continue
+        baseline_path = BASELINES_DIR / name
+        if not baseline_path.exists():
+            print(f"  No baseline for {rows:,} rows ({baseline_path.name}); run with --update-baseline")
+            continue
+        failures = compare(result, json.loads(baseline_path.read_text()), args.time_tolerance,
+                           args.memory_tolerance)
+        for failure in failures:
+            print(f"  REGRESSION {failure}")
+        if not failures:
+            print(f"✓ Within baseline ({baseline_path.name})")
+        regressions += failures
+
+    if regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Synthetic reviews in the reviews_raw.csv / reviews_enriched.csv schema, at any scale.
+
+- places are clustered around Aveiro neighbourhoods (centre, university,
+  Barra, Costa Nova, Ílhavo, ...), with primary types drawn from the type
+  frequencies of the real data and about REVIEWS_PER_PLACE reviews each
+- reviews are ~53% Portuguese / 47% English; tokens mix one to two
+  language-specific themes (food, service, price, ...) with Zipf-distributed
+  words plus a long tail of rare words, and review lengths are log-normal
+  (median ~15 tokens, as in the real text_processed)
+- ratings follow a per-place quality and sentiment_compound follows the rating
+
+Run as a script to write a CSV:
+    python3 benchmarks/synthetic.py --rows 100000 --output /tmp/reviews_enriched.csv
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REVIEWS_PER_PLACE = 5.0
+PT_SHARE = 0.53
+
+# (lat, lon, spread in degrees, weight)
+AVEIRO_CLUSTERS = [
+    (40.6405, -8.6538, 0.004, 0.35),  # city centre
+    (40.6443, -8.6455, 0.003, 0.15),  # Beira Mar / station
+    (40.6303, -8.6575, 0.003, 0.12),  # university
+    (40.6420, -8.7470, 0.004, 0.08),  # Barra
+    (40.6130, -8.7510, 0.004, 0.08),  # Costa Nova
+    (40.6000, -8.6667, 0.006, 0.10),  # Ílhavo
+    (40.6260, -8.7200, 0.005, 0.07),  # Gafanha da Nazaré
+    (40.6600, -8.6100, 0.012, 0.05),  # Esgueira / outskirts
+]
+
+PLACE_TYPES = {
+    "restaurant": 568, "store": 316, "bakery": 254, "hair_salon": 181, "beauty_salon": 168,
+    "health": 161, "lodging": 140, "bar": 123, "real_estate_agency": 117, "cafe": 100,
+    "consultant": 98, "pharmacy": 93, "clothing_store": 92, "barber_shop": 89, "hotel": 83,
+    "beautician": 73, "supermarket": 69, "bank": 62, "home_goods_store": 61, "coffee_shop": 61,
+    "food_store": 60, "pizza_restaurant": 59, "grocery_store": 58, "laundry": 54, "dentist": 44,
+}
+AMENITY_TYPES = {"restaurant", "bar", "cafe", "pharmacy", "bank", "dentist", "coffee_shop", "pizza_restaurant"}
+
+NAME_PREFIXES = ["Café", "Restaurante", "Casa", "Loja", "Pastelaria", "Hotel", "Clínica", "Salão",
+                 "Bar", "Farmácia", "Mercearia", "Studio", "O Cantinho", "Tasca", "A Marisqueira"]
+NAME_WORDS = ["Central", "Aveiro", "Ria", "do Mar", "Moliceiro", "Avenida", "Sal", "Ovos Moles",
+              "Barra", "Costa Nova", "Beira Mar", "Rossio", "Santa Joana", "Alboi", "Glicínias"]
+FIRST_NAMES = ["Ana", "João", "Maria", "Rui", "Inês", "Pedro", "Sofia", "Tiago", "Carla", "Miguel",
+               "Emma", "Lucas", "Olivia", "Noah", "Hannah", "David", "Laura", "Paul", "Sara", "Jorge"]
+LAST_NAMES = ["Silva", "Santos", "Ferreira", "Pereira", "Oliveira", "Costa", "Rodrigues", "Sousa",
+              "Smith", "Müller", "Martin", "Brown", "Garcia", "Rossi", "Nascimento", "Almeida"]
+
+THEMES = {
+    "en": {
+        "food": ["food", "delicious", "fish", "dessert", "menu", "tasty", "portion", "fresh", "dish", "ovos", "moles", "seafood"],
+        "service": ["service", "staff", "friendly", "waiter", "attentive", "helpful", "rude", "slow", "welcoming", "owner", "polite", "quick"],
+        "price": ["price", "cheap", "expensive", "value", "money", "worth", "bill", "cost", "affordable", "overpriced", "deal", "pay"],
+        "place": ["place", "nice", "clean", "cozy", "view", "terrace", "canal", "location", "quiet", "small", "decor", "atmosphere"],
+        "stay": ["room", "hotel", "bed", "breakfast", "stay", "comfortable", "night", "reception", "shower", "spacious", "parking", "check"],
+        "care": ["doctor", "appointment", "professional", "treatment", "haircut", "salon", "pharmacy", "care", "recommend", "team", "result", "visit"],
+    },
+    "pt": {
+        "food": ["comida", "boa", "peixe", "sobremesa", "prato", "saboroso", "dose", "fresco", "bacalhau", "ovos", "moles", "marisco"],
+        "service": ["atendimento", "simpático", "funcionários", "empregado", "atencioso", "rápido", "demorado", "staff", "acolhedor", "dono", "educado", "serviço"],
+        "price": ["preço", "barato", "caro", "qualidade", "dinheiro", "conta", "justo", "acessível", "valor", "pagar", "promoção", "custo"],
+        "place": ["espaço", "bonito", "limpo", "agradável", "vista", "esplanada", "canal", "localização", "calmo", "pequeno", "ambiente", "decoração"],
+        "stay": ["quarto", "hotel", "cama", "pequeno", "almoço", "estadia", "confortável", "noite", "receção", "duche", "estacionamento", "limpeza"],
+        "care": ["médico", "consulta", "profissional", "tratamento", "corte", "cabelo", "farmácia", "cuidado", "recomendo", "equipa", "resultado", "excelente"],
+    },
+}
+TAIL_WORDS = 3000
+SYLLABLES = {
+    "en": ["ta", "ble", "ri", "ver", "son", "ly", "ing", "mo", "der", "ka", "fe", "nor", "wi", "th", "ex"],
+    "pt": ["ça", "ão", "ri", "lha", "nho", "te", "mos", "ca", "ção", "dei", "ra", "vo", "gu", "es", "pe"],
+}
+# Token sources: dominant theme, secondary theme, long tail
+SOURCE_P = [0.6, 0.25, 0.15]
+
+RAW_COLS = [
+    "place_id", "place_name", "place_rating", "place_primary_type", "place_location", "author_name",
+    "rating", "review_text", "publish_time", "poi_row_index", "poi_gid", "poi_amenity", "poi_shop",
+    "poi_tourism", "poi_name", "lat", "lon",
+]
+ENRICHED_COLS = RAW_COLS + ["review_text_clean", "lang", "tokens", "token_count", "text_processed",
+                            "sentiment_compound"]
+
+
+def zipf_p(n: int, s: float = 1.1) -> np.ndarray:
+    p = 1.0 / np.arange(1, n + 1) ** s
+    return p / p.sum()
+
+
+def vocabulary(lang: str, rng: np.random.Generator) -> np.ndarray:
+    """Theme words (theme-major) followed by TAIL_WORDS pseudo-words."""
+    themes = [w for words in THEMES[lang].values() for w in words]
+    syl = np.asarray(SYLLABLES[lang])
+    tail, seen = [], set(themes)
+    while len(tail) < TAIL_WORDS:
+        word = "".join(rng.choice(syl, rng.integers(2, 5)))
+        if word not in seen:
+            seen.add(word)
+            tail.append(word)
+    return np.asarray(themes + tail, dtype=object)
+
+
+def token_docs(lang_codes: np.ndarray, rng: np.random.Generator) -> tuple:
+    """(per-review token lists, lengths) for an array of "en"/"pt" codes."""
+    n = len(lang_codes)
+    vocabs = {lang: vocabulary(lang, rng) for lang in ("en", "pt")}
+    n_themes = len(THEMES["en"])
+    theme_size = len(THEMES["en"]["food"])
+    offset = {"en": 0, "pt": len(vocabs["en"])}
+    words = np.concatenate([vocabs["en"], vocabs["pt"]])
+
+    lengths = np.clip(rng.lognormal(2.7, 0.8, n), 1, 350).astype(np.int64)
+    doc = np.repeat(np.arange(n), lengths)
+    t1 = rng.integers(0, n_themes, n)
+    t2 = rng.integers(0, n_themes, n)
+    source = rng.choice(3, len(doc), p=SOURCE_P)
+    theme = np.where(source == 0, t1[doc], t2[doc])
+    ids = np.where(
+        source < 2,
+        theme * theme_size + rng.choice(theme_size, len(doc), p=zipf_p(theme_size)),
+        n_themes * theme_size + rng.choice(TAIL_WORDS, len(doc), p=zipf_p(TAIL_WORDS)),
+    )
+    ids += np.where(lang_codes == "pt", offset["pt"], offset["en"])[doc]
+    docs = np.split(words[ids], np.cumsum(lengths)[:-1])
+    return docs, lengths
+
+
+def generate_reviews(n_rows: int, seed: int = 0, reviews_per_place: float = REVIEWS_PER_PLACE) -> pd.DataFrame:
+    """`n_rows` synthetic enriched reviews (ENRICHED_COLS), grouped by place like a fetch."""
+    rng = np.random.default_rng(seed)
+    n_places = max(1, int(round(n_rows / reviews_per_place)))
+
+    # Places
+    clusters = np.asarray([c[:3] for c in AVEIRO_CLUSTERS])
+    weights = np.asarray([c[3] for c in AVEIRO_CLUSTERS])
+    cluster = rng.choice(len(clusters), n_places, p=weights / weights.sum())
+    p_lat = clusters[cluster, 0] + rng.normal(0, 1, n_places) * clusters[cluster, 2]
+    p_lon = clusters[cluster, 1] + rng.normal(0, 1, n_places) * clusters[cluster, 2] * 1.3
+    types = np.asarray(list(PLACE_TYPES))
+    type_w = np.asarray(list(PLACE_TYPES.values()), dtype=np.float64)
+    p_type = rng.choice(types, n_places, p=type_w / type_w.sum())
+    quality = np.clip(rng.normal(4.1, 0.6, n_places), 1.0, 5.0)
+    prefix = rng.choice(NAME_PREFIXES, n_places)
+    word = rng.choice(NAME_WORDS, n_places)
+    p_name = np.asarray([f"{a} {b} {i}" for i, (a, b) in enumerate(zip(prefix, word))], dtype=object)
+    p_id = np.asarray([f"syn{i:08x}" for i in range(n_places)], dtype=object)
+    p_loc = np.asarray([f"{{'latitude': {a}, 'longitude': {b}}}" for a, b in zip(p_lat, p_lon)], dtype=object)
+
+    # Reviews, grouped by place as the fetch writes them
+    place = np.sort(rng.integers(0, n_places, n_rows))
+    lang = np.where(rng.random(n_rows) < PT_SHARE, "pt", "en")
+    rating = np.clip(np.rint(quality[place] + rng.normal(0, 1.0, n_rows)), 1, 5).astype(np.int64)
+    sentiment = np.tanh(0.9 * (rating - 3) + rng.normal(0, 0.5, n_rows))
+    docs, lengths = token_docs(lang, rng)
+    processed = [" ".join(d) for d in docs]
+    seconds = rng.integers(1_420_070_400, 1_760_000_000, n_rows)  # 2015 .. 2025
+    author = (pd.Series(rng.choice(FIRST_NAMES, n_rows)) + " " + rng.choice(LAST_NAMES, n_rows)).to_numpy()
+
+    df = pd.DataFrame({
+        "place_id": p_id[place],
+        "place_name": p_name[place],
+        "place_rating": np.round(quality[place], 1),
+        "place_primary_type": p_type[place],
+        "place_location": p_loc[place],
+        "author_name": author,
+        "rating": rating,
+        "review_text": [t.capitalize() + "." for t in processed],
+        "publish_time": pd.to_datetime(seconds, unit="s").strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "poi_row_index": place,
+        "poi_gid": 10_000 + place,
+        "poi_amenity": np.where(np.isin(p_type[place], list(AMENITY_TYPES)), p_type[place], None),
+        "poi_shop": np.where(np.char.endswith(p_type[place].astype(str), "store"), p_type[place], None),
+        "poi_tourism": np.where(np.isin(p_type[place], ["hotel", "lodging"]), p_type[place], None),
+        "poi_name": p_name[place],
+        "lat": p_lat[place],
+        "lon": p_lon[place],
+        "review_text_clean": processed,
+        "lang": lang,
+        "tokens": ["['" + "', '".join(d) + "']" for d in docs],
+        "token_count": lengths,
+        "text_processed": processed,
+        "sentiment_compound": np.round(sentiment, 4),
+    })
+    return df[ENRICHED_COLS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic reviews in the pipeline's CSV schema")
+    parser.add_argument("--rows", type=int, default=100_000, help="Reviews to generate (default: 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--reviews-per-place", type=float, default=REVIEWS_PER_PLACE,
+                        help=f"Mean reviews per place (default: {REVIEWS_PER_PLACE})")
+    parser.add_argument("--raw", action="store_true", help="Only the reviews_raw.csv columns")
+    parser.add_argument("--output", type=Path, required=True, help="CSV to write")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    df = generate_reviews(args.rows, args.seed, args.reviews_per_place)
+    if args.raw:
+        df = df[RAW_COLS]
+    df.to_csv(args.output, index=False)
+    print(f"✓ Saved {len(df):,} synthetic reviews ({df['place_id'].nunique():,} places) -> {args.output}")
+    print(f"  ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,62 @@
 """Streamlit dashboard for Aveiro POI reviews.
 Run with: streamlit run dashboard/app.py (from Milestone_3 directory).
 """
+import json
+import sys
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 from streamlit_folium import st_folium
 import folium
 from folium import plugins
-from pathlib import Path
 
 # ---------- Config ----------
 BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_PATH = BASE_DIR / "output" / "reviews_enriched.csv"
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from artifact_store import (  # noqa: E402
+    PLACE_KEYWORDS, REVIEWS_PARQUET, TOPICS_MANIFEST, keywords_stale, read_place_keywords,
+)
+from geo_pyramid import (  # noqa: E402
+    MAX_LEVEL, MIN_LEVEL, PYRAMID_PATH, build_pyramid, load_pyramid, pyramid_stale, query_cells,
+)
+from review_cube import (  # noqa: E402
+    CUBE_PATH, SENTIMENT_EDGES, build_cube, cube_stale, load_cube, rating_counts,
+    sentiment_hist, sentiment_stats, slice_cube, summary, top_places,
+)
+from artifact_cache import ArtifactCache, file_stamp  # noqa: E402
+from data_layer import (  # noqa: E402
+    DATA_PATH, OUTPUT_DIR, assignment_sources, build_topic_geo, doc_topics_path, read_assignment_context,
+    read_dashboard_reviews, read_doc_topics, read_topic_ids, read_topic_search, read_topics, scan_topic_counts,
+    search_rows, topics_path,
+)
+from filter_index import FilterIndex  # noqa: E402
+from review_search import SEARCH_DIR, index_stale, load_index, query_terms, search  # noqa: E402
+from tracing import Tracer, chrome_trace, span  # noqa: E402
+from map_layers import (  # noqa: E402
+    aggregate_places, aggregate_topic_places, attach_keywords, cell_popups, clicked_place, clip_to_viewport,
+    estimate_bounds, fast_marker_layer, place_popups, topic_colors,
+    topic_place_popups, view_covers, viewport,
+)
+
+# Max (language, topics) artifacts kept in memory across reruns
+ARTIFACT_CACHE_SIZE = 32
 MAP_ZOOM_DEFAULT = 13
 # Show individual markers when zoomed in far enough so clusters don't hide points
 CLUSTER_DISABLE_ZOOM = 16
+MAP_WIDTH, MAP_HEIGHT = 1200, 550
+MAP_KEY = "reviews_map"
+# Last view (bounds/center/zoom) reported by the map, kept across reruns
+MAP_STATE_KEY = "map_view_state"
+# Spans of recent reruns, exported by the "Rerun timings" panel
+TRACE_STATE_KEY = "rerun_traces"
+TRACE_RERUNS = 20
+# Rows shown in the ranked review search table
+SEARCH_RESULTS = 50
 
 
 def rating_color(rating: float) -> str:
@@ -35,30 +74,121 @@ def rating_color(rating: float) -> str:
     return "#f44336"       # red
 
 st.set_page_config(page_title="Aveiro POI Reviews", layout="wide")
+# Timing spans of this rerun (sidebar "Rerun timings"); stage() starts the next top-level step
+tracer = Tracer().activate()
+
+
+def record_trace():
+    """End the open stage and keep this rerun's spans (last TRACE_RERUNS reruns)."""
+    tracer.end_stage()
+    history = st.session_state.setdefault(TRACE_STATE_KEY, [])
+    history.append(tracer.spans)
+    del history[:-TRACE_RERUNS]
+    return history
+
+
+def timings_panel():
+    """Record this rerun's spans and draw the sidebar "Rerun timings" panel."""
+    traces = record_trace()
+    with st.sidebar.expander("Rerun timings"):
+        st.caption(f"This rerun: {tracer.elapsed() * 1000:,.0f} ms (wall time, CPU time, RSS change per step)")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "step": "· " * s["depth"] + s["name"],
+                    "wall ms": round(s["wall"] * 1000, 1),
+                    "cpu ms": round(s["cpu"] * 1000, 1),
+                    "RSS Δ MB": None if s["rss_delta_mb"] is None else round(s["rss_delta_mb"], 1),
+                }
+                for s in tracer.ordered()
+            ]),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.download_button(
+            "Download Chrome trace",
+            json.dumps(chrome_trace([s for spans in traces for s in spans])),
+            file_name="dashboard_trace.json",
+            mime="application/json",
+            help=f"Spans of the last {len(traces)} reruns; open in chrome://tracing or ui.perfetto.dev",
+        )
+
+
+def stop():
+    """st.stop() that still records this rerun's spans and draws the timings panel."""
+    timings_panel()
+    st.stop()
 
 
 # ---------- Data ----------
-@st.cache_data(show_spinner=False)
-def load_data(path: Path) -> pd.DataFrame:
-    if not path.exists():
+@st.cache_resource(show_spinner=False)
+def load_data(path: Path, stamp: tuple = ()) -> tuple:
+    """Load reviews and build their filter index (shared, read-only across reruns).
+
+    `stamp` (file mtimes) only serves to invalidate the cache.
+    """
+    df = read_dashboard_reviews(path)
+    if df is None:
         st.error(f"Data file not found: {path}")
-        return pd.DataFrame()
-    df = pd.read_csv(path)
-    # Coerce numeric fields
-    df["rating"] = pd.to_numeric(df.get("rating"), errors="coerce")
-    df["sentiment_compound"] = pd.to_numeric(df.get("sentiment_compound"), errors="coerce")
-    # Drop rows without coordinates or names
-    df = df.dropna(subset=["lat", "lon", "place_name"])
-    return df
+        return pd.DataFrame(), None
+    with span("filter index"):
+        return df, FilterIndex(df)
+
+
+tracer.stage("load data")
+df, filter_index = load_data(DATA_PATH, file_stamp([DATA_PATH, REVIEWS_PARQUET]))
+tracer.end_stage()
 
 
-df = load_data(DATA_PATH)
+@st.cache_resource(show_spinner=False)
+def artifact_cache() -> ArtifactCache:
+    return ArtifactCache(maxsize=ARTIFACT_CACHE_SIZE)
+
+
+def load_review_cube() -> dict:
+    """Offline aggregate cube (scripts/review_cube.py); built in memory if missing or stale."""
+    def read():
+        if cube_stale():
+            return build_cube(df)
+        return load_cube()
+    return artifact_cache().get(("review_cube",), [CUBE_PATH, DATA_PATH, REVIEWS_PARQUET], read)
+
+
+def load_place_keywords() -> pd.Series:
+    """place_id -> top keywords (scripts/place_keywords.py); empty until that script has run."""
+    if PLACE_KEYWORDS.exists() and keywords_stale():
+        st.sidebar.caption("Place keywords are older than the review data; rerun scripts/place_keywords.py")
+    return artifact_cache().get(("place_keywords",), [PLACE_KEYWORDS], read_place_keywords)
+
+
+def load_search_index(lang_code: str) -> Optional[dict]:
+    """Memory-mapped review search index (scripts/review_search.py); None if missing or stale."""
+    def read():
+        return None if index_stale(lang_code) else load_index(lang_code)
+    paths = [SEARCH_DIR / lang_code / "meta.json", DATA_PATH, REVIEWS_PARQUET]
+    return artifact_cache().get(("search_index", lang_code), paths, read)
+
+
+def search_reviews(query: str, langs: list) -> Optional[pd.Series]:
+    """BM25 scores of matching reviews indexed by row position in df, best first; None without any index."""
+    hits = []
+    for code in langs:
+        index = load_search_index(code)
+        if index is None:
+            st.sidebar.caption(f"No up-to-date '{code}' search index; run scripts/review_search.py")
+            continue
+        terms = query_terms(index, query, code)
+        st.sidebar.caption(f"Searched '{code}' terms: {', '.join(terms) or '(none)'}")
+        hits.append(search_rows(df, code, *search(index, terms)))
+    if not hits:
+        return None
+    return pd.concat(hits).sort_values(ascending=False, kind="stable")
 
 st.title("Aveiro POI Reviews Dashboard")
 st.caption("Interactive exploration of Google reviews fetched for OSM POIs in Aveiro.")
 
 if df.empty:
-    st.stop()
+    stop()
 
 # ---------- Sidebar Filters ----------
 st.sidebar.header("Filters")
@@ -67,113 +197,149 @@ min_rating, max_rating = st.sidebar.slider("Rating range", 1.0, 5.0, (1.0, 5.0),
 ptype_opts = sorted([p for p in df["place_primary_type"].dropna().unique()])
 ptype_sel = st.sidebar.multiselect("Primary type", options=ptype_opts)
 place_query = st.sidebar.text_input("Search place name")
+review_query = st.sidebar.text_input(
+    "Search review text",
+    help="Ranked (BM25) search over the review words, e.g. parking or ovos moles; combines with the filters above",
+)
 
-filtered = df[df["lang"].isin(langs)]
-filtered = filtered[filtered["rating"].between(min_rating, max_rating)]
-if ptype_sel:
-    filtered = filtered[filtered["place_primary_type"].isin(ptype_sel)]
-if place_query:
-    filtered = filtered[filtered["place_name"].str.contains(place_query, case=False, na=False)]
+# Answered from the precomputed index; one row selection instead of a chain of masked copies
+tracer.stage("filter")
+search_hits = None
+if review_query:
+    with span("review search"):
+        search_hits = search_reviews(review_query, langs)
+filter_rows, filter_ms = filter_index.query(
+    langs, (min_rating, max_rating), ptype_sel, place_query,
+    None if search_hits is None else search_hits.index.to_numpy(),
+)
+filtered = df if len(filter_rows) == len(df) else df.iloc[filter_rows]
+with st.sidebar.expander("Filter timings"):
+    for name, ms in filter_ms.items():
+        st.caption(f"{name}: {ms:.2f} ms")
+
+# ---------- Aggregates ----------
+# Language, rating and type filters are cube dimensions; place and review searches
+# are not, so they aggregate the matching rows instead
+tracer.stage("aggregates")
+if place_query or search_hits is not None:
+    cube = build_cube(filtered)
+else:
+    cube = slice_cube(load_review_cube(), langs, (min_rating, max_rating), ptype_sel)
+kpis = summary(cube)
 
 # ---------- KPIs ----------
 st.subheader("Summary")
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("Reviews", len(filtered))
-col2.metric("Places", filtered["place_id"].nunique())
-col3.metric("Avg rating", round(filtered["rating"].mean(), 2) if len(filtered) else 0)
-col4.metric("% English", round(100 * filtered["lang"].eq("en").mean(), 1) if len(filtered) else 0)
+col1.metric("Reviews", kpis["reviews"])
+col2.metric("Places", kpis["places"])
+col3.metric("Avg rating", round(kpis["avg_rating"], 2) if kpis["reviews"] else 0)
+col4.metric("% English", round(kpis["pct_en"], 1) if kpis["reviews"] else 0)
 
 if filtered.empty:
     st.info("No data for current filters.")
-    st.stop()
+    stop()
+
+# ---------- Review Search ----------
+if search_hits is not None:
+    tracer.stage("search results")
+    st.markdown("### Review search results")
+    # Search scores of the filtered rows, which are in frame order
+    filtered = filtered.assign(score=search_hits.reindex(filter_rows).to_numpy())
+    ranked = filtered.sort_values("score", ascending=False, kind="stable")
+    st.caption(f"{len(ranked):,} reviews match \"{review_query}\" under the current filters "
+               f"(top {min(len(ranked), SEARCH_RESULTS)} by BM25 score; the map shows only matching reviews)")
+    st.dataframe(
+        ranked.head(SEARCH_RESULTS)[["score", "place_name", "lang", "rating", "review_text"]],
+        use_container_width=True,
+    )
 
 # ---------- Charts ----------
+tracer.stage("charts")
 st.markdown("### Ratings")
 st.plotly_chart(
-    px.histogram(filtered, x="rating", color="lang", nbins=20, marginal="box", title="Rating distribution"),
+    px.bar(
+        rating_counts(cube), x="rating", y="n_reviews", color="lang",
+        labels={"n_reviews": "count"}, title="Rating distribution",
+    ),
     use_container_width=True,
 )
 
 st.markdown("### Sentiment (English & Portuguese)")
-f_en = filtered[filtered["lang"].eq("en")].dropna(subset=["sentiment_compound"])
-f_pt = filtered[filtered["lang"].eq("pt")].dropna(subset=["sentiment_compound"])
-
-if len(f_en) > 0 or len(f_pt) > 0:
-    # Create sentiment comparison
-    sentiment_data = []
-    if len(f_en) > 0:
-        sentiment_data.extend([{"Sentiment": score, "Language": "English"} for score in f_en["sentiment_compound"]])
-    if len(f_pt) > 0:
-        sentiment_data.extend([{"Sentiment": score, "Language": "Portuguese"} for score in f_pt["sentiment_compound"]])
-    
-    if sentiment_data:
-        sentiment_df = pd.DataFrame(sentiment_data)
-        st.plotly_chart(
-            px.histogram(
-                sentiment_df,
-                x="Sentiment",
-                color="Language",
-                nbins=30,
-                title="Sentiment distribution (VADER for English, BERTweet-PT for Portuguese)",
-                barmode="overlay"
-            ),
-            use_container_width=True,
-        )
-    
+sent_langs = [("en", "English"), ("pt", "Portuguese")]
+sent_stats = {code: sentiment_stats(cube, code) for code, _ in sent_langs}
+
+if any(n > 0 for n, _, _ in sent_stats.values()):
+    # Pre-binned histograms from the cube, one trace per language
+    bin_centers = (SENTIMENT_EDGES[:-1] + SENTIMENT_EDGES[1:]) / 2
+    sentiment_df = pd.concat([
+        pd.DataFrame({"Sentiment": bin_centers, "count": sentiment_hist(cube, code), "Language": name})
+        for code, name in sent_langs if sent_stats[code][0] > 0
+    ])
+    st.plotly_chart(
+        px.bar(
+            sentiment_df,
+            x="Sentiment",
+            y="count",
+            color="Language",
+            title="Sentiment distribution (VADER for English, BERTweet-PT for Portuguese)",
+            barmode="overlay"
+        ),
+        use_container_width=True,
+    )
+
     # KPIs for sentiment
     col1, col2 = st.columns(2)
-    if len(f_en) > 0:
-        en_mean = f_en["sentiment_compound"].mean()
-        en_std = f_en["sentiment_compound"].std()
-        col1.metric("English Sentiment (avg)", f"{en_mean:.3f} ± {en_std:.3f}")
-    if len(f_pt) > 0:
-        pt_mean = f_pt["sentiment_compound"].mean()
-        pt_std = f_pt["sentiment_compound"].std()
-        col2.metric("Portuguese Sentiment (avg)", f"{pt_mean:.3f} ± {pt_std:.3f}")
+    for col, (code, name) in zip((col1, col2), sent_langs):
+        n, mean, std = sent_stats[code]
+        if n > 0:
+            col.metric(f"{name} Sentiment (avg)", f"{mean:.3f} ± {std:.3f}")
 else:
     st.info("No sentiment data available for current filters.")
 
 st.markdown("### Top places by review count")
-top_places = filtered["place_name"].value_counts().nlargest(12).reset_index()
-top_places.columns = ["place_name", "n_reviews"]
 st.plotly_chart(
-    px.bar(top_places, x="n_reviews", y="place_name", orientation="h", title="Top places"),
+    px.bar(top_places(cube, 12), x="n_reviews", y="place_name", orientation="h", title="Top places"),
     use_container_width=True,
 )
 
 # ---------- Topic Analysis (Precomputed) ----------
+tracer.stage("topic panel")
 st.markdown("### Topic Analysis (Precomputed)")
 
-OUTPUT_DIR = BASE_DIR / "output"
-
 def available_topic_counts(lang_code: str) -> list:
-    counts = []
-    for p in OUTPUT_DIR.glob(f"topics_{lang_code}_*.json"):
-        try:
-            n = int(p.stem.split("_")[-1])
-            counts.append(n)
-        except Exception:
-            pass
-    return sorted(set(counts))
+    # Renames into output/ bump the directory mtime, so new topic files invalidate this
+    return artifact_cache().get(
+        ("counts", lang_code), [OUTPUT_DIR], lambda: scan_topic_counts(lang_code)
+    )
+
+def topic_search(lang_code: str) -> dict:
+    return artifact_cache().get(("search", lang_code), [TOPICS_MANIFEST], lambda: read_topic_search(lang_code))
 
 def load_topics(lang_code: str, n_topics: int) -> pd.DataFrame:
-    path = OUTPUT_DIR / f"topics_{lang_code}_{n_topics}.json"
-    if not path.exists():
-        return pd.DataFrame()
-    try:
-        dfj = pd.read_json(path)
-        return dfj
-    except Exception:
-        return pd.DataFrame()
+    path = topics_path(lang_code, n_topics)
+    return artifact_cache().get(("topics", lang_code, n_topics), [path], lambda: read_topics(path))
 
 def load_assignments(lang_code: str, n_topics: int) -> pd.DataFrame:
-    path = OUTPUT_DIR / f"dom_{lang_code}_{n_topics}.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    try:
-        return pd.read_csv(path)
-    except Exception:
-        return pd.DataFrame()
+    return artifact_cache().get(
+        ("assignments", lang_code, n_topics), assignment_sources(lang_code, n_topics),
+        lambda: read_assignment_context(lang_code, n_topics),
+    )
+
+def load_doc_topics(lang_code: str, n_topics: int) -> Optional[np.ndarray]:
+    """Full doc-topic matrix (soft assignments), aligned with row_idx of the assignments."""
+    path = doc_topics_path(lang_code, n_topics)
+    return artifact_cache().get(("doc_topics", lang_code, n_topics), [path], lambda: read_doc_topics(path))
+
+def load_topic_geo(lang_code: str, n_topics: int) -> pd.DataFrame:
+    """Assignments joined once with coordinates, place info and topic words for the map."""
+    def build():
+        try:
+            assign = read_topic_ids(lang_code, n_topics)
+        except Exception:
+            return pd.DataFrame()
+        return build_topic_geo(df, assign, load_topics(lang_code, n_topics), lang_code)
+    sources = assignment_sources(lang_code, n_topics) + [topics_path(lang_code, n_topics), DATA_PATH]
+    return artifact_cache().get(("topic_geo", lang_code, n_topics), sources, build)
 
 col_t1, col_t2, col_t3 = st.columns(3)
 language_t = col_t1.selectbox("Language", ["English", "Portuguese"])
@@ -182,21 +348,47 @@ avail = available_topic_counts(lang_code_t)
 if not avail:
     st.info("No precomputed topics found. Run the precompute script to generate files.")
 else:
-    num_topics_t = col_t2.selectbox("Topics (precomputed)", avail)
+    search_t = topic_search(lang_code_t)
+    chosen_t = search_t.get("chosen", [])
+    num_topics_t = col_t2.selectbox(
+        "Topics (precomputed)", avail,
+        index=avail.index(chosen_t[0]) if chosen_t and chosen_t[0] in avail else 0,
+        format_func=lambda k: f"{k} (auto-k)" if k in chosen_t else str(k),
+    )
     top_k_reviews_t = col_t3.slider("Top reviews", 1, 20, 8, 1)
+    if search_t.get("scores"):
+        scored = ", ".join(
+            f"k={row['k']}: {row['coherence']:.3f}" for row in search_t["scores"] if row["coherence"] is not None
+        )
+        st.caption(
+            f"--auto-k {search_t['metric']} coherence on {search_t['sample_docs']:,} reviews "
+            f"({search_t['stopped']}): {scored}"
+        )
 
     df_topics_t = load_topics(lang_code_t, num_topics_t)
     dom_df_t = load_assignments(lang_code_t, num_topics_t)
+    doc_topics_t = load_doc_topics(lang_code_t, num_topics_t)
+    if doc_topics_t is not None and len(doc_topics_t) != len(dom_df_t):
+        doc_topics_t = None
+    use_soft_t = doc_topics_t is not None and st.checkbox(
+        "Use soft assignments",
+        help="Weight each review by its full topic mixture instead of only its dominant topic",
+    )
 
     if df_topics_t.empty or dom_df_t.empty:
         st.info("Missing topics or assignments for the selected configuration.")
     else:
         # Topic distribution
-        t_counts = dom_df_t["topic_id"].value_counts().sort_index()
+        if use_soft_t:
+            t_counts = pd.Series(np.asarray(doc_topics_t).sum(axis=0))
+            y_label = "Expected # Reviews"
+        else:
+            t_counts = dom_df_t["topic_id"].value_counts().sort_index()
+            y_label = "# Reviews"
         fig_t = px.bar(
             x=t_counts.index,
             y=t_counts.values,
-            labels={"x": "Topic ID", "y": "# Reviews"},
+            labels={"x": "Topic ID", "y": y_label},
             title=f"Topic Distribution ({language_t})",
         )
         st.plotly_chart(fig_t, use_container_width=True)
@@ -214,7 +406,12 @@ else:
                 st.write(", ".join(tw_row.get("words", [])))
 
             st.markdown("**Representative reviews:**")
-            reps = dom_df_t[dom_df_t["topic_id"].eq(selected_tid)].sort_values("topic_prob", ascending=False).head(top_k_reviews_t)
+            if use_soft_t:
+                # Rank every review by its share of the selected topic
+                reps = dom_df_t.assign(topic_prob=np.asarray(doc_topics_t[:, int(selected_tid)]))
+                reps = reps[reps["topic_prob"].gt(0)].nlargest(top_k_reviews_t, "topic_prob")
+            else:
+                reps = dom_df_t[dom_df_t["topic_id"].eq(selected_tid)].sort_values("topic_prob", ascending=False).head(top_k_reviews_t)
             if reps.empty:
                 st.info("No reviews mapped to this topic.")
             else:
@@ -224,7 +421,17 @@ else:
         else:
             st.info("No topics identified.")
 
+def load_geo_pyramid() -> dict:
+    """Offline geo pyramid (scripts/geo_pyramid.py); built in memory if missing or stale."""
+    def read():
+        if pyramid_stale():
+            return build_pyramid(df)
+        return load_pyramid()
+    return artifact_cache().get(("geo_pyramid",), [PYRAMID_PATH, DATA_PATH, REVIEWS_PARQUET], read)
+
+
 # ---------- Map ----------
+tracer.stage("map layers")
 st.markdown("### Map")
 
 # Map view toggle
@@ -235,121 +442,80 @@ map_view = st.radio(
     help="Switch between clusters, rating intensity, review density, or topic assignments"
 )
 
-mean_lat = filtered["lat"].mean()
-mean_lon = filtered["lon"].mean()
-center = [mean_lat, mean_lon] if pd.notna(mean_lat) and pd.notna(mean_lon) else [40.6405, -8.6538]
+# The map reopens at its last reported view; only places near that view are shipped
+map_state = st.session_state.get(MAP_STATE_KEY, {})
+if map_state.get("center") and map_state.get("zoom"):
+    center = [map_state["center"]["lat"], map_state["center"]["lng"]]
+    zoom = map_state["zoom"]
+else:
+    mean_lat = filtered["lat"].mean()
+    mean_lon = filtered["lon"].mean()
+    center = [mean_lat, mean_lon] if pd.notna(mean_lat) and pd.notna(mean_lon) else [40.6405, -8.6538]
+    zoom = MAP_ZOOM_DEFAULT
+view = viewport(map_state.get("bounds") or estimate_bounds(center, zoom, MAP_WIDTH, MAP_HEIGHT))
 
-m = folium.Map(location=center, zoom_start=MAP_ZOOM_DEFAULT, tiles="cartodbpositron")
+m = folium.Map(location=center, zoom_start=zoom, tiles="cartodbpositron")
 
-if map_view == "Markers (Clustered)":
-    marker_cluster = plugins.MarkerCluster(disableClusteringAtZoom=CLUSTER_DISABLE_ZOOM)
-    marker_cluster.add_to(m)
+# Per-place marker layers: places (one row per place_id) and the reviews behind them
+places = None
+place_reviews = None
+heat_clipped = False
+review_cols = ["place_name", "rating", "lang", "review_text"]
 
 if map_view == "Markers (Clustered)":
-    for _, row in filtered.iterrows():
-        popup_parts = [f"<b>{row['place_name']}</b>"]
-        if pd.notna(row.get("rating")):
-            popup_parts.append(f"Rating: {row['rating']}")
-        if pd.notna(row.get("place_primary_type")):
-            popup_parts.append(f"Type: {row['place_primary_type']}")
-        if pd.notna(row.get("lang")):
-            popup_parts.append(f"Lang: {row['lang']}")
-        # include short review preview if available
-        review_txt: Optional[str] = row.get("review_text") if "review_text" in row else None
-        if isinstance(review_txt, str) and review_txt.strip():
-            preview = (review_txt[:120] + "…") if len(review_txt) > 120 else review_txt
-            popup_parts.append(f"Review: {preview}")
-        popup_html = "<br>".join(popup_parts)
-
-        folium.CircleMarker(
-            location=[row["lat"], row["lon"]],
-            radius=5,
-            color="#3186cc",
-            fill=True,
-            fill_color="#3186cc",
-            fill_opacity=0.8,
-            popup=folium.Popup(popup_html, max_width=300),
-        ).add_to(marker_cluster)
-
-elif map_view == "Rating Heatmap":
-    # Aggregate ratings on a small grid (~100m) to reduce density bias and reflect average score per region
-    grid_lat = filtered["lat"].round(3)
-    grid_lon = filtered["lon"].round(3)
-
-    def mode_or_first(series: pd.Series):
-        m = series.mode()
-        return m.iat[0] if not m.empty else (series.iloc[0] if len(series) else None)
-
-    place_agg = (
-        filtered.assign(grid_lat=grid_lat, grid_lon=grid_lon)
-        .groupby(["grid_lat", "grid_lon"]).agg({
-            "lat": "mean",
-            "lon": "mean",
-            "rating": "mean",
-            "place_name": mode_or_first,          # representative place name in the grid
-            "place_primary_type": mode_or_first,  # representative type in the grid
-            "place_id": "count",                # number of reviews/places in the grid
-        })
-        .reset_index()
-        .rename(columns={"place_id": "n_reviews"})
-    )
-
-    # Create heatmap data: [lat, lon, weight], where weight is normalized average rating
-    heat_data = []
-    for _, row in place_agg.iterrows():
-        if pd.isna(row["rating"]):
-            continue
-        weight = max(0.0, min(1.0, row["rating"] / 5.0))
-        heat_data.append([row["lat"], row["lon"], weight])
-    
-    if heat_data:
-        plugins.HeatMap(
-            heat_data,
-            min_opacity=0.5,
-            max_zoom=18,
-            radius=22,
-            blur=18,
-            max_val=1.0,
-            gradient={0.0: 'red', 0.4: 'orange', 0.6: 'yellow', 0.8: 'lightgreen', 1.0: 'green'},
-            name="Rating Heatmap"
-        ).add_to(m)
-        
-        # Add grid markers colored by average rating for quick spot checks
-        for _, row in place_agg.iterrows():
-            color = rating_color(row["rating"])
-            pname = row.get("place_name") or "(multiple places)"
-            ptype = row.get("place_primary_type") or "(mixed types)"
-            folium.CircleMarker(
-                location=[row["lat"], row["lon"]],
-                radius=4,
-                color=color,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.8,
-                popup=(
-                    f"<b>{pname}</b><br>"
-                    f"Type: {ptype}<br>"
-                    f"Avg Rating: {row['rating']:.2f}<br>"
-                    f"Grid reviews: {int(row['n_reviews'])}"
-                ),
-            ).add_to(m)
-
-elif map_view == "Review Density Heatmap":
-    # All reviews as points (density based on review count)
-    heat_data = [[row["lat"], row["lon"]] for _, row in filtered.iterrows()]
-    
-    if heat_data:
-        plugins.HeatMap(
-            heat_data,
-            min_opacity=0.2,
-            max_zoom=18,
-            radius=20,
-            blur=15,
-            gradient={0.0: 'lightblue', 0.4: 'cyan', 0.6: 'lime', 0.8: 'yellow', 1.0: 'red'},
-            name="Review Density"
-        ).add_to(m)
-
-elif map_view == "Topic View":
+    places = attach_keywords(aggregate_places(filtered), load_place_keywords())
+    places["popup"] = place_popups(places)
+    places["color"] = "#3186cc"
+    place_reviews = filtered
+    if search_hits is not None:
+        place_reviews = filtered.sort_values("score", ascending=False, kind="stable")
+        review_cols = ["score"] + review_cols
+
+elif map_view in ("Rating Heatmap", "Review Density Heatmap"):
+    # Pre-aggregated grid cells for the current zoom, filtered and clipped to the viewport
+    if search_hits is None:
+        cells = query_cells(load_geo_pyramid(), zoom, langs, (min_rating, max_rating), ptype_sel, place_query)
+    else:
+        # Review search is not a pyramid dimension: grid the matching rows at this zoom only
+        level = min(max(int(round(zoom)), MIN_LEVEL), MAX_LEVEL)
+        cells = query_cells(build_pyramid(filtered, [level]), zoom, langs, (min_rating, max_rating))
+    cells = clip_to_viewport(cells, view)
+    heat_clipped = True
+
+if map_view == "Rating Heatmap" and not cells.empty:
+    # Heatmap data: [lat, lon, weight], where weight is the cell's normalized average rating
+    heat_data = np.column_stack([cells["lat"], cells["lon"], np.clip(cells["rating"] / 5.0, 0.0, 1.0)]).tolist()
+    plugins.HeatMap(
+        heat_data,
+        min_opacity=0.5,
+        max_zoom=18,
+        radius=22,
+        blur=18,
+        max_val=1.0,
+        gradient={0.0: 'red', 0.4: 'orange', 0.6: 'yellow', 0.8: 'lightgreen', 1.0: 'green'},
+        name="Rating Heatmap"
+    ).add_to(m)
+
+    # Grid markers colored by average rating for quick spot checks (never clustered)
+    fast_marker_layer(
+        cells, cells["rating"].map(rating_color).to_numpy(), cell_popups(cells),
+        name="Grid cells", disable_clustering_at_zoom=1,
+    ).add_to(m)
+
+elif map_view == "Review Density Heatmap" and not cells.empty:
+    # One weighted point per cell (weight = number of reviews)
+    heat_data = np.column_stack([cells["lat"], cells["lon"], cells["n_reviews"]]).tolist()
+    plugins.HeatMap(
+        heat_data,
+        min_opacity=0.2,
+        max_zoom=18,
+        radius=20,
+        blur=15,
+        gradient={0.0: 'lightblue', 0.4: 'cyan', 0.6: 'lime', 0.8: 'yellow', 1.0: 'red'},
+        name="Review Density"
+    ).add_to(m)
+
+if map_view == "Topic View":
     # Topic-based markers using precomputed assignments
     topic_lang = st.selectbox("Topic language", ["English", "Portuguese"], key="topic_lang")
     topic_lang_code = "en" if topic_lang == "English" else "pt"
@@ -359,69 +525,76 @@ elif map_view == "Topic View":
         st.info("No precomputed topics found. Run the precompute script first.")
     else:
         topic_n = st.selectbox("# of topics", avail, key="topic_n")
-        topics_df = load_topics(topic_lang_code, topic_n)
-        assign_df = load_assignments(topic_lang_code, topic_n)
+        topic_geo = load_topic_geo(topic_lang_code, topic_n)
 
-        if topics_df.empty or assign_df.empty:
+        if topic_geo.empty:
             st.info("Missing topics/assignments for this configuration.")
         else:
-            # Map topic_id -> top words
-            topic_word_map = {}
-            if "top_words" in topics_df.columns:
-                for _, r in topics_df.iterrows():
-                    topic_word_map[r["topic_id"]] = str(r["top_words"])
-
-            # Rebuild the language slice with row_idx alignment and add lat/lon
-            df_lang_all = df[df["lang"].eq(topic_lang_code)].reset_index(drop=True)
-            df_lang_all = df_lang_all.reset_index().rename(columns={"index": "row_idx"})
-            merged = assign_df.merge(df_lang_all, on="row_idx", how="inner", suffixes=("", "_df"))
+            merged = topic_geo
 
             # Apply current filters intersection via place_id
             if "place_id" in filtered.columns:
                 merged = merged[merged["place_id"].isin(filtered["place_id"].unique())]
+            # With a review search, only the matching reviews
+            if search_hits is not None:
+                matched = filtered.loc[filtered["lang"].eq(topic_lang_code), "lang_row_idx"]
+                merged = merged[merged["row_idx"].isin(matched)]
 
             if merged.empty:
                 st.info("No topic-mapped reviews match current filters.")
             else:
-                # Color palette for topics
-                palette = [
-                    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
-                    "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"
-                ]
-                def topic_color(tid):
-                    return palette[int(tid) % len(palette)] if pd.notna(tid) else "#aaaaaa"
-
-                cluster = plugins.MarkerCluster(disableClusteringAtZoom=CLUSTER_DISABLE_ZOOM).add_to(m)
-
-                for _, row in merged.iterrows():
-                    lat = row.get("lat")
-                    lon = row.get("lon")
-                    if pd.isna(lat) or pd.isna(lon):
-                        continue
-                    tid = row.get("topic_id")
-                    prob = row.get("topic_prob")
-                    twords = topic_word_map.get(tid, "")
-                    pname = row.get("place_name") or "(place)"
-                    ptype = row.get("place_primary_type") or "(type)"
-                    rating_val = row.get("rating")
-                    popup_html = (
-                        f"<b>{pname}</b><br>"
-                        f"Type: {ptype}<br>"
-                        f"Topic: {tid} (p={prob:.2f})<br>"
-                        f"Top words: {twords}<br>"
-                        f"Rating: {rating_val if pd.notna(rating_val) else 'n/a'}"
-                    )
-                    folium.CircleMarker(
-                        location=[lat, lon],
-                        radius=4,
-                        color=topic_color(tid),
-                        fill=True,
-                        fill_color=topic_color(tid),
-                        fill_opacity=0.8,
-                        popup=folium.Popup(popup_html, max_width=320),
-                    ).add_to(cluster)
+                places = attach_keywords(aggregate_topic_places(merged), load_place_keywords())
+                places["popup"] = topic_place_popups(places)
+                places["color"] = topic_colors(places["topic_id"])
+                # Review text lives in the filtered frame; attach it by language position
+                texts = df.loc[df["lang"].eq(topic_lang_code), ["lang_row_idx", "lang", "review_text"]]
+                place_reviews = merged.merge(texts, left_on="row_idx", right_on="lang_row_idx", how="left")
+                review_cols = ["place_name", "rating", "topic_id", "topic_prob", "review_text"]
+
+if places is not None and not places.empty:
+    shown = clip_to_viewport(places, view)
+    fast_marker_layer(
+        shown, shown["color"].to_numpy(), shown["popup"], name="Places",
+        disable_clustering_at_zoom=CLUSTER_DISABLE_ZOOM,
+    ).add_to(m)
+    st.caption(
+        f"Showing {len(shown):,} of {len(places):,} places in the current view "
+        f"({int(shown['n_reviews'].sum()):,} reviews)"
+    )
 
 # Add layer control
 folium.LayerControl().add_to(m)
 
-st_folium(m, width=1200, height=550)
+# Serializes the folium map to HTML and ships it to the component
+tracer.stage("st_folium")
+map_out = st_folium(
+    m,
+    key=MAP_KEY,
+    width=MAP_WIDTH,
+    height=MAP_HEIGHT,
+    returned_objects=["bounds", "center", "zoom", "last_clicked", "last_object_clicked"],
+) or {}
+
+if map_out.get("center") and map_out.get("zoom"):
+    st.session_state[MAP_STATE_KEY] = {k: map_out.get(k) for k in ("bounds", "center", "zoom")}
+    # Panned/zoomed out of the shipped area (or heatmap zoom changed): rebuild for the new view
+    left_view = (places is not None or heat_clipped) and not view_covers(view, map_out.get("bounds"))
+    if left_view or (heat_clipped and map_out["zoom"] != zoom):
+        record_trace()
+        st.rerun()
+
+# Reviews of a place are only looked up once its marker is clicked
+tracer.stage("place reviews")
+if places is not None and not places.empty:
+    click = map_out.get("last_object_clicked") or map_out.get("last_clicked")
+    pid = clicked_place(places, click, map_out.get("zoom") or zoom)
+    if pid is not None:
+        sel = place_reviews[place_reviews["place_id"].eq(pid)]
+        st.markdown(f"**Reviews at {sel['place_name'].iat[0]}** ({len(sel)})")
+        keywords = places.loc[places["place_id"].eq(pid), "keywords"]
+        if len(keywords) and keywords.iat[0]:
+            st.caption(f"Keywords: {keywords.iat[0]}")
+        st.dataframe(sel[[c for c in review_cols if c in sel.columns]], use_container_width=True)
+
+# ---------- Rerun timings ----------
+timings_panel()
@@ -0,0 +1,62 @@
+"""Small in-process cache for precomputed artifacts used by the dashboard.
+
+Entries are keyed by name and validated against the (mtime, size) stamp of the
+files they were built from, so a rerun only costs a few stat() calls and a
+file rewritten by the precompute scripts is picked up on the next rerun.
+
+One instance is shared by every session (st.cache_resource), and Streamlit
+runs each session's reruns in its own thread, so the LRU bookkeeping is done
+under a lock. Loaders run outside it; two sessions missing the same key at
+once may both load it, and the later one wins.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Hashable, Iterable
+
+
+def file_stamp(paths: Iterable[Path]) -> tuple:
+    """(path, mtime_ns, size) per path; missing files stamp as (path, None, None)."""
+    stamp = []
+    for p in paths:
+        try:
+            s = Path(p).stat()
+            stamp.append((str(p), s.st_mtime_ns, s.st_size))
+        except OSError:
+            stamp.append((str(p), None, None))
+    return tuple(stamp)
+
+
+class ArtifactCache:
+    """Bounded LRU of loaded artifacts, invalidated by their source file stamps."""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, paths: Iterable[Path], loader: Callable):
+        stamp = file_stamp(paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,159 @@
+"""Dashboard data paths that do not need Streamlit.
+
+Review loading, topic artifact readers, the Topic View join and the mapping
+of review search hits to frame rows live here so they can be imported (and
+benchmarked) without starting the app; app.py wraps them in
+st.cache_resource / ArtifactCache.
+"""
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR / "scripts") not in sys.path:
+    sys.path.insert(0, str(BASE_DIR / "scripts"))
+from artifact_store import (  # noqa: E402
+    ENRICHED_CSV, OUTPUT_DIR, REVIEWS_PARQUET, assignments_path, attach_context,
+    dom_csv_to_assignments, read_assignments, read_reviews, read_topics_manifest, reviews_table_stale,
+)
+from tracing import traced  # noqa: E402
+
+DATA_PATH = ENRICHED_CSV
+# Columns the dashboard reads from the Parquet review table
+DASHBOARD_COLS = [
+    "place_id", "place_name", "place_primary_type", "rating", "review_text",
+    "lat", "lon", "lang", "sentiment_compound",
+]
+GEO_COLS = ["lang_row_idx", "lat", "lon", "place_id", "place_name", "place_primary_type", "rating"]
+
+
+# ---------- Reviews ----------
+def prepare_reviews(df: pd.DataFrame) -> pd.DataFrame:
+    """Numeric coercion, per-language row positions, and rows the map can place."""
+    df["rating"] = pd.to_numeric(df.get("rating"), errors="coerce")
+    df["sentiment_compound"] = pd.to_numeric(df.get("sentiment_compound"), errors="coerce")
+    # Position within the language's rows, i.e. the row_idx used by topic assignments
+    df["lang_row_idx"] = df.groupby("lang", dropna=False, observed=True).cumcount()
+    # Drop rows without coordinates or names
+    return df.dropna(subset=["lat", "lon", "place_name"]).reset_index(drop=True)
+
+
+@traced("read reviews")
+def read_dashboard_reviews(path: Path = DATA_PATH, table: Path = REVIEWS_PARQUET) -> Optional[pd.DataFrame]:
+    """Reviews from the Parquet table (or the CSV when the table is stale); None if neither exists."""
+    if not reviews_table_stale(path, table):
+        # Memory-mapped, column-projected read of the review table
+        df = read_reviews(DASHBOARD_COLS, table)
+    elif not path.exists():
+        return None
+    else:
+        df = pd.read_csv(path)
+    return prepare_reviews(df)
+
+
+# ---------- Topic artifacts ----------
+def topics_path(lang_code: str, n_topics: int) -> Path:
+    return OUTPUT_DIR / f"topics_{lang_code}_{n_topics}.json"
+
+
+def dom_csv_path(lang_code: str, n_topics: int) -> Path:
+    return OUTPUT_DIR / f"dom_{lang_code}_{n_topics}.csv"
+
+
+def doc_topics_path(lang_code: str, n_topics: int) -> Path:
+    return OUTPUT_DIR / f"doc_topics_{lang_code}_{n_topics}.npy"
+
+
+def assignment_sources(lang_code: str, n_topics: int) -> list:
+    return [assignments_path(lang_code, n_topics), REVIEWS_PARQUET, dom_csv_path(lang_code, n_topics)]
+
+
+def scan_topic_counts(lang_code: str) -> list:
+    """Topic counts with a topics file in output/ (the manifest only annotates them, see read_topic_search)."""
+    counts = []
+    for p in OUTPUT_DIR.glob(f"topics_{lang_code}_*.json"):
+        try:
+            counts.append(int(p.stem.split("_")[-1]))
+        except Exception:
+            pass
+    return sorted(set(counts))
+
+
+def read_topic_search(lang_code: str) -> dict:
+    """Scores and chosen k of the last --auto-k search for a language ({} if none)."""
+    return read_topics_manifest().get(lang_code, {}).get("search", {})
+
+
+def read_topics(path: Path) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame()
+    try:
+        return pd.read_json(path)
+    except Exception:
+        return pd.DataFrame()
+
+
+def read_topic_ids(lang_code: str, n_topics: int) -> pd.DataFrame:
+    """Slim assignments (row_idx, topic_id, topic_prob) from Parquet or the legacy CSV."""
+    if assignments_path(lang_code, n_topics).exists():
+        return read_assignments(lang_code, n_topics)
+    path = dom_csv_path(lang_code, n_topics)
+    if path.exists():
+        return dom_csv_to_assignments(path)
+    return pd.DataFrame()
+
+
+@traced("read assignments")
+def read_assignment_context(lang_code: str, n_topics: int) -> pd.DataFrame:
+    """Slim Parquet assignments joined with review context; legacy dom_*.csv otherwise."""
+    try:
+        if assignments_path(lang_code, n_topics).exists() and REVIEWS_PARQUET.exists():
+            return attach_context(read_assignments(lang_code, n_topics), lang_code)
+        path = dom_csv_path(lang_code, n_topics)
+        if not path.exists():
+            return pd.DataFrame()
+        return pd.read_csv(path)
+    except Exception:
+        return pd.DataFrame()
+
+
+def read_doc_topics(path: Path) -> Optional[np.ndarray]:
+    """Full doc-topic matrix (soft assignments), memory-mapped."""
+    if not path.exists():
+        return None
+    try:
+        return np.load(path, mmap_mode="r")
+    except Exception:
+        return None
+
+
+@traced("topic geo join")
+def build_topic_geo(df: pd.DataFrame, assign: pd.DataFrame, topics: pd.DataFrame, lang_code: str) -> pd.DataFrame:
+    """Assignments joined once with coordinates, place info and topic words for the map."""
+    if assign.empty or topics.empty:
+        return pd.DataFrame()
+    geo = df.loc[df["lang"].eq(lang_code), [c for c in GEO_COLS if c in df.columns]]
+    merged = assign.merge(geo, left_on="row_idx", right_on="lang_row_idx", how="inner")
+    merged = merged.drop(columns="lang_row_idx").dropna(subset=["lat", "lon"])
+    if "top_words" in topics.columns:
+        word_map = dict(zip(topics["topic_id"], topics["top_words"].astype(str)))
+        merged["top_words"] = merged["topic_id"].map(word_map).fillna("")
+    else:
+        merged["top_words"] = ""
+    return merged.reset_index(drop=True)
+
+
+# ---------- Review search ----------
+def search_rows(df: pd.DataFrame, lang_code: str, doc_ids: np.ndarray, scores: np.ndarray) -> pd.Series:
+    """Search hits (positions among the language's review rows) as scores indexed by row position in `df`.
+
+    Hits on reviews the dashboard dropped (no coordinates or name) are left out.
+    """
+    pos = np.flatnonzero(df["lang"].eq(lang_code).to_numpy())
+    lang_rows = df["lang_row_idx"].to_numpy()[pos]  # increasing: df keeps review order
+    j = np.minimum(np.searchsorted(lang_rows, doc_ids), max(len(pos) - 1, 0))
+    found = (lang_rows[j] == doc_ids) if len(pos) else np.zeros(len(doc_ids), dtype=bool)
+    return pd.Series(scores[found], index=pos[j[found]], dtype=np.float64)
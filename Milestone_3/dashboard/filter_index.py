@@ -0,0 +1,119 @@
+"""Precomputed index answering the dashboard's sidebar filters without scanning the frame.
+
+- language / primary type: one packed bitset (np.packbits) per category
+- rating: positions sorted by rating, so a range is two binary searches
+- place name: trigram index over the distinct lowercased names
+
+A query intersects the per-filter bitsets (plus, optionally, the rows hit by
+a review-text search) and returns the matching row positions in frame order,
+together with the time spent on each filter.
+"""
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+NGRAM = 3
+
+
+def ngrams(text: str, n: int = NGRAM) -> set:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class FilterIndex:
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self.cat_bits = {c: self._category_bitsets(df[c]) for c in ("lang", "place_primary_type") if c in df.columns}
+
+        rating = pd.to_numeric(df["rating"], errors="coerce").to_numpy(dtype=np.float64)
+        self.rating_order = np.argsort(rating, kind="stable")  # NaN sorts last
+        self.rating_sorted = rating[self.rating_order]
+
+        names = df["place_name"].astype(str).str.lower()
+        self.name_codes, uniques = pd.factorize(names)
+        self.names = np.asarray(uniques, dtype=object)
+        postings = defaultdict(list)
+        for code, name in enumerate(self.names):
+            for g in ngrams(name):
+                postings[g].append(code)
+        self.name_postings = {g: np.asarray(codes, dtype=np.int64) for g, codes in postings.items()}
+
+    # ---------- Building blocks ----------
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask)
+
+    def _category_bitsets(self, series: pd.Series) -> dict:
+        codes, uniques = pd.factorize(series)
+        return {value: self._pack(codes == i) for i, value in enumerate(uniques)}
+
+    def _union(self, column: str, values: Iterable) -> np.ndarray:
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for v in values:
+            b = self.cat_bits[column].get(v)
+            if b is not None:
+                bits |= b
+        return bits
+
+    def rating_bits(self, lo: float, hi: float) -> np.ndarray:
+        start = np.searchsorted(self.rating_sorted, lo, side="left")
+        stop = np.searchsorted(self.rating_sorted, hi, side="right")
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.rating_order[start:stop]] = True
+        return self._pack(mask)
+
+    def matching_names(self, query: str) -> np.ndarray:
+        """Codes of place names containing `query` (case-insensitive substring)."""
+        q = query.lower()
+        grams = ngrams(q)
+        if grams:
+            lists = [self.name_postings.get(g) for g in grams]
+            if any(lst is None for lst in lists):
+                return np.empty(0, dtype=np.int64)
+            candidates = lists[0]
+            for lst in lists[1:]:
+                candidates = np.intersect1d(candidates, lst, assume_unique=True)
+        else:
+            candidates = np.arange(len(self.names))
+        return np.asarray([c for c in candidates if q in self.names[c]], dtype=np.int64)
+
+    def name_bits(self, query: str) -> np.ndarray:
+        return self._pack(np.isin(self.name_codes, self.matching_names(query)))
+
+    def row_bits(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return self._pack(mask)
+
+    # ---------- Query ----------
+    def query(
+        self,
+        langs: Iterable,
+        rating_range: tuple,
+        ptypes: Optional[Iterable] = None,
+        place_query: str = "",
+        text_rows: Optional[np.ndarray] = None,
+    ) -> tuple:
+        """Row positions matching all filters, plus {filter: milliseconds}.
+
+        `text_rows` (row positions, e.g. review search hits) restricts the result further.
+        """
+        timings = {}
+
+        def timed(name, fn):
+            t0 = time.perf_counter()
+            out = fn()
+            timings[name] = (time.perf_counter() - t0) * 1000
+            return out
+
+        bits = timed("language", lambda: self._union("lang", langs))
+        bits &= timed("rating", lambda: self.rating_bits(*rating_range))
+        if ptypes:
+            bits &= timed("primary type", lambda: self._union("place_primary_type", ptypes))
+        if place_query:
+            bits &= timed("place name", lambda: self.name_bits(place_query))
+        if text_rows is not None:
+            bits &= timed("review text", lambda: self.row_bits(text_rows))
+        rows = timed("intersect", lambda: np.flatnonzero(np.unpackbits(bits, count=self.n_rows)))
+        return rows, timings
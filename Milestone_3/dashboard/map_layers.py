@@ -0,0 +1,210 @@
+"""Vectorized marker layers for the dashboard map.
+
+Reviews are aggregated to one marker per place, popups are built with column
+operations, and only places inside the (padded) current viewport are sent to
+the browser as a single FastMarkerCluster payload. Individual reviews are not
+embedded in the page; the app lists them for a place once it is clicked.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from folium import plugins
+
+# Fraction of the visible span added on each side before clipping, so short pans stay covered
+VIEWPORT_PAD = 0.5
+# Viewport edges are snapped outward to this grid (degrees) so tiny pans keep the same payload
+VIEWPORT_SNAP = 0.01
+# Click tolerance around a marker, in screen pixels
+CLICK_TOLERANCE_PX = 12
+
+TOPIC_PALETTE = np.array([
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+    "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf",
+])
+
+# Each data row is [lat, lon, color, popup_html]
+MARKER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 5, color: row[2], fill: true, fillColor: row[2], fillOpacity: 0.8
+    });
+    marker.bindPopup(row[3], {maxWidth: 320});
+    return marker;
+}
+"""
+
+
+def text_col(series: pd.Series, missing: str) -> pd.Series:
+    return series.astype(object).where(series.notna(), missing).astype(str)
+
+
+def number_col(series: pd.Series, fmt: str = "{:.2f}", missing: str = "n/a") -> pd.Series:
+    return series.map(lambda v: fmt.format(v) if pd.notna(v) else missing)
+
+
+# ---------- Aggregation ----------
+def aggregate_places(frame: pd.DataFrame) -> pd.DataFrame:
+    """One row per place_id: location, name, type, review count and mean rating."""
+    return (
+        frame.groupby("place_id", sort=False, observed=True)
+        .agg(
+            lat=("lat", "mean"),
+            lon=("lon", "mean"),
+            place_name=("place_name", "first"),
+            place_primary_type=("place_primary_type", "first"),
+            n_reviews=("lat", "size"),
+            rating=("rating", "mean"),
+        )
+        .reset_index()
+    )
+
+
+def aggregate_topic_places(frame: pd.DataFrame) -> pd.DataFrame:
+    """aggregate_places plus each place's most frequent topic, its share and mean probability."""
+    places = aggregate_places(frame)
+    topics = (
+        frame.dropna(subset=["topic_id"])
+        .groupby(["place_id", "topic_id"], observed=True)
+        .agg(n_topic=("topic_prob", "size"), topic_prob=("topic_prob", "mean"), top_words=("top_words", "first"))
+        .reset_index()
+        .sort_values(["n_topic", "topic_prob"], ascending=False, kind="stable")
+        .drop_duplicates("place_id")
+    )
+    places = places.merge(topics, on="place_id", how="left")
+    places["topic_share"] = places["n_topic"] / places["n_reviews"]
+    return places
+
+
+def attach_keywords(places: pd.DataFrame, keywords: pd.Series) -> pd.DataFrame:
+    """Add each place's precomputed keywords (place_id -> text; "" where there are none)."""
+    places["keywords"] = places["place_id"].astype(str).map(keywords).fillna("") if len(keywords) else ""
+    return places
+
+
+# ---------- Popups ----------
+def keyword_lines(places: pd.DataFrame) -> pd.Series:
+    """"Keywords: ...<br>" per place, or "" without keywords (or without the column)."""
+    if "keywords" not in places.columns:
+        return pd.Series("", index=places.index)
+    keywords = text_col(places["keywords"], "")
+    return ("Keywords: " + keywords + "<br>").where(keywords.ne(""), "")
+
+
+def place_popups(places: pd.DataFrame) -> pd.Series:
+    return (
+        "<b>" + text_col(places["place_name"], "(place)") + "</b><br>"
+        + "Type: " + text_col(places["place_primary_type"], "(type)") + "<br>"
+        + "Avg rating: " + number_col(places["rating"]) + "<br>"
+        + "Reviews: " + places["n_reviews"].astype(str) + "<br>"
+        + keyword_lines(places)
+        + "<i>Click the marker to list its reviews below the map</i>"
+    )
+
+
+def topic_place_popups(places: pd.DataFrame) -> pd.Series:
+    topic = number_col(places["topic_id"], "{:.0f}")
+    return (
+        "<b>" + text_col(places["place_name"], "(place)") + "</b><br>"
+        + "Type: " + text_col(places["place_primary_type"], "(type)") + "<br>"
+        + "Topic: " + topic + " (p=" + number_col(places["topic_prob"]) + ", "
+        + number_col(100 * places["topic_share"], "{:.0f}") + "% of reviews)<br>"
+        + "Top words: " + text_col(places["top_words"], "") + "<br>"
+        + "Rating: " + number_col(places["rating"]) + "<br>"
+        + keyword_lines(places)
+        + "<i>Click the marker to list its reviews below the map</i>"
+    )
+
+
+def cell_popups(cells: pd.DataFrame) -> pd.Series:
+    return (
+        "<b>" + text_col(cells["place_name"], "(multiple places)") + "</b><br>"
+        + "Type: " + text_col(cells["place_primary_type"], "(mixed types)") + "<br>"
+        + "Avg Rating: " + number_col(cells["rating"]) + " ± " + number_col(cells["rating_std"]) + "<br>"
+        + "Grid reviews: " + cells["n_reviews"].astype(str)
+    )
+
+
+def topic_colors(topic_ids: pd.Series) -> np.ndarray:
+    ids = topic_ids.fillna(-1).to_numpy(dtype=np.int64)
+    return np.where(ids >= 0, TOPIC_PALETTE[ids % len(TOPIC_PALETTE)], "#aaaaaa")
+
+
+# ---------- Viewport ----------
+def degrees_per_pixel(zoom: float) -> float:
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def estimate_bounds(center: list, zoom: float, width_px: int, height_px: int) -> dict:
+    """Approximate Leaflet bounds for a map that has not reported its own yet."""
+    half_lon = width_px / 2 * degrees_per_pixel(zoom)
+    half_lat = height_px / 2 * degrees_per_pixel(zoom) * math.cos(math.radians(center[0]))
+    return {
+        "_southWest": {"lat": center[0] - half_lat, "lng": center[1] - half_lon},
+        "_northEast": {"lat": center[0] + half_lat, "lng": center[1] + half_lon},
+    }
+
+
+def viewport(bounds: Optional[dict], pad: float = VIEWPORT_PAD, snap: float = VIEWPORT_SNAP) -> Optional[tuple]:
+    """(south, west, north, east) padded and snapped outward, or None if bounds are unknown."""
+    try:
+        south, west = bounds["_southWest"]["lat"], bounds["_southWest"]["lng"]
+        north, east = bounds["_northEast"]["lat"], bounds["_northEast"]["lng"]
+    except (TypeError, KeyError):
+        return None
+    if None in (south, west, north, east):
+        return None
+    d_lat, d_lon = (north - south) * pad, (east - west) * pad
+    return (
+        math.floor((south - d_lat) / snap) * snap,
+        math.floor((west - d_lon) / snap) * snap,
+        math.ceil((north + d_lat) / snap) * snap,
+        math.ceil((east + d_lon) / snap) * snap,
+    )
+
+
+def view_covers(view: Optional[tuple], bounds: Optional[dict]) -> bool:
+    """True if the unpadded `bounds` still lie inside the shipped `view`."""
+    inner = viewport(bounds, pad=0.0, snap=1e-9)
+    if view is None or inner is None:
+        return view is None
+    return view[0] <= inner[0] and view[1] <= inner[1] and inner[2] <= view[2] and inner[3] <= view[3]
+
+
+def clip_to_viewport(places: pd.DataFrame, view: Optional[tuple]) -> pd.DataFrame:
+    if view is None:
+        return places
+    south, west, north, east = view
+    inside = places["lat"].between(south, north) & places["lon"].between(west, east)
+    return places[inside]
+
+
+# ---------- Layer & clicks ----------
+def fast_marker_layer(places: pd.DataFrame, colors, popups: pd.Series, name: str,
+                      disable_clustering_at_zoom: int) -> plugins.FastMarkerCluster:
+    data = pd.DataFrame({
+        "lat": places["lat"].to_numpy(),
+        "lon": places["lon"].to_numpy(),
+        "color": colors,
+        "popup": popups.to_numpy(),
+    }).values.tolist()
+    return plugins.FastMarkerCluster(
+        data,
+        callback=MARKER_CALLBACK,
+        name=name,
+        disableClusteringAtZoom=disable_clustering_at_zoom,
+    )
+
+
+def clicked_place(places: pd.DataFrame, click: Optional[dict], zoom: float) -> Optional[object]:
+    """place_id of the marker nearest to a map click, if one is within CLICK_TOLERANCE_PX."""
+    if not click or places.empty or click.get("lat") is None or click.get("lng") is None:
+        return None
+    d_lat = places["lat"].to_numpy() - click["lat"]
+    d_lon = places["lon"].to_numpy() - click["lng"]
+    dist = np.hypot(d_lat, d_lon)
+    i = int(np.argmin(dist))
+    if dist[i] > CLICK_TOLERANCE_PX * degrees_per_pixel(zoom):
+        return None
+    return places["place_id"].iat[i]
@@ -0,0 +1,205 @@
+"""Columnar (Parquet) artifact layout shared by the scripts and the dashboard.
+
+- output/reviews.parquet: one row per enriched review, in CSV order, with
+  lang, place_primary_type and place_id dictionary-encoded (categoricals)
+- output/assign_{lang}_{k}.parquet: slim topic assignments (row_idx,
+  topic_id, topic_prob); row_idx is the review's position among the rows of
+  that language in reviews.parquet
+- output/topics_manifest.json: per language, the trained topic counts and
+  the --auto-k search scores (written by precompute_topics.py)
+- output/place_keywords.parquet: top TF-IDF keywords per place_id (written
+  by place_keywords.py)
+
+Reads are memory-mapped and column-projected, so callers only pay for the
+columns they ask for.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+OUTPUT_DIR = BASE_DIR / "output"
+RAW_CSV = OUTPUT_DIR / "reviews_raw.csv"
+ENRICHED_CSV = OUTPUT_DIR / "reviews_enriched.csv"
+REVIEWS_PARQUET = OUTPUT_DIR / "reviews.parquet"
+TOPICS_MANIFEST = OUTPUT_DIR / "topics_manifest.json"
+PLACE_KEYWORDS = OUTPUT_DIR / "place_keywords.parquet"
+
+# Columns of the enriched CSV kept in the review table
+REVIEW_COLS = [
+    "place_id", "place_name", "place_rating", "place_primary_type",
+    "author_name", "rating", "review_text", "publish_time",
+    "lat", "lon", "lang", "text_processed", "sentiment_compound",
+]
+CATEGORICAL_COLS = ["lang", "place_primary_type", "place_id"]
+NUMERIC_COLS = ["place_rating", "rating", "lat", "lon", "sentiment_compound"]
+# Review context shown next to topic assignments
+CONTEXT_COLS = ["place_name", "rating", "review_text", "publish_time"]
+
+ASSIGNMENT_SCHEMA = pa.schema([
+    ("row_idx", pa.int32()),
+    ("topic_id", pa.int16()),
+    ("topic_prob", pa.float32()),
+])
+
+
+def atomic_write(path: Path, write_fn) -> Path:
+    """Write via a temp file in the same directory, then rename over `path`.
+
+    The dashboard may read outputs while the scripts run, so it must never
+    see a half-written file.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        write_fn(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+
+def assignments_path(lang_code: str, n_topics: int) -> Path:
+    return OUTPUT_DIR / f"assign_{lang_code}_{n_topics}.parquet"
+
+
+# ---------- Review table ----------
+def reviews_table_stale(csv_path: Path = ENRICHED_CSV, path: Path = REVIEWS_PARQUET) -> bool:
+    """True if the review table is missing or older than the enriched CSV."""
+    if not path.exists():
+        return True
+    return csv_path.exists() and csv_path.stat().st_mtime > path.stat().st_mtime
+
+
+def review_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Enriched CSV rows reduced to the review table's columns and dtypes."""
+    df = df[[c for c in REVIEW_COLS if c in df.columns]]
+    for c in NUMERIC_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    for c in CATEGORICAL_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+
+def review_schema(columns: list) -> pa.Schema:
+    """Fixed schema for chunked writes, where per-chunk type inference would disagree."""
+    def field_type(c):
+        if c in CATEGORICAL_COLS:
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.float64() if c in NUMERIC_COLS else pa.string()
+    return pa.schema([(c, field_type(c)) for c in REVIEW_COLS if c in columns])
+
+
+def write_reviews_table(csv_path: Path = ENRICHED_CSV, path: Path = REVIEWS_PARQUET,
+                        chunksize: Optional[int] = None) -> Path:
+    """Convert the enriched CSV; with `chunksize`, one row group per chunk in bounded memory."""
+    if chunksize is None:
+        table = pa.Table.from_pandas(review_frame(pd.read_csv(csv_path, low_memory=False)),
+                                     preserve_index=False)
+        return atomic_write(path, lambda p: pq.write_table(table, p))
+
+    schema = review_schema(pd.read_csv(csv_path, nrows=0).columns)
+
+    def write(tmp):
+        with pq.ParquetWriter(tmp, schema) as writer:
+            for chunk in pd.read_csv(csv_path, usecols=schema.names, chunksize=chunksize, low_memory=False):
+                writer.write_table(pa.Table.from_pandas(review_frame(chunk), schema=schema,
+                                                        preserve_index=False))
+    return atomic_write(path, write)
+
+
+def ensure_reviews_table(csv_path: Path = ENRICHED_CSV, path: Path = REVIEWS_PARQUET,
+                         chunksize: Optional[int] = None) -> Path:
+    """(Re)build the review table from the enriched CSV when it is out of date."""
+    if reviews_table_stale(csv_path, path):
+        write_reviews_table(csv_path, path, chunksize)
+    return path
+
+
+def review_columns(path: Path = REVIEWS_PARQUET) -> list:
+    return pq.read_schema(path).names
+
+
+def read_reviews(columns: Optional[list] = None, path: Path = REVIEWS_PARQUET) -> pd.DataFrame:
+    """Memory-mapped read of the review table, limited to `columns` that exist."""
+    if columns is not None:
+        available = set(review_columns(path))
+        columns = [c for c in columns if c in available]
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+# ---------- Topic assignments ----------
+def read_topics_manifest(path: Path = TOPICS_MANIFEST) -> dict:
+    """{lang: {"models": {k: ...}, "search": {...}}}; {} if missing or unreadable."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def assignments_table(dom_df: pd.DataFrame) -> pa.Table:
+    """Slim Arrow table from a frame with row_idx, topic_id (NaN = none) and topic_prob."""
+    return pa.table({
+        "row_idx": pa.array(dom_df["row_idx"].to_numpy(), pa.int32()),
+        "topic_id": pa.array(dom_df["topic_id"].to_numpy(), pa.int16(),
+                             mask=dom_df["topic_id"].isna().to_numpy()),
+        "topic_prob": pa.array(dom_df["topic_prob"].to_numpy(), pa.float32()),
+    }, schema=ASSIGNMENT_SCHEMA)
+
+
+def write_assignments(dom_df: pd.DataFrame, path: Path) -> Path:
+    table = assignments_table(dom_df)
+    return atomic_write(path, lambda p: pq.write_table(table, p))
+
+
+def read_assignments(lang_code: str, n_topics: int, columns: Optional[list] = None) -> pd.DataFrame:
+    return pq.read_table(assignments_path(lang_code, n_topics), columns=columns,
+                         memory_map=True).to_pandas()
+
+
+def attach_context(assign_df: pd.DataFrame, lang_code: str, columns: list = CONTEXT_COLS,
+                   path: Path = REVIEWS_PARQUET) -> pd.DataFrame:
+    """Join review columns onto assignments via the language-relative row_idx."""
+    reviews = read_reviews(["lang"] + list(columns), path)
+    reviews = reviews[reviews["lang"].eq(lang_code)].drop(columns="lang").reset_index(drop=True)
+    rows = assign_df["row_idx"].to_numpy()
+    valid = rows < len(reviews)
+    out = assign_df[valid].reset_index(drop=True)
+    context = reviews.iloc[rows[valid]].reset_index(drop=True)
+    for c in context.columns:
+        out[c] = context[c].to_numpy()
+    return out
+
+
+def dom_csv_to_assignments(csv_path: Path) -> pd.DataFrame:
+    """Read a legacy dom_{lang}_{k}.csv, keeping only the assignment columns."""
+    dom = pd.read_csv(csv_path, usecols=["row_idx", "topic_id", "topic_prob"])
+    dom["topic_id"] = dom["topic_id"].astype("float64")
+    return dom
+
+
+
+# ---------- Place keywords ----------
+def read_place_keywords(path: Path = PLACE_KEYWORDS) -> pd.Series:
+    """place_id -> ", "-joined top keywords; empty if the artifact is missing or unreadable."""
+    try:
+        table = pq.read_table(path, columns=["place_id", "keywords"], memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return pd.Series(dtype=object)
+    return pd.Series(table.column("keywords").to_numpy(zero_copy_only=False),
+                     index=table.column("place_id").to_numpy(zero_copy_only=False), dtype=object)
+
+
+def keywords_stale(path: Path = PLACE_KEYWORDS, sources: Iterable[Path] = (ENRICHED_CSV, REVIEWS_PARQUET)) -> bool:
+    """True if the keywords are missing or older than any of the review files."""
+    if not path.exists():
+        return True
+    built = path.stat().st_mtime
+    return any(p.exists() and p.stat().st_mtime > built for p in sources)
@@ -0,0 +1,49 @@
+"""One-shot converter from the legacy CSV outputs to the Parquet artifact layout.
+
+Builds output/reviews.parquet from reviews_enriched.csv and turns every
+dom_{lang}_{k}.csv into a slim assign_{lang}_{k}.parquet (see artifact_store).
+"""
+import argparse
+
+from artifact_store import (
+    ENRICHED_CSV, OUTPUT_DIR, REVIEWS_PARQUET, assignments_path,
+    dom_csv_to_assignments, write_assignments, write_reviews_table,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CSV outputs to Parquet artifacts")
+    parser.add_argument("--delete-csv", action="store_true",
+                        help="Remove each dom_*.csv once its Parquet version is written")
+    parser.add_argument("--force", action="store_true",
+                        help="Overwrite Parquet artifacts that already exist")
+    args = parser.parse_args()
+
+    if ENRICHED_CSV.exists():
+        if args.force or not REVIEWS_PARQUET.exists():
+            write_reviews_table()
+            print(f"✓ Saved review table -> {REVIEWS_PARQUET}")
+        else:
+            print(f"Keeping existing review table: {REVIEWS_PARQUET}")
+    else:
+        print(f"Missing enriched CSV: {ENRICHED_CSV} (assignments are converted anyway)")
+
+    for csv_path in sorted(OUTPUT_DIR.glob("dom_*_*.csv")):
+        try:
+            lang_code, n_topics = csv_path.stem.split("_")[1:]
+            n_topics = int(n_topics)
+        except ValueError:
+            print(f"Skipping unrecognized file: {csv_path.name}")
+            continue
+        target = assignments_path(lang_code, n_topics)
+        if target.exists() and not args.force:
+            print(f"Keeping existing assignments: {target.name}")
+        else:
+            write_assignments(dom_csv_to_assignments(csv_path), target)
+            print(f"✓ {csv_path.name} -> {target.name}")
+        if args.delete_csv:
+            csv_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Build output/reviews_enriched.csv from output/reviews_raw.csv without the notebook.
+
+Runs the same cleaning, language detection, tokenization and sentiment steps
+as notebooks/reviews_pipeline.ipynb. The raw CSV is streamed in chunks,
+language detection and tokenization run in a process pool (each worker loads
+its NLTK stopwords, lemmatizer and stemmer once), sentiment is scored per
+chunk by sentiment_engine in the main process, and chunks are written back in
+input order. Throughput is reported per stage.
+
+Results are looked up in the NLP cache (nlp_cache.py) by cleaned-text hash
+and stage version first, so only new or changed reviews are analyzed.
+
+When writing the default output, the review table (reviews.parquet) and the
+dashboard's aggregate cube (review_cube.py) are rebuilt afterwards.
+"""
+import argparse
+import ast
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from artifact_store import ENRICHED_CSV, OUTPUT_DIR, RAW_CSV, atomic_write, read_reviews, write_reviews_table
+from nlp_cache import MAX_ENTRIES, MISSING, NLP_CACHE_PATH, NLPCache, dist_version, text_key
+from review_cube import SOURCE_COLS as CUBE_COLS, build_cube, save_cube
+from sentiment_engine import BATCH_SIZE, load_scorers, score_frame
+
+# Raw rows per chunk handed to a worker
+CHUNKSIZE = 2000
+# Languages kept in the enriched output (as in the notebook)
+KEEP_LANGS = ["en", "pt"]
+STAGES = ["clean", "language", "tokens", "sentiment"]
+NLTK_RESOURCES = {
+    "corpora/stopwords": "stopwords",
+    "corpora/wordnet": "wordnet",
+    "stemmers/rslp": "rslp",
+    "tokenizers/punkt": "punkt",
+}
+
+# Per-process NLP state, filled by init_worker()
+_nlp = {}
+
+
+def init_worker():
+    from langdetect import DetectorFactory
+    from nltk.corpus import stopwords
+    from nltk.stem import RSLPStemmer, WordNetLemmatizer
+
+    DetectorFactory.seed = 0  # langdetect is randomized; make runs reproducible
+    stop_en = set(stopwords.words("english"))
+    try:
+        stop_pt = set(stopwords.words("portuguese"))
+    except Exception:
+        stop_pt = set()
+    _nlp.update(
+        stop_en=stop_en,
+        stop_pt=stop_pt,
+        stop_all=stop_en.union(stop_pt),
+        lemmatizer=WordNetLemmatizer(),
+        rslp=RSLPStemmer(),
+    )
+
+
+def ensure_nltk_data() -> list:
+    """Download missing NLTK resources; returns the ones still unavailable."""
+    import nltk
+
+    missing = []
+    for resource, package in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            if not nltk.download(package, quiet=True):
+                missing.append(package)
+    return missing
+
+
+# ---------- Text processing (same rules as the notebook) ----------
+def clean_text(s: str) -> str:
+    s = str(s)
+    s = re.sub(r"<[^>]+>", " ", s)                # HTML
+    s = re.sub(r"http\S+|www\S+", " ", s)        # URLs
+    s = re.sub(r"[^\w\sáéíóúàèìòùâêîôûçãõÁÉÍÓÚÀÈÌÒÙÂÊÎÔÛÇÃÕ]", " ", s)  # keep basic accented chars
+    s = re.sub(r"\s+", " ", s)
+    return s.strip().lower()
+
+
+def language_or_none(s: str):
+    from langdetect import detect
+
+    try:
+        return detect(s)
+    except Exception:
+        return None
+
+
+def simple_tokenize(s: str) -> list:
+    from nltk.tokenize import word_tokenize
+
+    try:
+        return [t for t in word_tokenize(s) if t]
+    except Exception:
+        return re.findall(r"\b\w+\b", s, flags=re.UNICODE)
+
+
+def tokens_for_lang(s: str, lang) -> list:
+    toks = simple_tokenize(s)
+    if lang == "pt":
+        toks = [t for t in toks if t.isalpha() and t not in _nlp["stop_pt"] and len(t) > 2]
+        return [_nlp["rslp"].stem(t) for t in toks]
+    if lang == "en":
+        toks = [t for t in toks if t.isalpha() and t not in _nlp["stop_en"] and len(t) > 2]
+        return [_nlp["lemmatizer"].lemmatize(t) for t in toks]
+    # Unknown language: bilingual stopwords, English lemmatizer as a light normalization
+    toks = [t for t in toks if t.isalpha() and t.lower() not in _nlp["stop_all"] and len(t) > 2]
+    return [_nlp["lemmatizer"].lemmatize(t) for t in toks]
+
+
+def parse_loc(x) -> dict:
+    if isinstance(x, dict):
+        return x
+    if pd.isna(x):
+        return {}
+    try:
+        return ast.literal_eval(str(x))
+    except Exception:
+        return {}
+
+
+# ---------- Stages ----------
+def stage_versions() -> dict:
+    """Cache versions of the worker stages; bump the suffix when their rules change."""
+    return {
+        "language": f"langdetect-{dist_version('langdetect')}-seed0",
+        "tokens": f"nltk-{dist_version('nltk')}-rslp-wordnet-1",
+    }
+
+
+def clean_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Coordinates and review_text_clean for one raw chunk (cheap, runs in the main process)."""
+    if "place_location" in chunk.columns and ("lat" not in chunk.columns or "lon" not in chunk.columns):
+        locs = chunk["place_location"].map(parse_loc)
+        chunk["lat"] = locs.map(lambda d: d.get("latitude") if isinstance(d, dict) else None)
+        chunk["lon"] = locs.map(lambda d: d.get("longitude") if isinstance(d, dict) else None)
+    chunk["review_text_clean"] = chunk["review_text"].fillna("").map(clean_text)
+    return chunk
+
+
+def analyze_texts(texts: list) -> tuple:
+    """Language and tokens (None outside KEEP_LANGS) for cleaned texts; runs in the workers.
+
+    Returns (langs, tokens, {stage: seconds}).
+    """
+    if not _nlp:
+        init_worker()
+    t0 = time.perf_counter()
+    langs = [language_or_none(s) for s in texts]
+    t1 = time.perf_counter()
+    tokens = [tokens_for_lang(s, lang) if lang in KEEP_LANGS else None for s, lang in zip(texts, langs)]
+    t2 = time.perf_counter()
+    return langs, tokens, {"language": t1 - t0, "tokens": t2 - t1}
+
+
+def lookup_chunk(texts: list, cache, versions: dict) -> tuple:
+    """Cached (langs, tokens) per text, MISSING where absent, and the positions left to analyze."""
+    n = len(texts)
+    if cache is None:
+        return [MISSING] * n, [MISSING] * n, list(range(n))
+    langs = cache.get_many("language", versions["language"], [text_key(t) for t in texts])
+    kept = [i for i, lang in enumerate(langs) if lang in KEEP_LANGS]
+    tokens = [MISSING] * n
+    found = cache.get_many("tokens", versions["tokens"], [text_key(texts[i], langs[i]) for i in kept])
+    for i, toks in zip(kept, found):
+        tokens[i] = toks
+    todo = [i for i, lang in enumerate(langs)
+            if lang is MISSING or (lang in KEEP_LANGS and tokens[i] is MISSING)]
+    return langs, tokens, todo
+
+
+def store_results(cache, versions: dict, texts: list, todo: list, langs: list, tokens: list):
+    cache.put_many("language", versions["language"], [text_key(texts[i]) for i in todo], [langs[i] for i in todo])
+    done = [i for i in todo if langs[i] in KEEP_LANGS]
+    cache.put_many("tokens", versions["tokens"], [text_key(texts[i], langs[i]) for i in done],
+                   [tokens[i] for i in done])
+
+
+# ---------- Driver ----------
+def ordered_results(executor, fn, items, max_pending: int, arg=lambda item: item):
+    """executor.submit(fn, arg(item)) with at most `max_pending` in flight, yielding (item, result) in order."""
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(fn, arg(item))))
+        if len(pending) >= max_pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+def read_chunks(path: Path, chunksize: int):
+    yield from pd.read_csv(path, chunksize=chunksize, low_memory=False)
+
+
+def run(input_path: Path, output_path: Path, jobs: int, chunksize: int, scorers: dict,
+        cache: Optional[NLPCache] = None) -> dict:
+    """Enrich `input_path` into `output_path`; returns {stage: {"rows", "cached", "seconds"}}.
+
+    "rows" counts rows a stage computed, "cached" rows answered by `cache`;
+    stats["written"] is the number of rows in the output.
+    """
+    stats = {stage: {"rows": 0, "cached": 0, "seconds": 0.0} for stage in STAGES}
+    stats["written"] = 0
+    versions = stage_versions()
+
+    def prepared(chunks):
+        for chunk in chunks:
+            t0 = time.perf_counter()
+            chunk = clean_chunk(chunk)
+            stats["clean"]["seconds"] += time.perf_counter() - t0
+            stats["clean"]["rows"] += len(chunk)
+            texts = chunk["review_text_clean"].tolist()
+            yield (chunk, texts) + lookup_chunk(texts, cache, versions)
+
+    def todo_texts(item):
+        _, texts, _, _, todo = item
+        return [texts[i] for i in todo]
+
+    def write_all(results, tmp: Path):
+        first = True
+        for (chunk, texts, langs, tokens, todo), (new_langs, new_tokens, timings) in results:
+            for stage, secs in timings.items():
+                stats[stage]["seconds"] += secs
+            for i, lang, toks in zip(todo, new_langs, new_tokens):
+                langs[i], tokens[i] = lang, toks
+            if cache is not None:
+                store_results(cache, versions, texts, todo, langs, tokens)
+            n_kept = sum(lang in KEEP_LANGS for lang in langs)
+            n_new = sum(lang in KEEP_LANGS for lang in new_langs)
+            stats["language"]["rows"] += len(todo)
+            stats["language"]["cached"] += len(texts) - len(todo)
+            stats["tokens"]["rows"] += n_new
+            stats["tokens"]["cached"] += n_kept - n_new
+
+            chunk["lang"] = langs
+            chunk["tokens"] = tokens
+            chunk = chunk[chunk["lang"].isin(KEEP_LANGS)].copy()
+            chunk["token_count"] = chunk["tokens"].map(len)
+            chunk["text_processed"] = chunk["tokens"].map(" ".join)
+
+            hits = cache.hits.get("sentiment", 0) if cache is not None else 0
+            t0 = time.perf_counter()
+            chunk = score_frame(chunk, scorers, cache=cache)
+            stats["sentiment"]["seconds"] += time.perf_counter() - t0
+            hits = (cache.hits.get("sentiment", 0) if cache is not None else 0) - hits
+            stats["sentiment"]["rows"] += int(chunk["lang"].isin(list(scorers)).sum()) - hits
+            stats["sentiment"]["cached"] += hits
+            chunk.to_csv(tmp, mode="w" if first else "a", header=first, index=False)
+            stats["written"] += len(chunk)
+            first = False
+
+    def write(tmp: Path):
+        items = prepared(read_chunks(input_path, chunksize))
+        if jobs == 1:
+            init_worker()
+            write_all(((item, analyze_texts(todo_texts(item))) for item in items), tmp)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as ex:
+                write_all(ordered_results(ex, analyze_texts, items, 2 * jobs, arg=todo_texts), tmp)
+
+    atomic_write(output_path, write)
+    return stats
+
+
+def report(stats: dict, elapsed: float, jobs: int):
+    print(f"{'Stage':<10} {'rows':>9} {'cached':>9} {'busy s':>9} {'rows/s':>10}")
+    for stage in STAGES:
+        rows, cached, secs = stats[stage]["rows"], stats[stage]["cached"], stats[stage]["seconds"]
+        rate = f"{rows / secs:,.0f}" if secs > 0 else "-"
+        print(f"{stage:<10} {rows:>9,} {cached:>9,} {secs:>9.2f} {rate:>10}")
+    print(f"(rows/s per busy worker over computed rows; {jobs} worker(s) for language/tokens, "
+          "clean and sentiment in the main process)")
+    total = stats["clean"]["rows"]
+    print(f"Overall: {total:,} raw rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrich raw reviews (clean text, language, tokens, sentiment)")
+    parser.add_argument("--input", type=Path, default=RAW_CSV,
+                        help=f"Raw reviews CSV (default: {RAW_CSV.relative_to(OUTPUT_DIR.parent)})")
+    parser.add_argument("--output", type=Path, default=ENRICHED_CSV,
+                        help=f"Enriched CSV to write (default: {ENRICHED_CSV.relative_to(OUTPUT_DIR.parent)})")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for language detection and tokenization; cleaning and "
+                             "sentiment run in the main process (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE,
+                        help=f"Raw rows per chunk (default: {CHUNKSIZE})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Portuguese transformer batch size (default: {BATCH_SIZE})")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="torch threads for Portuguese sentiment (default: torch's)")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Use dynamically quantized int8 weights for Portuguese sentiment")
+    parser.add_argument("--cache", type=Path, default=NLP_CACHE_PATH,
+                        help=f"Per-review NLP cache (default: {NLP_CACHE_PATH.relative_to(OUTPUT_DIR.parent)})")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every review, ignoring the cache")
+    parser.add_argument("--cache-max-entries", type=int, default=MAX_ENTRIES,
+                        help=f"Evict least recently used cache rows beyond this (default: {MAX_ENTRIES:,})")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        print(f"Missing raw reviews CSV: {args.input}")
+        return
+    missing = ensure_nltk_data()
+    if missing:
+        print(f"Missing NLTK data: {', '.join(missing)} (install with nltk.download(...))")
+        return
+
+    print(f"Enriching {args.input} with {args.jobs} worker(s), {args.chunksize} rows per chunk...")
+    t0 = time.time()
+    scorers = load_scorers(args.batch_size, args.torch_threads, args.quantize)
+    print("Sentiment: " + ", ".join(f"{lang}={s.name}" for lang, s in scorers.items()))
+    cache = None if args.no_cache else NLPCache(args.cache, args.cache_max_entries)
+    try:
+        stats = run(args.input, args.output, max(1, args.jobs), args.chunksize, scorers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"✓ Saved enriched reviews ({stats['written']:,} rows) -> {args.output}")
+    report(stats, time.time() - t0, max(1, args.jobs))
+
+    # Precompute what the dashboard would otherwise build on its first load
+    if args.output.resolve() == ENRICHED_CSV.resolve():
+        print(f"✓ Saved review table -> {write_reviews_table()}")
+        cube = build_cube(read_reviews(CUBE_COLS))
+        print(f"✓ Saved review cube ({len(cube['count']):,} cells) -> {save_cube(cube)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Fetch Google Places reviews for the OSM POIs into output/reviews_raw.csv.
+
+Same requests and output as the notebook's fetch loop (Nearby Search around
+each POI, places deduplicated by id in POI order), but:
+
+- requests share one pooled HTTP session and run on a bounded thread pool
+- a token bucket caps the request rate at the API quota (--qps)
+- failed requests are retried MAX_RETRIES times, sleeping BACKOFF_FACTOR ** attempt
+  seconds (or the server's Retry-After) on timeouts, 429 and 5xx
+- every finished POI is appended to a JSONL checkpoint, so a rerun skips the
+  POIs already fetched and retries only the ones that failed
+
+POIs are grouped into shared query circles first (query_planner.py), so
+overlapping POIs cost one request instead of one each.
+
+`--url` points the fetcher at another endpoint for testing, e.g. the local
+stub in places_stub.py (whose --check runs this script against it).
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from artifact_store import BASE_DIR, OUTPUT_DIR, RAW_CSV, atomic_write
+from query_planner import (
+    MAX_RESULTS, QUERY_RADIUS, assign_places, plan_queries, plan_summary, saturated, split_group,
+)
+
+POIS_CSV = BASE_DIR.parent / "Milestone_2" / "pois_aveiro.csv"
+CHECKPOINT_PATH = OUTPUT_DIR / "fetch_checkpoint.jsonl"
+PLACES_URL = "https://places.googleapis.com/v1/places:searchNearby"
+FIELD_MASK = "places.displayName,places.id,places.reviews,places.location,places.rating,places.primaryType"
+
+# Fetch configuration (as in the notebook)
+RADIUS_METERS = 25
+MAX_PLACES_PER_POI = 1000       # the API returns at most 20 per request
+MAX_TOTAL_POIS = 1000           # None to process all
+INCLUDED_TYPES = None           # e.g. ["restaurant", "cafe"]
+REQUEST_TIMEOUT = 20
+
+# Retry configuration
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 1.6
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Concurrency and quota
+CONCURRENCY = 8
+QPS = 10.0                      # the notebook's SLEEP_BETWEEN_REQUESTS = 0.1
+POI_CONTEXT_COLS = ["amenity", "shop", "tourism", "name"]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def ewkb_hex_point_to_lonlat(hex_str: str) -> Optional[Tuple[float, float]]:
+    """Convert EWKB hex POINT (SRID=4326) to (lon, lat)."""
+    from shapely import wkb
+
+    if not isinstance(hex_str, str) or not hex_str:
+        return None
+    try:
+        geom = wkb.loads(bytes.fromhex(hex_str))
+        if geom.geom_type == "Point":
+            return (geom.x, geom.y)
+    except Exception:
+        pass
+    return None
+
+
+def make_session(pool_size: int, api_key: str) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "X-Goog-FieldMask": FIELD_MASK,
+        "X-Goog-Api-Key": api_key,
+        "Content-Type": "application/json",
+    })
+    return session
+
+
+def retry_delay(attempt: int, response: Optional[requests.Response]) -> float:
+    delay = BACKOFF_FACTOR ** attempt
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("Retry-After", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+def places_search_nearby(
+    session: requests.Session,
+    bucket: TokenBucket,
+    lat: float,
+    lon: float,
+    url: str = PLACES_URL,
+    radius: int = RADIUS_METERS,
+    included_types: Optional[List[str]] = INCLUDED_TYPES,
+    max_results: int = MAX_PLACES_PER_POI,
+    max_retries: int = MAX_RETRIES,
+) -> Optional[List[Dict[str, Any]]]:
+    """Nearby Search (single page); list of place dicts, or None once retries are exhausted."""
+    payload: Dict[str, Any] = {
+        "locationRestriction": {
+            "circle": {"center": {"latitude": lat, "longitude": lon}, "radius": radius}
+        },
+        "maxResultCount": min(max_results, MAX_RESULTS),
+    }
+    if included_types:
+        payload["includedTypes"] = included_types
+
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        response = None
+        try:
+            response = session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                data = response.json()
+                return data.get("places", []) if isinstance(data, dict) else []
+            error = f"HTTP {response.status_code}"
+        except requests.exceptions.HTTPError as e:
+            print(f"Error during API request (not retried): {e}")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error = str(e)
+        if attempt < max_retries:
+            time.sleep(retry_delay(attempt + 1, response))
+    print(f"Error during API request after {max_retries} retries: {error}")
+    return None
+
+
+def extract_reviews_from_places(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    rows = []
+    for p in places:
+        ploc = p.get("location") or {}
+        for r in p.get("reviews") or []:
+            rows.append({
+                "place_id": p.get("id"),
+                "place_name": (p.get("displayName") or {}).get("text", None),
+                "place_rating": p.get("rating"),
+                "place_primary_type": p.get("primaryType"),
+                "place_location": ploc,
+                "author_name": (r.get("authorAttribution") or {}).get("displayName", "Unknown"),
+                "rating": r.get("rating"),
+                "review_text": (r.get("text") or {}).get("text", ""),
+                "publish_time": r.get("publishTime"),
+            })
+    return rows
+
+
+# ---------- POIs & checkpoint ----------
+def load_pois(path: Path, limit: Optional[int]) -> Tuple[pd.DataFrame, list]:
+    """POI frame and [(row index, lat, lon)] for the first `limit` POIs with a point geometry."""
+    df_pois = pd.read_csv(path, low_memory=False)
+    geom_col = next((c for c in ["geom_pt", "geom"] if c in df_pois.columns), None)
+    if geom_col is None:
+        raise ValueError("No EWKB point column ('geom_pt' or 'geom') found in POIs CSV.")
+    targets = []
+    for idx, hex_point in df_pois[geom_col].items():
+        if limit and len(targets) >= limit:
+            break
+        lonlat = ewkb_hex_point_to_lonlat(hex_point)
+        if lonlat:
+            targets.append((idx, lonlat[1], lonlat[0]))
+    return df_pois, targets
+
+
+def read_checkpoint(path: Path) -> dict:
+    """{poi row index: places} for every POI recorded in the checkpoint."""
+    done = {}
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            done[rec["poi"]] = rec["places"]
+    return done
+
+
+def append_checkpoint(f, poi, places: list):
+    f.write(json.dumps({"poi": poi, "places": places}, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def reviews_frame(df_pois: pd.DataFrame, targets: list, done: dict) -> Tuple[pd.DataFrame, int]:
+    """Raw review rows in POI order, each place kept at its first POI (as in the notebook)."""
+    out_rows = []
+    seen_place_ids = set()
+    for idx, _, _ in targets:
+        if idx not in done:
+            continue
+        unique_places = []
+        for p in done[idx]:
+            pid = p.get("id")
+            if pid and pid not in seen_place_ids:
+                unique_places.append(p)
+                seen_place_ids.add(pid)
+        rows = extract_reviews_from_places(unique_places)
+        poi = df_pois.loc[idx]
+        for r in rows:
+            r["poi_row_index"] = idx
+            if "gid" in df_pois.columns:
+                r["poi_gid"] = poi.get("gid")
+            for c in POI_CONTEXT_COLS:
+                if c in df_pois.columns:
+                    r[f"poi_{c}"] = poi.get(c)
+        out_rows.extend(rows)
+
+    df_raw = pd.DataFrame(out_rows)
+    if not df_raw.empty:
+        df_raw["lat"] = df_raw["place_location"].map(lambda d: d.get("latitude"))
+        df_raw["lon"] = df_raw["place_location"].map(lambda d: d.get("longitude"))
+    return df_raw, len(seen_place_ids)
+
+
+def fetch_group(session: requests.Session, bucket: TokenBucket, group: dict, url: str, radius: int) -> tuple:
+    """({poi: places} for the group's POIs that were fetched, requests sent)."""
+    members = group["members"]
+    if len(members) == 1:
+        idx, lat, lon = members[0]
+        places = places_search_nearby(session, bucket, lat, lon, url=url, radius=radius)
+        return ({idx: places} if places is not None else {}), 1
+    places = places_search_nearby(session, bucket, group["lat"], group["lon"], url=url, radius=group["radius"])
+    if places is None:
+        return {}, 1
+    if not saturated(places, min(MAX_PLACES_PER_POI, MAX_RESULTS)):
+        return assign_places(places, members, radius), 1
+    # A full page may hide places: split the group into circles of half the size and query those
+    out, sent = {}, 1
+    for sub in split_group(group, radius):
+        fetched, n = fetch_group(session, bucket, sub, url, radius)
+        out.update(fetched)
+        sent += n
+    return out, sent
+
+
+def fetch(groups: list, done: dict, checkpoint: Path, session: requests.Session, bucket: TokenBucket,
+          url: str, radius: int, concurrency: int) -> tuple:
+    """Run the planned queries, checkpointing each finished POI; returns (failed POIs, requests sent)."""
+    failed = requests_sent = 0
+    with open(checkpoint, "a", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=concurrency) as ex:
+        futures = {ex.submit(fetch_group, session, bucket, g, url, radius): g for g in groups}
+        for n, future in enumerate(as_completed(futures), 1):
+            members = futures[future]["members"]
+            fetched, sent = future.result()
+            requests_sent += sent
+            for idx, _, _ in members:
+                if idx in fetched:
+                    done[idx] = fetched[idx]
+                    append_checkpoint(f, idx, fetched[idx])
+                else:
+                    failed += 1  # not checkpointed, so the next run retries it
+            if n % 100 == 0 or n == len(groups):
+                print(f"  {n:,}/{len(groups):,} queries done ({failed:,} POIs failed)")
+    return failed, requests_sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch Google Places reviews for the OSM POIs")
+    parser.add_argument("--pois", type=Path, default=POIS_CSV, help=f"POI CSV with EWKB geometry (default: {POIS_CSV})")
+    parser.add_argument("--output", type=Path, default=RAW_CSV,
+                        help=f"Raw reviews CSV (default: {RAW_CSV.relative_to(OUTPUT_DIR.parent)})")
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH,
+                        help=f"Per-POI checkpoint (default: {CHECKPOINT_PATH.relative_to(OUTPUT_DIR.parent)})")
+    parser.add_argument("--fresh", action="store_true", help="Discard the checkpoint and fetch every POI again")
+    parser.add_argument("--max-pois", type=int, default=MAX_TOTAL_POIS,
+                        help=f"POIs to process, 0 for all (default: {MAX_TOTAL_POIS})")
+    parser.add_argument("--radius", type=int, default=RADIUS_METERS,
+                        help=f"Search radius in meters (default: {RADIUS_METERS})")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Requests in flight (default: {CONCURRENCY})")
+    parser.add_argument("--qps", type=float, default=QPS, help=f"Request rate limit per second (default: {QPS})")
+    parser.add_argument("--url", default=PLACES_URL, help="Nearby Search endpoint (default: Google Places API v1)")
+    parser.add_argument("--query-radius", type=float, default=QUERY_RADIUS,
+                        help=f"Max radius (m) of a coalesced query circle; <= --radius disables coalescing "
+                             f"(default: {QUERY_RADIUS})")
+    parser.add_argument("--plan-only", action="store_true", help="Print the query plan and exit without fetching")
+    args = parser.parse_args()
+
+    if not args.pois.exists():
+        print(f"Missing POI CSV: {args.pois}")
+        return
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and args.url == PLACES_URL and not args.plan_only:
+        print("Set GOOGLE_API_KEY to fetch from the Places API")
+        return
+
+    t0 = time.time()
+    df_pois, targets = load_pois(args.pois, args.max_pois or None)
+    if args.fresh and args.checkpoint.exists() and not args.plan_only:
+        args.checkpoint.unlink()
+    done = {} if args.fresh else read_checkpoint(args.checkpoint)
+    todo = [t for t in targets if t[0] not in done]
+    groups = plan_queries(todo, args.radius, args.query_radius)
+    print(f"Planned {plan_summary(groups)}; {len(targets) - len(todo):,} POIs from checkpoint")
+    if args.plan_only:
+        return
+    print(f"Fetching with {args.concurrency} in flight, {args.qps:g} req/s")
+
+    session = make_session(args.concurrency, api_key or "")
+    failed, requests_sent = fetch(groups, done, args.checkpoint, session, TokenBucket(args.qps),
+                                  args.url, args.radius, max(1, args.concurrency))
+    print(f"  {requests_sent:,} requests for {len(todo):,} POIs "
+          f"({len(todo) - requests_sent:,} saved, including re-queries of full pages)")
+
+    df_raw, n_places = reviews_frame(df_pois, targets, done)
+    if df_raw.empty:
+        print("No reviews fetched.")
+        return
+    atomic_write(args.output, lambda tmp: df_raw.to_csv(tmp, index=False))
+    print(f"✓ Saved {len(df_raw):,} raw reviews -> {args.output}")
+    print(f"  Total unique places fetched: {n_places:,}")
+    if failed:
+        print(f"  {failed:,} POIs failed after {MAX_RETRIES} retries; rerun to retry them")
+    print(f"  ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
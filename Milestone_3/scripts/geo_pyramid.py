@@ -0,0 +1,208 @@
+"""Multi-resolution geo-grid pyramid behind the dashboard heatmaps.
+
+Each level covers one map zoom with square cells of CELL_PX screen pixels.
+Per level we store additive partials, one row per
+(cell, language, primary type, rating bucket, place name):
+
+    count, rating_sum, rating_sq, lat_sum, lon_sum
+
+Sidebar filters only select partials (every filter column is part of the
+key), so a filtered heatmap is a group-by over the surviving partials instead
+of a rescan of the reviews. Mean/std rating, centroid and modal place name
+and type per cell all follow from the sums.
+
+Run as a script to (re)build output/geo_pyramid.npz:
+    python3 scripts/geo_pyramid.py
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import (
+    ENRICHED_CSV, OUTPUT_DIR, REVIEWS_PARQUET, atomic_write, ensure_reviews_table, read_reviews,
+)
+
+PYRAMID_PATH = OUTPUT_DIR / "geo_pyramid.npz"
+# One level per map zoom in this range
+MIN_LEVEL, MAX_LEVEL = 8, 18
+# Cell edge in screen pixels at the level's zoom
+CELL_PX = 16
+# Ratings are bucketed to the dashboard slider's 0.1 step
+RATING_SCALE = 10
+
+KEY_COLS = ["cell_lat", "cell_lon", "lang", "ptype", "rating_bucket", "name"]
+SUM_COLS = ["count", "rating_sum", "rating_sq", "lat_sum", "lon_sum"]
+SOURCE_COLS = ["lat", "lon", "rating", "lang", "place_primary_type", "place_name"]
+
+
+def cell_size(level: int, cell_px: int = CELL_PX) -> float:
+    """Cell edge in degrees at a zoom level (Web Mercator, 256 px tiles)."""
+    return 360.0 / (256 * 2 ** level) * cell_px
+
+
+def dictionary(values: pd.Series) -> tuple:
+    """(codes, sorted unique strings); missing values get code -1."""
+    codes, uniques = pd.factorize(values.astype(object), sort=True)
+    return codes, np.asarray([str(u) for u in uniques])
+
+
+# ---------- Build ----------
+def build_pyramid(df: pd.DataFrame, levels: Iterable[int] = range(MIN_LEVEL, MAX_LEVEL + 1),
+                  cell_px: int = CELL_PX) -> dict:
+    """Arrays for every level plus the language/type/name dictionaries."""
+    df = df.dropna(subset=["lat", "lon", "place_name", "rating"])
+    lat = df["lat"].to_numpy(dtype=np.float64)
+    lon = df["lon"].to_numpy(dtype=np.float64)
+    rating = df["rating"].to_numpy(dtype=np.float64)
+    lang_codes, langs = dictionary(df["lang"])
+    ptype_codes, ptypes = dictionary(df["place_primary_type"])
+    name_codes, names = dictionary(df["place_name"])
+
+    base = pd.DataFrame({
+        "lang": lang_codes.astype(np.int8),
+        "ptype": ptype_codes.astype(np.int16),
+        "rating_bucket": np.rint(rating * RATING_SCALE).astype(np.int16),
+        "name": name_codes.astype(np.int32),
+        "count": np.ones(len(df), dtype=np.int32),
+        "rating_sum": rating,
+        "rating_sq": rating * rating,
+        "lat_sum": lat,
+        "lon_sum": lon,
+    })
+
+    arrays = {
+        "levels": np.asarray(list(levels), dtype=np.int16),
+        "cell_px": np.asarray(cell_px),
+        "langs": langs,
+        "ptypes": ptypes,
+        "names": names,
+    }
+    for level in arrays["levels"]:
+        size = cell_size(int(level), cell_px)
+        frame = base.assign(
+            cell_lat=np.floor(lat / size).astype(np.int32),
+            cell_lon=np.floor(lon / size).astype(np.int32),
+        )
+        partials = frame.groupby(KEY_COLS, sort=True)[SUM_COLS].sum().reset_index()
+        for col in KEY_COLS + SUM_COLS:
+            arrays[f"L{level}_{col}"] = partials[col].to_numpy(dtype=base[col].dtype if col in base else np.int32)
+    return arrays
+
+
+def save_pyramid(arrays: dict, path: Path = PYRAMID_PATH) -> Path:
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+    return atomic_write(path, write)
+
+
+def pyramid_stale(path: Path = PYRAMID_PATH, sources: Iterable[Path] = (ENRICHED_CSV, REVIEWS_PARQUET)) -> bool:
+    """True if the pyramid is missing or older than any of the review files."""
+    if not path.exists():
+        return True
+    built = path.stat().st_mtime
+    return any(p.exists() and p.stat().st_mtime > built for p in sources)
+
+
+def load_pyramid(path: Path = PYRAMID_PATH) -> dict:
+    with np.load(path, allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+# ---------- Query ----------
+def pick_level(pyramid: dict, zoom: float) -> int:
+    """Finest stored level not finer than the map zoom."""
+    levels = pyramid["levels"]
+    fitting = levels[levels <= int(round(zoom))]
+    return int(fitting.max() if len(fitting) else levels.min())
+
+
+def matching_codes(dictionary_values: np.ndarray, selected: Iterable) -> np.ndarray:
+    return np.flatnonzero(np.isin(dictionary_values, list(selected)))
+
+
+def query_cells(
+    pyramid: dict,
+    zoom: float,
+    langs: Iterable,
+    rating_range: tuple,
+    ptypes: Optional[Iterable] = None,
+    place_query: str = "",
+) -> pd.DataFrame:
+    """Per-cell aggregates for the sidebar filters at the level matching `zoom`.
+
+    Columns: lat, lon (review centroid), n_reviews, rating, rating_std,
+    place_name, place_primary_type (modal among the filtered reviews).
+    """
+    level = pick_level(pyramid, zoom)
+    part = {c: pyramid[f"L{level}_{c}"] for c in KEY_COLS + SUM_COLS}
+
+    lo = int(round(rating_range[0] * RATING_SCALE))
+    hi = int(round(rating_range[1] * RATING_SCALE))
+    mask = np.isin(part["lang"], matching_codes(pyramid["langs"], langs))
+    mask &= (part["rating_bucket"] >= lo) & (part["rating_bucket"] <= hi)
+    if ptypes:
+        mask &= np.isin(part["ptype"], matching_codes(pyramid["ptypes"], ptypes))
+    if place_query:
+        hits = pd.Series(pyramid["names"]).str.lower().str.contains(place_query.lower(), regex=False)
+        mask &= np.isin(part["name"], np.flatnonzero(hits.to_numpy()))
+
+    sel = pd.DataFrame({c: v[mask] for c, v in part.items()})
+    if sel.empty:
+        return pd.DataFrame(columns=["lat", "lon", "n_reviews", "rating", "rating_std",
+                                     "place_name", "place_primary_type"])
+
+    cells = sel.groupby(["cell_lat", "cell_lon"], sort=False)[SUM_COLS].sum()
+    n = cells["count"].to_numpy(dtype=np.float64)
+    mean = cells["rating_sum"].to_numpy() / n
+    out = pd.DataFrame({
+        "lat": cells["lat_sum"].to_numpy() / n,
+        "lon": cells["lon_sum"].to_numpy() / n,
+        "n_reviews": cells["count"].to_numpy(),
+        "rating": mean,
+        "rating_std": np.sqrt(np.maximum(cells["rating_sq"].to_numpy() / n - mean ** 2, 0.0)),
+    }, index=cells.index)
+    # Dictionary codes are sorted, so the smallest code breaks ties like Series.mode()
+    out["place_name"] = pyramid["names"][modal_code(sel, "name", out.index)]
+    ptype = modal_code(sel, "ptype", out.index)
+    ptypes = pyramid["ptypes"]
+    out["place_primary_type"] = (
+        np.where(ptype >= 0, ptypes[np.maximum(ptype, 0)], None) if len(ptypes) else None
+    )
+    return out.reset_index(drop=True)
+
+
+def modal_code(sel: pd.DataFrame, col: str, cells: pd.Index) -> np.ndarray:
+    """Most frequent non-missing code per cell (review-weighted), -1 if none."""
+    counts = sel[sel[col] >= 0].groupby(["cell_lat", "cell_lon", col], sort=False)["count"].sum().reset_index()
+    counts = counts.sort_values(col).sort_values("count", ascending=False, kind="stable")
+    best = counts.drop_duplicates(["cell_lat", "cell_lon"]).set_index(["cell_lat", "cell_lon"])[col]
+    return best.reindex(cells).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the geo-grid pyramid for the dashboard heatmaps")
+    parser.add_argument("--min-level", type=int, default=MIN_LEVEL,
+                        help=f"Coarsest zoom level (default: {MIN_LEVEL})")
+    parser.add_argument("--max-level", type=int, default=MAX_LEVEL,
+                        help=f"Finest zoom level (default: {MAX_LEVEL})")
+    parser.add_argument("--cell-px", type=int, default=CELL_PX,
+                        help=f"Cell edge in screen pixels at each level's zoom (default: {CELL_PX})")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    ensure_reviews_table()
+    df = read_reviews(SOURCE_COLS)
+    arrays = build_pyramid(df, range(args.min_level, args.max_level + 1), args.cell_px)
+    save_pyramid(arrays)
+    sizes = ", ".join(f"z{lv}: {len(arrays[f'L{lv}_count']):,}" for lv in arrays["levels"])
+    print(f"✓ Saved geo pyramid ({len(df):,} reviews; partials per level {sizes}) -> {PYRAMID_PATH}")
+    print(f"  ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Persistent, content-addressed cache for per-review NLP results.
+
+One SQLite table keyed by (stage, key), where key is a hash of the
+normalized review text (plus the language for language-dependent stages).
+Every row also stores the version of the stage that produced it (langdetect
+release, tokenizer rules, sentiment model...), and a lookup only counts as a
+hit when the version matches, so changing one stage's model recomputes that
+stage while the others keep their results.
+
+Rows carry a last-used tick; when the table grows past `max_entries` the
+least recently used rows are evicted. The row count is taken once on open and
+kept up to date on insert and delete, so writes never rescan the table.
+
+Run as a script to inspect or invalidate the cache:
+    python3 scripts/nlp_cache.py                       # entries per stage/version
+    python3 scripts/nlp_cache.py --invalidate sentiment
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+from importlib.metadata import PackageNotFoundError, version as package_version
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+from artifact_store import OUTPUT_DIR
+
+NLP_CACHE_PATH = OUTPUT_DIR / "nlp_cache.sqlite"
+MAX_ENTRIES = 2_000_000
+# Keys per SQL statement (stays below SQLite's bound-parameter limit)
+BATCH = 500
+
+# Returned by get_many() for keys without a current-version result
+MISSING = object()
+
+
+def dist_version(dist: str) -> str:
+    """Installed version of a distribution, for stage versions ("unknown" if not installed)."""
+    try:
+        return package_version(dist)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def text_key(text: str, *context: str) -> str:
+    """Content hash of the normalized text and any context it depends on (e.g. language)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in context:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    h.update(str(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+class NLPCache:
+    def __init__(self, path: Path = NLP_CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " stage TEXT NOT NULL, key TEXT NOT NULL, version TEXT NOT NULL,"
+            " value TEXT NOT NULL, used INTEGER NOT NULL,"
+            " PRIMARY KEY (stage, key)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self.tick = self.conn.execute("SELECT COALESCE(MAX(used), 0) FROM results").fetchone()[0]
+        self.count = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        self.hits = {}
+        self.misses = {}
+
+    def _next_tick(self) -> int:
+        self.tick += 1
+        return self.tick
+
+    # ---------- Lookups ----------
+    def get_many(self, stage: str, version: str, keys: Sequence[str]) -> list:
+        """Cached values for `keys` in order, MISSING where absent or from another version."""
+        found = {}
+        for start in range(0, len(keys), BATCH):
+            batch = list(set(keys[start:start + BATCH]))
+            marks = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM results WHERE stage = ? AND version = ? AND key IN ({marks})",
+                [stage, version, *batch],
+            ).fetchall()
+            found.update(rows)
+        if found:
+            tick = self._next_tick()
+            hit_keys = list(found)
+            for start in range(0, len(hit_keys), BATCH):
+                batch = hit_keys[start:start + BATCH]
+                self.conn.execute(
+                    f"UPDATE results SET used = ? WHERE stage = ? AND key IN ({','.join('?' * len(batch))})",
+                    [tick, stage, *batch],
+                )
+        values = [json.loads(found[k]) if k in found else MISSING for k in keys]
+        n_hits = sum(v is not MISSING for v in values)
+        self.hits[stage] = self.hits.get(stage, 0) + n_hits
+        self.misses[stage] = self.misses.get(stage, 0) + len(values) - n_hits
+        return values
+
+    def put_many(self, stage: str, version: str, keys: Sequence[str], values: Iterable):
+        rows = dict(zip(keys, values))  # last value wins, as with INSERT OR REPLACE
+        new_keys = list(rows)
+        existing = 0
+        for start in range(0, len(new_keys), BATCH):
+            batch = new_keys[start:start + BATCH]
+            existing += self.conn.execute(
+                f"SELECT COUNT(*) FROM results WHERE stage = ? AND key IN ({','.join('?' * len(batch))})",
+                [stage, *batch],
+            ).fetchone()[0]
+        tick = self._next_tick()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results (stage, key, version, value, used) VALUES (?, ?, ?, ?, ?)",
+            ((stage, k, version, json.dumps(v), tick) for k, v in rows.items()),
+        )
+        self.count += len(rows) - existing
+        if self.count > self.max_entries:
+            self.evict()
+        self.conn.commit()
+
+    def get_or_compute(self, stage: str, version: str, keys: Sequence[str],
+                       compute: Callable[[list], Sequence]) -> list:
+        """Values for `keys`, calling compute(miss positions) once for everything not cached."""
+        values = self.get_many(stage, version, keys)
+        todo = [i for i, v in enumerate(values) if v is MISSING]
+        if todo:
+            computed = compute(todo)
+            for i, v in zip(todo, computed):
+                values[i] = v
+            self.put_many(stage, version, [keys[i] for i in todo], [values[i] for i in todo])
+        return values
+
+    # ---------- Maintenance ----------
+    def __len__(self) -> int:
+        return self.count
+
+    def evict(self) -> int:
+        """Drop least recently used rows beyond max_entries; returns how many were removed."""
+        excess = self.count - self.max_entries
+        if excess <= 0:
+            return 0
+        cur = self.conn.execute(
+            "DELETE FROM results WHERE (stage, key) IN"
+            " (SELECT stage, key FROM results ORDER BY used LIMIT ?)",
+            (excess,),
+        )
+        self.count -= cur.rowcount
+        return cur.rowcount
+
+    def invalidate(self, stage: str, version: Optional[str] = None) -> int:
+        """Delete one stage's results (only `version`'s if given), leaving other stages intact."""
+        if version is None:
+            cur = self.conn.execute("DELETE FROM results WHERE stage = ?", (stage,))
+        else:
+            cur = self.conn.execute("DELETE FROM results WHERE stage = ? AND version = ?", (stage, version))
+        self.count -= cur.rowcount
+        self.conn.commit()
+        return cur.rowcount
+
+    def entries(self) -> list:
+        """(stage, version, rows) for every stored stage/version."""
+        return self.conn.execute(
+            "SELECT stage, version, COUNT(*) FROM results GROUP BY stage, version ORDER BY stage, version"
+        ).fetchall()
+
+    def counters(self) -> dict:
+        """{stage: (hits, misses)} since this cache was opened."""
+        return {s: (self.hits.get(s, 0), self.misses.get(s, 0)) for s in sorted(set(self.hits) | set(self.misses))}
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the per-review NLP cache")
+    parser.add_argument("--path", type=Path, default=NLP_CACHE_PATH,
+                        help=f"Cache file (default: {NLP_CACHE_PATH.relative_to(OUTPUT_DIR.parent)})")
+    parser.add_argument("--invalidate", metavar="STAGE", action="append", default=[],
+                        help="Delete all results of a stage (language, tokens, sentiment); repeatable")
+    args = parser.parse_args()
+
+    if not args.path.exists():
+        print(f"No NLP cache at {args.path}")
+        return
+    cache = NLPCache(args.path)
+    for stage in args.invalidate:
+        print(f"✓ Invalidated {stage}: {cache.invalidate(stage):,} results removed")
+    print(f"{'stage':<10} {'version':<40} {'rows':>10}")
+    for stage, version, rows in cache.entries():
+        print(f"{stage:<10} {version:<40} {rows:>10,}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
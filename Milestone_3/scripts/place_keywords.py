@@ -0,0 +1,260 @@
+"""Per-place top keywords (mean TF-IDF over each place's reviews).
+
+The TF-IDF model matches the notebook: unigrams and bigrams of
+text_processed, MAX_FEATURES terms, min_df=2, smoothed idf and l2-normalized
+rows. Every place's mean is computed at once as a sparse product
+(place-by-review indicator matrix scaled by 1/count, times the TF-IDF
+matrix); the top-k terms of each place come from argpartition on that
+place's non-zero means only.
+
+Outputs:
+- output/place_keywords.parquet: place_id, n_reviews, digest (hash of the
+  place's texts), keywords (", "-joined, best first) and scores
+- output/place_keywords_vocab.npz: the fitted terms and idf, so --incremental
+  can re-score only the places whose reviews changed
+
+An incremental run keeps the vocabulary and idf; it refits from scratch when
+the review count has grown by more than REFIT_GROWTH since the last fit or
+when the TF-IDF settings changed.
+
+Run as a script to (re)build the keywords:
+    python3 scripts/place_keywords.py [--incremental]
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from artifact_store import OUTPUT_DIR, PLACE_KEYWORDS, atomic_write, ensure_reviews_table, read_reviews
+from tracing import span, traced
+
+VOCAB_PATH = OUTPUT_DIR / "place_keywords_vocab.npz"
+TOP_K = 10
+MAX_FEATURES = 5000
+MIN_DF = 2
+NGRAM_RANGE = (1, 2)
+# Incremental runs refit once the review count has grown by more than this fraction
+REFIT_GROWTH = 0.25
+SOURCE_COLS = ["place_id", "text_processed"]
+
+KEYWORDS_SCHEMA = pa.schema([
+    ("place_id", pa.string()),
+    ("n_reviews", pa.int32()),
+    ("digest", pa.uint64()),
+    ("keywords", pa.string()),
+    ("scores", pa.list_(pa.float32())),
+])
+
+
+# ---------- TF-IDF ----------
+def tfidf(counts: sparse.csr_matrix, idf: np.ndarray) -> sparse.csr_matrix:
+    """Term counts -> l2-normalized TF-IDF rows (TfidfTransformer defaults)."""
+    return normalize(counts @ sparse.diags(idf), norm="l2", copy=False).tocsr()
+
+
+@traced("fit tfidf")
+def fit_vocabulary(texts: pd.Series, max_features: int = MAX_FEATURES, min_df: int = MIN_DF) -> tuple:
+    """(terms, idf, TF-IDF matrix) fitted on `texts`."""
+    vectorizer = CountVectorizer(max_features=max_features, ngram_range=NGRAM_RANGE,
+                                 min_df=min(min_df, len(texts)))
+    counts = vectorizer.fit_transform(texts)
+    doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + counts.shape[0]) / (1 + doc_freq)) + 1
+    return vectorizer.get_feature_names_out(), idf, tfidf(counts, idf)
+
+
+@traced("transform tfidf")
+def tfidf_rows(texts: pd.Series, terms: np.ndarray, idf: np.ndarray) -> sparse.csr_matrix:
+    """TF-IDF rows of `texts` under an already fitted vocabulary and idf."""
+    vectorizer = CountVectorizer(vocabulary=terms, ngram_range=NGRAM_RANGE)
+    return tfidf(vectorizer.transform(texts), idf)
+
+
+# ---------- Per-place keywords ----------
+def place_codes(place_ids: pd.Series) -> tuple:
+    """(code per review, unique place ids) in first-seen order."""
+    codes, uniques = pd.factorize(place_ids.astype(str), sort=False)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def place_digests(texts: pd.Series, codes: np.ndarray, n_places: int) -> tuple:
+    """Review count and an order-independent hash of the texts, per place."""
+    hashes = pd.util.hash_pandas_object(texts, index=False).to_numpy()
+    counts = np.bincount(codes, minlength=n_places)
+    digests = np.zeros(n_places, dtype=np.uint64)
+    np.add.at(digests, codes, hashes)  # wraps modulo 2**64
+    return counts, digests
+
+
+@traced("place means")
+def place_means(X: sparse.csr_matrix, codes: np.ndarray, n_places: int) -> sparse.csr_matrix:
+    """Mean TF-IDF row of every place, as one indicator-matrix product."""
+    counts = np.bincount(codes, minlength=n_places)
+    weights = 1.0 / counts[codes]
+    indicator = sparse.csr_matrix((weights, (codes, np.arange(len(codes)))), shape=(n_places, X.shape[0]))
+    return (indicator @ X).tocsr()
+
+
+@traced("top keywords")
+def top_terms(means: sparse.csr_matrix, terms: np.ndarray, top_k: int = TOP_K) -> tuple:
+    """(", "-joined keywords, float32 scores) per row, best first; ties go to the earlier term."""
+    keywords, scores = [], []
+    for i in range(means.shape[0]):
+        lo, hi = means.indptr[i], means.indptr[i + 1]
+        data, cols = means.data[lo:hi], means.indices[lo:hi]
+        if len(data) > top_k:
+            part = np.argpartition(-data, top_k - 1)[:top_k]
+            data, cols = data[part], cols[part]
+        order = np.lexsort((cols, -data))
+        keywords.append(", ".join(terms[cols[order]]))
+        scores.append(data[order].astype(np.float32))
+    return keywords, scores
+
+
+def keyword_frame(place_ids, counts, digests, keywords, scores) -> pd.DataFrame:
+    return pd.DataFrame({
+        "place_id": place_ids,
+        "n_reviews": counts.astype(np.int32),
+        "digest": digests,
+        "keywords": keywords,
+        "scores": scores,
+    })
+
+
+def build_keywords(df: pd.DataFrame, top_k: int = TOP_K, max_features: int = MAX_FEATURES,
+                   min_df: int = MIN_DF) -> tuple:
+    """(keyword frame, vocabulary) for every place in `df` from a fresh TF-IDF fit."""
+    df = df.dropna(subset=["place_id"])
+    texts = df["text_processed"].fillna("").astype(str)
+    codes, place_ids = place_codes(df["place_id"])
+    counts, digests = place_digests(texts, codes, len(place_ids))
+    terms, idf, X = fit_vocabulary(texts, max_features, min_df)
+    keywords, scores = top_terms(place_means(X, codes, len(place_ids)), terms, top_k)
+    vocab = {
+        "terms": terms.astype(str),
+        "idf": idf,
+        "n_docs": np.int64(len(texts)),
+        "top_k": np.int64(top_k),
+        "max_features": np.int64(max_features),
+        "min_df": np.int64(min_df),
+    }
+    return keyword_frame(place_ids, counts, digests, keywords, scores), vocab
+
+
+def update_keywords(df: pd.DataFrame, previous: pd.DataFrame, vocab: dict) -> tuple:
+    """(keyword frame, places re-scored): only places whose review count or texts changed.
+
+    Unchanged places keep their stored keywords; places without reviews in
+    `df` are dropped.
+    """
+    df = df.dropna(subset=["place_id"])
+    texts = df["text_processed"].fillna("").astype(str)
+    codes, place_ids = place_codes(df["place_id"])
+    counts, digests = place_digests(texts, codes, len(place_ids))
+
+    prev = previous.set_index("place_id")
+    # fill_value keeps the uint64 digests exact (a NaN fill would cast them to float)
+    same = (
+        prev["n_reviews"].reindex(place_ids, fill_value=-1).to_numpy() == counts
+    ) & (
+        prev["digest"].reindex(place_ids, fill_value=0).to_numpy() == digests
+    )
+    changed = np.flatnonzero(~same)
+    keywords = prev["keywords"].reindex(place_ids).to_numpy(dtype=object)
+    scores = prev["scores"].reindex(place_ids).to_numpy(dtype=object)
+    if len(changed):
+        # Re-score the changed places from their own rows only
+        local = np.full(len(place_ids), -1, dtype=np.int64)
+        local[changed] = np.arange(len(changed))
+        rows = local[codes] >= 0
+        X = tfidf_rows(texts[rows], vocab["terms"], vocab["idf"])
+        means = place_means(X, local[codes][rows], len(changed))
+        new_keywords, new_scores = top_terms(means, vocab["terms"], int(vocab["top_k"]))
+        keywords[changed] = new_keywords
+        scores[changed] = pd.Series(new_scores, dtype=object).to_numpy()
+    return keyword_frame(place_ids, counts, digests, keywords, scores), len(changed)
+
+
+def needs_refit(vocab: Optional[dict], n_docs: int, top_k: int, max_features: int, min_df: int) -> bool:
+    """True if an incremental run cannot reuse the stored vocabulary."""
+    if vocab is None:
+        return True
+    settings = (int(vocab["top_k"]), int(vocab["max_features"]), int(vocab["min_df"]))
+    if settings != (top_k, max_features, min_df):
+        return True
+    return n_docs > int(vocab["n_docs"]) * (1 + REFIT_GROWTH)
+
+
+# ---------- Storage ----------
+def save_keywords(frame: pd.DataFrame, path: Path = PLACE_KEYWORDS) -> Path:
+    table = pa.table({
+        "place_id": pa.array(frame["place_id"].astype(str), pa.string()),
+        "n_reviews": pa.array(frame["n_reviews"], pa.int32()),
+        "digest": pa.array(frame["digest"].to_numpy(dtype=np.uint64), pa.uint64()),
+        "keywords": pa.array(frame["keywords"], pa.string()),
+        "scores": pa.array([np.asarray(s, dtype=np.float32) for s in frame["scores"]], pa.list_(pa.float32())),
+    }, schema=KEYWORDS_SCHEMA)
+    return atomic_write(path, lambda tmp: pq.write_table(table, tmp))
+
+
+def save_vocabulary(vocab: dict, path: Path = VOCAB_PATH) -> Path:
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.savez(f, **vocab)
+    return atomic_write(path, write)
+
+
+def load_keywords(path: Path = PLACE_KEYWORDS, columns: Optional[list] = None) -> pd.DataFrame:
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def load_vocabulary(path: Path = VOCAB_PATH) -> Optional[dict]:
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute per-place top keywords for the dashboard")
+    parser.add_argument("--top-k", type=int, default=TOP_K,
+                        help=f"Keywords kept per place (default: {TOP_K})")
+    parser.add_argument("--max-features", type=int, default=MAX_FEATURES,
+                        help=f"TF-IDF vocabulary size (default: {MAX_FEATURES})")
+    parser.add_argument("--min-df", type=int, default=MIN_DF,
+                        help=f"Minimum number of reviews a term must appear in (default: {MIN_DF})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-score only places whose reviews changed, reusing the stored vocabulary")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    ensure_reviews_table()
+    with span("load reviews"):
+        df = read_reviews(SOURCE_COLS)
+
+    vocab = load_vocabulary() if args.incremental and PLACE_KEYWORDS.exists() else None
+    if args.incremental and not needs_refit(vocab, len(df), args.top_k, args.max_features, args.min_df):
+        frame, n_changed = update_keywords(df, load_keywords(), vocab)
+        save_keywords(frame)
+        print(f"✓ Updated place keywords ({n_changed:,} of {len(frame):,} places re-scored) -> {PLACE_KEYWORDS}")
+    else:
+        if args.incremental:
+            print("  Stored vocabulary missing or out of date; refitting")
+        frame, vocab = build_keywords(df, args.top_k, args.max_features, args.min_df)
+        save_vocabulary(vocab)
+        save_keywords(frame)
+        print(f"✓ Saved place keywords ({len(df):,} reviews -> {len(frame):,} places, "
+              f"{len(vocab['terms']):,} terms) -> {PLACE_KEYWORDS}")
+    print(f"  ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
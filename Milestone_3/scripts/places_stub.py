@@ -0,0 +1,361 @@
+"""Local stand-in for Google Places places:searchNearby, for testing fetch_reviews.py.
+
+The stub serves a synthetic world: POIs around Aveiro (dense 3x3 clusters
+plus scattered singles), each with a few places and reviews nearby. A request
+gets the places inside its circle, ranked by a fixed prominence (so a POI's
+places come back in the same order whatever circle found them) and capped at
+maxResultCount (at most MAX_RESULTS), so a coalesced query over a cluster
+fills its page and the fetcher has to split it.
+
+Faults are planned per request (circle center and radius), from a hash of
+the request and the seed, so every run sees the same ones:
+- 429 with a Retry-After header on the first attempt
+- 503 on the first attempt, or 503 then 429
+- 503 on MAX_RETRIES + 1 attempts, so the fetcher gives up on those POIs
+  and only gets them on a rerun
+The stub also records whether each retry after a 429 waited Retry-After.
+
+Run as a script to serve the stub, or to check the fetcher end to end
+(retries, Retry-After, splitting of full pages, and that a killed run resumes
+from its JSONL checkpoint into the same CSV as an uninterrupted one):
+    python3 scripts/places_stub.py --port 8765 --pois /tmp/stub_pois.csv
+    python3 scripts/places_stub.py --check
+"""
+import argparse
+import filecmp
+import hashlib
+import json
+import math
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fetch_reviews import MAX_RETRIES, RADIUS_METERS, read_checkpoint
+from query_planner import EARTH_RADIUS_M, MAX_RESULTS, haversine_m
+
+FETCH_SCRIPT = Path(__file__).resolve().parent / "fetch_reviews.py"
+CENTER = (40.6405, -8.6538)  # Aveiro
+SEED = 0
+N_CLUSTERS = 4
+N_SINGLES = 24
+CLUSTER_SPACING = 40.0          # meters between neighbouring POIs of a cluster
+PLACES_PER_CLUSTER_POI = 5      # 9 of these fill a 20-place page
+MAX_PLACES_PER_SINGLE = 4
+PLACE_SPREAD = 8.0              # max meters between a place and its POI
+RETRY_AFTER = 2                 # seconds; above the fetcher's first backoff (1.6 s)
+RATE_429 = 0.2
+RATE_5XX = 0.2
+RATE_EXHAUSTED = 0.1
+WORDS = ["bom", "ótimo", "caro", "barato", "simpático", "demorado", "limpo", "great", "friendly",
+         "slow", "tasty", "clean", "view", "coffee", "service", "price"]
+TYPES = ["restaurant", "cafe", "bar", "bakery", "store", "museum"]
+
+
+# ---------- Synthetic world ----------
+def offset(lat: float, lon: float, east_m: float, north_m: float) -> tuple:
+    """Point `east_m`/`north_m` meters from (lat, lon)."""
+    d_lat = math.degrees(north_m / EARTH_RADIUS_M)
+    d_lon = math.degrees(east_m / (EARTH_RADIUS_M * math.cos(math.radians(lat))))
+    return lat + d_lat, lon + d_lon
+
+
+def make_place(rng: np.random.Generator, n: int, lat: float, lon: float) -> dict:
+    """A Places API (v1) place near (lat, lon), with 1-3 reviews."""
+    angle, dist = rng.uniform(0, 2 * math.pi), rng.uniform(0, PLACE_SPREAD)
+    p_lat, p_lon = offset(lat, lon, dist * math.cos(angle), dist * math.sin(angle))
+    reviews = [{
+        "authorAttribution": {"displayName": f"Author {n}-{j}"},
+        "rating": int(rng.integers(1, 6)),
+        "text": {"text": " ".join(rng.choice(WORDS, size=int(rng.integers(4, 12)))).capitalize() + "."},
+        "publishTime": f"2024-{int(rng.integers(1, 13)):02d}-{int(rng.integers(1, 29)):02d}T12:00:00Z",
+    } for j in range(int(rng.integers(1, 4)))]
+    return {
+        "id": f"stub{n:05d}",
+        "displayName": {"text": f"Place {n}", "languageCode": "pt"},
+        "location": {"latitude": p_lat, "longitude": p_lon},
+        "rating": round(float(rng.uniform(2.5, 5.0)), 1),
+        "primaryType": str(rng.choice(TYPES)),
+        "reviews": reviews,
+        "prominence": float(rng.uniform()),
+    }
+
+
+def synthetic_world(seed: int = SEED) -> tuple:
+    """(POI frame with an EWKB geom_pt column, [place dicts]) for the stub to serve."""
+    from shapely import wkb
+    from shapely.geometry import Point
+
+    rng = np.random.default_rng(seed)
+    pois = []
+    for _ in range(N_CLUSTERS):
+        c_lat, c_lon = offset(*CENTER, *rng.uniform(-1500, 1500, size=2))
+        for i in range(3):
+            for j in range(3):
+                lat, lon = offset(c_lat, c_lon, i * CLUSTER_SPACING, j * CLUSTER_SPACING)
+                pois.append((lat, lon, PLACES_PER_CLUSTER_POI))
+    for _ in range(N_SINGLES):
+        pois.append(offset(*CENTER, *rng.uniform(-1500, 1500, size=2))
+                    + (int(rng.integers(0, MAX_PLACES_PER_SINGLE + 1)),))
+    order = rng.permutation(len(pois))  # interleave clusters and singles in POI order
+    pois = [pois[i] for i in order]
+
+    places = []
+    for lat, lon, n_places in pois:
+        for _ in range(n_places):
+            places.append(make_place(rng, len(places), lat, lon))
+    df_pois = pd.DataFrame({
+        "gid": np.arange(len(pois)) + 1,
+        "name": [f"POI {i}" for i in range(len(pois))],
+        "amenity": rng.choice(TYPES, size=len(pois)),
+        "geom_pt": [wkb.dumps(Point(lon, lat), hex=True, srid=4326) for lat, lon, _ in pois],
+    })
+    return df_pois, places
+
+
+def expected_place_ids(df_pois: pd.DataFrame, places: list, radius: float = RADIUS_METERS) -> set:
+    """Ids of the places inside some POI's own circle: what a complete fetch returns."""
+    from shapely import wkb
+
+    p_lat = np.array([p["location"]["latitude"] for p in places])
+    p_lon = np.array([p["location"]["longitude"] for p in places])
+    found = set()
+    for hex_point in df_pois["geom_pt"]:
+        pt = wkb.loads(bytes.fromhex(hex_point))
+        inside = haversine_m(pt.y, pt.x, p_lat, p_lon) <= radius
+        found.update(p["id"] for p, ok in zip(places, inside) if ok)
+    return found
+
+
+# ---------- Server ----------
+def fault_plan(key: str, seed: int, rate_429: float, rate_5xx: float, rate_exhausted: float) -> list:
+    """Statuses to answer the first attempts of a request with, before it succeeds."""
+    u = int.from_bytes(hashlib.blake2b(f"{seed}:{key}".encode(), digest_size=8).digest(), "big") / 2 ** 64
+    if u < rate_exhausted:
+        return [503] * (MAX_RETRIES + 1)
+    u -= rate_exhausted
+    if u < rate_429:
+        return [429]
+    u -= rate_429
+    if u < rate_5xx / 2:
+        return [503]
+    if u < rate_5xx:
+        return [503, 429]
+    return []
+
+
+class PlacesStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple, places: list, seed: int = SEED, latency: float = 0.0,
+                 rate_429: float = RATE_429, rate_5xx: float = RATE_5XX, rate_exhausted: float = RATE_EXHAUSTED):
+        super().__init__(address, StubHandler)
+        self.places = sorted(places, key=lambda p: -p["prominence"])
+        self.lat = np.array([p["location"]["latitude"] for p in self.places])
+        self.lon = np.array([p["location"]["longitude"] for p in self.places])
+        self.seed, self.latency = seed, latency
+        self.rates = (rate_429, rate_5xx, rate_exhausted)
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.last_429 = {}
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "full_pages": 0,
+                      "retries_after_429": 0, "early_retries": 0}
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # e.g. the killed fetcher's sockets
+            super().handle_error(request, client_address)
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{s['requests']} requests: {s['ok']} ok, {s['429']} x 429, {s['5xx']} x 5xx, "
+                f"{s['full_pages']} full pages")
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/places:searchNearby"
+
+    def respond(self, payload: dict) -> tuple:
+        """(status, headers, body) for one searchNearby request."""
+        circle = payload["locationRestriction"]["circle"]
+        lat, lon = circle["center"]["latitude"], circle["center"]["longitude"]
+        key = f"{lat:.7f},{lon:.7f},{float(circle['radius']):.3f}"
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+            attempt = self.attempts.get(key, 0)
+            self.attempts[key] = attempt + 1
+            if key in self.last_429:
+                self.stats["retries_after_429"] += 1
+                if now - self.last_429.pop(key) < RETRY_AFTER - 0.05:
+                    self.stats["early_retries"] += 1
+            plan = fault_plan(key, self.seed, *self.rates)
+            status = plan[attempt] if attempt < len(plan) else 200
+            if status == 429:
+                self.stats["429"] += 1
+                self.last_429[key] = now
+                return 429, {"Retry-After": str(RETRY_AFTER)}, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}
+            if status != 200:
+                self.stats["5xx"] += 1
+                return status, {}, {"error": {"code": status, "status": "UNAVAILABLE"}}
+            self.stats["ok"] += 1
+
+        inside = np.flatnonzero(haversine_m(lat, lon, self.lat, self.lon) <= float(circle["radius"]))
+        page = min(int(payload.get("maxResultCount", MAX_RESULTS)), MAX_RESULTS)
+        hits = [{k: v for k, v in self.places[i].items() if k != "prominence"} for i in inside[:page]]
+        if len(inside) >= page:
+            with self.lock:
+                self.stats["full_pages"] += 1
+        return 200, {}, ({"places": hits} if hits else {})
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith("places:searchNearby"):
+            self.send_error(404)
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            status, headers, body = self.server.respond(payload)
+        except (ValueError, KeyError, TypeError):
+            status, headers, body = 400, {}, {"error": {"code": 400, "status": "INVALID_ARGUMENT"}}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(places: list, port: int = 0, **kwargs) -> PlacesStub:
+    server = PlacesStub(("127.0.0.1", port), places, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- End-to-end check ----------
+def fetch_command(url: str, pois: Path, output: Path, checkpoint: Path) -> list:
+    return [sys.executable, str(FETCH_SCRIPT), "--url", url, "--pois", str(pois), "--output", str(output),
+            "--checkpoint", str(checkpoint), "--max-pois", "0", "--qps", "50", "--concurrency", "4"]
+
+
+def fetch_until_complete(cmd: list, max_runs: int = 5) -> int:
+    """Rerun the fetcher until no POI fails; returns the number of runs."""
+    for run in range(1, max_runs + 1):
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        if "POIs failed after" not in out:
+            return run
+    raise AssertionError(f"POIs still failing after {max_runs} runs:\n{out}")
+
+
+def count_lines(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def kill_midway(cmd: list, checkpoint: Path, n_pois: int, timeout: float = 120.0) -> int:
+    """Start the fetcher and SIGKILL it once part of the POIs are checkpointed; returns that count."""
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        lines = count_lines(checkpoint)
+        if lines >= max(1, n_pois // 4):
+            proc.send_signal(signal.SIGKILL)
+            proc.wait()
+            return lines
+        if proc.poll() is not None:
+            raise AssertionError("fetcher finished before it could be killed; raise --latency")
+        time.sleep(0.01)
+    proc.kill()
+    raise AssertionError("fetcher made no progress")
+
+
+def check(seed: int, latency: float) -> bool:
+    df_pois, places = synthetic_world(seed)
+    expected = expected_place_ids(df_pois, places)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pois_csv = tmp / "pois.csv"
+        df_pois.to_csv(pois_csv, index=False)
+
+        t0 = time.time()
+        stub = start_stub(places, seed=seed, latency=latency)
+        ref_csv, ref_ckpt = tmp / "reference.csv", tmp / "reference.jsonl"
+        runs = fetch_until_complete(fetch_command(stub.url, pois_csv, ref_csv, ref_ckpt))
+        stub.shutdown()
+        print(f"Uninterrupted fetch: {runs} run(s), {stub.summary()} ({time.time() - t0:.1f}s)")
+
+        t0 = time.time()
+        stub = start_stub(places, seed=seed, latency=latency)
+        out_csv, out_ckpt = tmp / "resumed.csv", tmp / "resumed.jsonl"
+        cmd = fetch_command(stub.url, pois_csv, out_csv, out_ckpt)
+        killed_at = kill_midway(cmd, out_ckpt, len(df_pois))
+        runs = fetch_until_complete(cmd)
+        stub.shutdown()
+        print(f"Killed fetch after {killed_at}/{len(df_pois)} checkpointed POIs, resumed in {runs} run(s), "
+              f"{stub.summary()} ({time.time() - t0:.1f}s)")
+
+        fetched = set(pd.read_csv(ref_csv, usecols=["place_id"])["place_id"])
+        checks = {
+            "429s and 5xx errors were retried": stub.stats["429"] > 0 and stub.stats["5xx"] > 0,
+            "retries after a 429 waited Retry-After": stub.stats["retries_after_429"] > 0
+                                                      and stub.stats["early_retries"] == 0,
+            "full pages were split until every place was found": stub.stats["full_pages"] > 0
+                                                                 and fetched == expected,
+            "killed run resumed into the same CSV": killed_at < len(df_pois)
+                                                    and len(read_checkpoint(out_ckpt)) == len(df_pois)
+                                                    and filecmp.cmp(ref_csv, out_csv, shallow=False),
+        }
+    for name, ok in checks.items():
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(checks.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local places:searchNearby stub for testing fetch_reviews.py")
+    parser.add_argument("--port", type=int, default=8765, help="Port to serve on (default: 8765)")
+    parser.add_argument("--pois", type=Path, default=Path(tempfile.gettempdir()) / "stub_pois.csv",
+                        help="Where to write the synthetic POI CSV for fetch_reviews.py --pois")
+    parser.add_argument("--seed", type=int, default=SEED, help=f"Synthetic world and fault seed (default: {SEED})")
+    parser.add_argument("--latency", type=float, default=None,
+                        help="Seconds added to every response (default: 0, or 0.05 with --check "
+                             "so the fetcher can be killed mid-run)")
+    parser.add_argument("--check", action="store_true",
+                        help="Run fetch_reviews.py against the stub (uninterrupted, then killed and resumed) "
+                             "and check retries, Retry-After, page splitting and resume")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check(args.seed, 0.05 if args.latency is None else args.latency) else 1)
+
+    df_pois, places = synthetic_world(args.seed)
+    df_pois.to_csv(args.pois, index=False)
+    stub = PlacesStub(("127.0.0.1", args.port), places, seed=args.seed, latency=args.latency or 0.0)
+    print(f"✓ Saved {len(df_pois)} synthetic POIs ({len(places)} places) -> {args.pois}")
+    print(f"Serving places:searchNearby at {stub.url}; fetch with:")
+    print(f"  python3 scripts/fetch_reviews.py --url {stub.url} --pois {args.pois} --max-pois 0")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,176 @@
 import os
 import json
+import time
+import hashlib
+import shutil
 import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from gensim import corpora
-from gensim.models import LdaMulticore
+from gensim.corpora import MmCorpus
+from gensim.models import CoherenceModel, LdaModel, LdaMulticore
+
+try:
+    import resource  # POSIX only; used to report peak RSS
+except ImportError:
+    resource = None
+
+from artifact_store import (
+    ASSIGNMENT_SCHEMA, TOPICS_MANIFEST, assignments_path, assignments_table, atomic_write,
+    ensure_reviews_table, read_reviews, read_topics_manifest, review_columns,
+)
+from tracing import Tracer, collect_spans, current, format_summary, span, traced, write_chrome_trace
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 OUTPUT_DIR = BASE_DIR / "output"
 ENRICHED_CSV = OUTPUT_DIR / "reviews_enriched.csv"
+CORPUS_DIR = OUTPUT_DIR / "corpus"
+MODELS_DIR = OUTPUT_DIR / "models"
+LANG_NAMES = {"en": "English", "pt": "Portuguese"}
+# Dictionary pruning applied on top of --min-word-freq
+NO_ABOVE = 0.7
+KEEP_N = 1000
+# Documents per lda.inference() call when assigning topics
+INFERENCE_CHUNKSIZE = 2000
+# Columns identifying a review across fetches (falls back to the review text)
+REVIEW_KEY_COLS = ["place_id", "author_name", "publish_time"]
+# Rows per CSV chunk in --stream mode, and documents per assignment write
+STREAM_CHUNKSIZE = 10000
+# --auto-k: topic counts searched, and sample size / passes of the quick search models
+K_RANGE = (2, 20)
+SEARCH_SAMPLE = 5000
+SEARCH_PASSES = 2
+# Stop searching after this many k values without a better coherence
+PATIENCE = 3
+COHERENCE_TOPN = 10
 
 def prepare_texts(df_lang: pd.DataFrame) -> list:
     texts = [str(x).split() for x in df_lang["text_processed"].fillna("").tolist()]
     return [[t for t in doc if t] for doc in texts]
 
-def train_lda(texts, num_topics, passes, min_word_freq):
+class StreamingTexts:
+    """Re-iterable token lists for one language, read from the CSV chunk by chunk."""
+
+    def __init__(self, path: Path, lang_code: str, chunksize: int = STREAM_CHUNKSIZE):
+        self.path = path
+        self.lang_code = lang_code
+        self.chunksize = chunksize
+
+    def __iter__(self):
+        for chunk in iter_lang_chunks(self.path, self.lang_code, ["text_processed"], self.chunksize):
+            yield from prepare_texts(chunk)
+
+def iter_lang_chunks(path: Path, lang_code: str, columns: list, chunksize: int):
+    """Yield one language's rows of the enriched CSV, reading only `columns`, in chunks."""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = ["lang"] + [c for c in columns if c in header and c != "lang"]
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=str, chunksize=chunksize):
+        chunk = chunk[chunk["lang"].eq(lang_code)]
+        if len(chunk):
+            yield chunk
+
+def corpus_hasher(min_word_freq: int):
+    h = hashlib.sha256()
+    h.update(json.dumps({"min_word_freq": min_word_freq, "no_above": NO_ABOVE,
+                         "keep_n": KEEP_N}).encode("utf-8"))
+    return h
+
+def hash_texts(h, processed: pd.Series):
+    for text in processed.fillna("").astype(str):
+        h.update(text.encode("utf-8"))
+        h.update(b"\n")
+
+def corpus_key(processed: pd.Series, min_word_freq: int) -> str:
+    """Hash the processed texts and dictionary settings that define a corpus."""
+    h = corpus_hasher(min_word_freq)
+    hash_texts(h, processed)
+    return h.hexdigest()[:16]
+
+@traced("scan csv")
+def scan_language(path: Path, lang_code: str, min_word_freq: int, chunksize: int) -> dict:
+    """One streaming pass over a language: corpus key, review keys and counts.
+
+    Produces the same corpus key and review keys as the in-memory path, so
+    cached corpora and saved models are shared between the two modes.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    key_cols = REVIEW_KEY_COLS if all(c in header for c in REVIEW_KEY_COLS) else ["review_text"]
+    h = corpus_hasher(min_word_freq)
+    keys, n_docs, n_tokens, n_nonempty = [], 0, 0, 0
+    for chunk in iter_lang_chunks(path, lang_code, ["text_processed"] + key_cols, chunksize):
+        hash_texts(h, chunk["text_processed"])
+        keys.append(review_keys(chunk))
+        lengths = chunk["text_processed"].fillna("").str.split().str.len()
+        n_docs += len(chunk)
+        n_tokens += int(lengths.sum())
+        n_nonempty += int(lengths.gt(0).sum())
+    return {
+        "key": h.hexdigest()[:16],
+        "keys": np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64),
+        "n_docs": n_docs,
+        "n_tokens": n_tokens,
+        "n_nonempty": n_nonempty,
+    }
+
+@traced("build corpus")
+def build_corpus(lang_code: str, key: str, texts_fn, min_word_freq: int) -> tuple:
+    """Build (or reuse) the dictionary and bag-of-words corpus for one language.
+
+    Artifacts live in output/corpus/ as {lang}_{key}.dict (gensim Dictionary)
+    and {lang}_{key}.mm (Matrix Market, with a .mm.index for random access).
+    The key covers the input texts and pruning settings, so every topic count
+    and every rerun on unchanged data loads them instead of re-tokenizing.
+    `texts_fn` is only called on a cache miss and must return a re-iterable
+    of token lists (a list, or StreamingTexts in --stream mode).
+    Returns (dict_path, mm_path, cached).
+    """
+    dict_path = CORPUS_DIR / f"{lang_code}_{key}.dict"
+    mm_path = CORPUS_DIR / f"{lang_code}_{key}.mm"
+    index_path = mm_path.with_name(mm_path.name + ".index")
+    if dict_path.exists() and mm_path.exists() and index_path.exists():
+        return dict_path, mm_path, True
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    texts = texts_fn()
     dictionary = corpora.Dictionary(texts)
-    dictionary.filter_extremes(no_below=min_word_freq, no_above=0.7, keep_n=1000)
-    corpus = [dictionary.doc2bow(text) for text in texts]
-    if not corpus:
-        return None, None
+    dictionary.filter_extremes(no_below=min_word_freq, no_above=NO_ABOVE, keep_n=KEEP_N)
+
+    tmp_mm = mm_path.with_name(f".{mm_path.name}.{os.getpid()}.tmp")
+    MmCorpus.serialize(str(tmp_mm), (dictionary.doc2bow(text) for text in texts))
+    os.replace(tmp_mm.with_name(tmp_mm.name + ".index"), index_path)
+    os.replace(tmp_mm, mm_path)
+    atomic_write(dict_path, lambda p: dictionary.save(str(p)))
+    return dict_path, mm_path, False
+
+def load_corpus(dict_path: Path, mm_path: Path) -> tuple:
+    return corpora.Dictionary.load(str(dict_path)), MmCorpus(str(mm_path))
+
+@traced("train lda")
+def train_lda(corpus, dictionary, num_topics, passes, workers=1, init_sstats=None):
+    """LDA over `corpus`; `init_sstats` (topic-word statistics) warm-starts it instead of random topics."""
+    if not len(corpus):
+        return None
     lda = LdaMulticore(
-        corpus=corpus,
+        corpus=corpus if init_sstats is None else None,
         id2word=dictionary,
         num_topics=num_topics,
         random_state=42,
         passes=passes,
-        workers=1,
+        workers=workers,
         per_word_topics=True,
         minimum_probability=0.0,
     )
-    return lda, dictionary
+    if init_sstats is not None:
+        lda.state.sstats[...] = init_sstats
+        lda.sync_state()
+        lda.update(corpus)
+    return lda
 
 def topics_to_df(lda_model, n_words=10) -> pd.DataFrame:
     rows = []
@@ -41,20 +180,398 @@ def topics_to_df(lda_model, n_words=10) -> pd.DataFrame:
         rows.append({"topic_id": tid, "top_words": ", ".join(words)})
     return pd.DataFrame(rows)
 
-def dominant_topics_df(texts, lda_model, dictionary) -> pd.DataFrame:
-    dom = []
-    for i, text in enumerate(texts):
-        bow = dictionary.doc2bow(text)
+def doc_topic_matrix(corpus, lda_model, chunksize=INFERENCE_CHUNKSIZE) -> np.ndarray:
+    """Topic distribution of every document as a float32 (n_docs, num_topics) array.
+
+    Runs lda.inference() over chunks of non-empty documents instead of one
+    get_document_topics() call per review. Documents are visited in the same
+    order and gamma is normalized the way get_document_topics() does it (a
+    left-to-right float64 sum, rounded to float32 before dividing), so the
+    rows match it exactly. Empty documents get an all-zero row.
+    """
+    mat = np.zeros((len(corpus), lda_model.num_topics), dtype=np.float32)
+    rows, chunk = [], []
+
+    def flush():
+        gamma, _ = lda_model.inference(chunk)
+        # cumsum keeps the left-to-right summation order of get_document_topics
+        norm = np.cumsum(gamma, axis=1, dtype=np.float64)[:, -1:].astype(gamma.dtype)
+        mat[rows] = gamma / norm
+        rows.clear()
+        chunk.clear()
+
+    for i, bow in enumerate(corpus):
         if not bow:
-            dom.append({"row_idx": i, "topic_id": None, "topic_prob": 0.0})
             continue
-        topics = lda_model.get_document_topics(bow)
-        if topics:
-            tmax = max(topics, key=lambda x: x[1])
-            dom.append({"row_idx": i, "topic_id": tmax[0], "topic_prob": float(tmax[1])})
+        rows.append(i)
+        chunk.append(bow)
+        if len(chunk) >= chunksize:
+            flush()
+    if chunk:
+        flush()
+    return mat
+
+def dominant_topics_df(doc_topics: np.ndarray) -> pd.DataFrame:
+    has_topics = doc_topics.any(axis=1)
+    topic_id = np.where(has_topics, doc_topics.argmax(axis=1), np.nan)
+    topic_prob = np.where(has_topics, doc_topics.max(axis=1), 0.0)
+    return pd.DataFrame({
+        "row_idx": np.arange(len(doc_topics)),
+        "topic_id": topic_id,
+        "topic_prob": topic_prob.astype(np.float64),
+    })
+
+def save_npy(path: Path, arr: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, arr)
+
+def plan_workers(n_configs: int, n_cores: int, lda_workers: int = 1) -> tuple:
+    """Split cores between concurrently trained models and LdaMulticore workers.
+
+    Returns (n_jobs, workers_per_model). With lda_workers=1 every model is
+    trained exactly as in a sequential run, so random_state=42 output stays
+    bit-for-bit reproducible and all parallelism comes from the grid itself.
+    lda_workers=0 hands the cores left over by a small grid to LdaMulticore,
+    whose multi-worker updates are merged in completion order and are
+    therefore not reproducible run to run.
+    """
+    n_configs = max(1, n_configs)
+    n_cores = max(1, n_cores)
+    if lda_workers <= 0:
+        lda_workers = max(1, n_cores // n_configs)
+    n_jobs = max(1, min(n_configs, n_cores // lda_workers))
+    return n_jobs, lda_workers
+
+def sample_corpus(corpus, n_docs: int, seed: int = 42) -> list:
+    """Up to `n_docs` non-empty documents drawn without replacement, in corpus order."""
+    n = len(corpus)
+    if n <= n_docs:
+        return [bow for bow in corpus if bow]
+    idx = np.sort(np.random.default_rng(seed).choice(n, n_docs, replace=False))
+    return [bow for bow in (corpus[int(i)] for i in idx) if bow]  # random access via the .mm.index
+
+def topic_coherence(lda, sample, dictionary, metric, texts=None) -> float:
+    """Mean topic coherence of `lda` on the sample (u_mass, or c_npmi over `texts`)."""
+    if metric == "u_mass":
+        cm = CoherenceModel(model=lda, corpus=sample, dictionary=dictionary, coherence="u_mass",
+                            topn=COHERENCE_TOPN)
+    else:
+        # Bag-of-words documents have no word order, so co-occurrence windows span the whole review
+        cm = CoherenceModel(model=lda, texts=texts, dictionary=dictionary, coherence="c_npmi",
+                            topn=COHERENCE_TOPN, window_size=max(len(t) for t in texts), processes=1)
+    score = float(cm.get_coherence())
+    return score if np.isfinite(score) else float("-inf")
+
+@traced("search k")
+def search_topic_counts(corpus_paths, args) -> dict:
+    """Score k = k_min, k_min + step, ... with quick models on a corpus sample.
+
+    Stops once --patience consecutive k fail to beat the best coherence (or
+    at k_max) and keeps the --keep best k. For those, the search model's
+    topic-word statistics, scaled to the full corpus, warm-start the full
+    training.
+    """
+    dictionary, corpus = load_corpus(*corpus_paths)
+    sample = sample_corpus(corpus, args.search_sample)
+    texts = None
+    if args.coherence == "c_npmi":
+        texts = [[dictionary[i] for i, cnt in bow for _ in range(int(cnt))] for bow in sample]
+    k_min, k_max = args.k_range
+    scores, sstats = [], {}
+    best, since_best, stopped = None, 0, "reached k_max"
+    for k in range(k_min, k_max + 1, args.k_step) if sample else []:
+        t0 = time.perf_counter()
+        with span("search model", k=k):
+            lda = LdaModel(corpus=sample, id2word=dictionary, num_topics=k, passes=args.search_passes,
+                           random_state=42, eval_every=None)
+            score = topic_coherence(lda, sample, dictionary, args.coherence, texts)
+        scores.append({"k": k, "coherence": score, "seconds": round(time.perf_counter() - t0, 3)})
+        sstats[k] = lda.state.sstats * (len(corpus) / len(sample))
+        print(f"  k={k:<3} {args.coherence} = {score:.4f} ({scores[-1]['seconds']:.1f}s)")
+        if best is None or score > best:
+            best, since_best = score, 0
         else:
-            dom.append({"row_idx": i, "topic_id": None, "topic_prob": 0.0})
-    return pd.DataFrame(dom)
+            since_best += 1
+            if since_best >= args.patience:
+                stopped = f"no improvement for {since_best} k values"
+                break
+    ranked = sorted(scores, key=lambda row: row["coherence"], reverse=True)
+    chosen = sorted(row["k"] for row in ranked[:args.keep])
+    return {
+        "metric": args.coherence,
+        "sample_docs": len(sample),
+        "search_passes": args.search_passes,
+        "k_range": [k_min, k_max],
+        "k_step": args.k_step,
+        "stopped": stopped,
+        "scores": scores,
+        "chosen": chosen,
+        "init": {k: sstats[k] for k in chosen},
+    }
+
+def review_keys(df_lang: pd.DataFrame) -> np.ndarray:
+    """Stable uint64 key per review, used to tell already-seen reviews from new ones."""
+    cols = [c for c in REVIEW_KEY_COLS if c in df_lang.columns]
+    if len(cols) < len(REVIEW_KEY_COLS):
+        cols = ["review_text"] if "review_text" in df_lang.columns else ["text_processed"]
+    return pd.util.hash_pandas_object(df_lang[cols].astype(str), index=False).to_numpy()
+
+def count_tokens(processed: pd.Series) -> int:
+    return int(processed.fillna("").astype(str).str.split().str.len().sum())
+
+def oov_rate(texts, dictionary) -> float:
+    """Share of token occurrences that the dictionary does not know."""
+    total = sum(len(t) for t in texts)
+    if not total:
+        return 0.0
+    known = sum(1 for t in texts for tok in t if tok in dictionary.token2id)
+    return 1.0 - known / total
+
+def model_dir(lang_code: str, num_topics: int) -> Path:
+    return MODELS_DIR / f"{lang_code}_{num_topics}"
+
+@traced("save model")
+def save_model_state(lang_code, num_topics, lda, keys, baseline_oov):
+    """Persist the model, the keys of the reviews it has seen and its baseline OOV rate.
+
+    The files are written to a temp directory that is swapped in afterwards,
+    so an interrupted run leaves the previous state intact.
+    """
+    target = model_dir(lang_code, num_topics)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    old = target.with_name(f".{target.name}.{os.getpid()}.old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    lda.save(str(tmp / "lda.model"))
+    save_npy(tmp / "seen.npy", np.asarray(keys, dtype=np.uint64))
+    (tmp / "state.json").write_text(json.dumps({
+        "n_seen": int(len(keys)),
+        "baseline_oov": float(baseline_oov),
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }))
+    if target.exists():
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+def load_model_state(lang_code: str, num_topics: int):
+    """Return (seen_keys, state) for a saved model, or None if there is none."""
+    path = model_dir(lang_code, num_topics)
+    if not (path / "lda.model").exists() or not (path / "state.json").exists():
+        return None
+    return np.load(path / "seen.npy"), json.loads((path / "state.json").read_text())
+
+@traced("plan incremental")
+def plan_incremental(lang_code, num_topics, df_lang, keys, drift_threshold) -> tuple:
+    """Decide how to bring one configuration up to date.
+
+    Returns ("skip" | "update" | "full", reason, first_new_row). Updates are
+    only possible when the already-seen reviews are still the leading rows of
+    the language slice (append-only data), so their row_idx stay valid.
+    """
+    saved = load_model_state(lang_code, num_topics)
+    if saved is None:
+        return "full", "no saved model", 0
+    if not assignments_path(lang_code, num_topics).exists():
+        return "full", "missing assignments", 0
+    seen, state = saved
+    n_seen = len(seen)
+    if n_seen > len(keys) or not np.array_equal(keys[:n_seen], seen):
+        return "full", "previously seen reviews changed or were reordered", 0
+    if n_seen == len(keys):
+        return "skip", "no new reviews", n_seen
+
+    lda = LdaMulticore.load(str(model_dir(lang_code, num_topics) / "lda.model"))
+    drift = oov_rate(prepare_texts(df_lang.iloc[n_seen:]), lda.id2word) - state["baseline_oov"]
+    if drift > drift_threshold:
+        return "full", f"vocabulary drift {drift:.1%} > {drift_threshold:.1%}", 0
+    return "update", f"{len(keys) - n_seen} new reviews, vocabulary drift {drift:.1%}", n_seen
+
+@traced("write assignments")
+def write_assignments(lang_code, num_topics, corpus, lda, chunksize) -> tuple:
+    """Write assign_*.parquet and doc_topics_*.npy chunk by chunk.
+
+    Each chunk of the stored corpus becomes one Parquet row group and one
+    slice of a memory-mapped doc-topic matrix, so memory use does not grow
+    with the number of reviews.
+    """
+    assign_path = assignments_path(lang_code, num_topics)
+    npy_path = OUTPUT_DIR / f"doc_topics_{lang_code}_{num_topics}.npy"
+    tmp_assign = assign_path.with_name(f".{assign_path.name}.{os.getpid()}.tmp")
+    tmp_npy = npy_path.with_name(f".{npy_path.name}.{os.getpid()}.tmp")
+    try:
+        mat = np.lib.format.open_memmap(tmp_npy, mode="w+", dtype=np.float32,
+                                        shape=(len(corpus), lda.num_topics))
+        with pq.ParquetWriter(tmp_assign, ASSIGNMENT_SCHEMA) as writer:
+            docs = iter(corpus)
+            start = 0
+            while True:
+                bows = list(itertools.islice(docs, chunksize))
+                if not bows:
+                    break
+                doc_topics = doc_topic_matrix(bows, lda)
+                mat[start:start + len(bows)] = doc_topics
+                dom_df = dominant_topics_df(doc_topics)
+                dom_df["row_idx"] += start
+                writer.write_table(assignments_table(dom_df))
+                start += len(bows)
+        mat.flush()
+        del mat
+        os.replace(tmp_npy, npy_path)
+        os.replace(tmp_assign, assign_path)
+    finally:
+        for tmp in (tmp_assign, tmp_npy):
+            if tmp.exists():
+                tmp.unlink()
+    return assign_path, npy_path
+
+@collect_spans
+def run_config(lang_code, num_topics, corpus_paths, keys, n_tokens, passes, lda_workers,
+               chunksize=STREAM_CHUNKSIZE, init_sstats=None) -> dict:
+    """Train one (language, num_topics) model and write its outputs atomically."""
+    t0 = time.perf_counter()
+    with span("load corpus"):
+        dictionary, corpus = load_corpus(*corpus_paths)
+    lda = train_lda(corpus, dictionary, num_topics, passes, workers=lda_workers, init_sstats=init_sstats)
+    if lda is None:
+        return {"lang": lang_code, "num_topics": num_topics, "ok": False,
+                "seconds": time.perf_counter() - t0}
+
+    # Save topics JSON
+    with span("save topics"):
+        topics_df = topics_to_df(lda, 10)
+        topics_path = atomic_write(
+            OUTPUT_DIR / f"topics_{lang_code}_{num_topics}.json",
+            lambda p: topics_df.to_json(p, orient="records"),
+        )
+
+    # Save dominant topic assignments, plus the full soft assignments
+    assign_path, doc_topics_path = write_assignments(lang_code, num_topics, corpus, lda, chunksize)
+
+    # Keep the model around so --incremental runs can fold in new reviews
+    kept = sum(cnt for bow in corpus for _, cnt in bow)
+    save_model_state(lang_code, num_topics, lda, keys, 1.0 - kept / n_tokens if n_tokens else 0.0)
+    return {"lang": lang_code, "num_topics": num_topics, "ok": True, "mode": "full",
+            "seconds": time.perf_counter() - t0, "passes": passes, "n_docs": len(corpus),
+            "warm_start": init_sstats is not None,
+            "topics_path": topics_path, "assign_path": assign_path,
+            "doc_topics_path": doc_topics_path}
+
+@collect_spans
+def update_config(lang_code, num_topics, new_texts, first_row, keys, passes, lda_workers) -> dict:
+    """Fold new reviews into a saved model with an online update and append their topics."""
+    t0 = time.perf_counter()
+    with span("load model"):
+        seen, state = load_model_state(lang_code, num_topics)
+        lda = LdaMulticore.load(str(model_dir(lang_code, num_topics) / "lda.model"))
+    lda.workers = lda_workers
+    lda.passes = passes
+    with span("update lda"):
+        new_corpus = [lda.id2word.doc2bow(text) for text in new_texts]
+        if any(new_corpus):
+            lda.update([bow for bow in new_corpus if bow])
+
+    with span("save topics"):
+        topics_df = topics_to_df(lda, 10)
+        topics_path = atomic_write(
+            OUTPUT_DIR / f"topics_{lang_code}_{num_topics}.json",
+            lambda p: topics_df.to_json(p, orient="records"),
+        )
+
+    # Only the new rows get (and append) topic assignments
+    with span("append assignments"):
+        doc_topics = doc_topic_matrix(new_corpus, lda)
+        doc_topics_path = OUTPUT_DIR / f"doc_topics_{lang_code}_{num_topics}.npy"
+        if doc_topics_path.exists():
+            old = np.load(doc_topics_path, mmap_mode="r")
+            if len(old) == first_row:
+                atomic_write(doc_topics_path, lambda p: save_npy(p, np.vstack([old, doc_topics])))
+            else:
+                # Out of step with the assignments: drop it rather than serve a stale matrix
+                del old
+                doc_topics_path.unlink()
+        if not doc_topics_path.exists():
+            doc_topics_path = None
+        dom_df = dominant_topics_df(doc_topics)
+        dom_df["row_idx"] += first_row
+        assign_path = assignments_path(lang_code, num_topics)
+        table = pa.concat_tables([pq.read_table(assign_path), assignments_table(dom_df)])
+        atomic_write(assign_path, lambda p: pq.write_table(table, p))
+
+    save_model_state(lang_code, num_topics, lda, keys, state["baseline_oov"])
+    return {"lang": lang_code, "num_topics": num_topics, "ok": True, "mode": "update",
+            "n_new": len(new_texts), "n_docs": first_row + len(new_texts),
+            "seconds": time.perf_counter() - t0, "passes": passes,
+            "topics_path": topics_path, "assign_path": assign_path,
+            "doc_topics_path": doc_topics_path}
+
+def update_manifest(lang_code: str, apply):
+    """Read-modify-write one language's entry of output/topics_manifest.json (main process only)."""
+    manifest = read_topics_manifest()
+    apply(manifest.setdefault(lang_code, {}))
+    atomic_write(TOPICS_MANIFEST, lambda p: p.write_text(json.dumps(manifest, indent=2)))
+
+def finite_or_none(value):
+    return round(value, 6) if value is not None and np.isfinite(value) else None
+
+def record_search(lang_code: str, search: dict):
+    entry = {k: v for k, v in search.items() if k != "init"}
+    entry["scores"] = [dict(row, coherence=finite_or_none(row["coherence"])) for row in search["scores"]]
+    entry["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def apply(lang_entry):
+        lang_entry["search"] = entry
+    update_manifest(lang_code, apply)
+
+def record_model(result: dict):
+    """Manifest entry for a trained or updated model (carries its search coherence, if any)."""
+    k = result["num_topics"]
+
+    def apply(lang_entry):
+        models = lang_entry.setdefault("models", {})
+        previous = models.get(str(k), {})
+        if result["mode"] == "update":
+            coherence, metric = previous.get("coherence"), previous.get("metric")
+        elif result.get("warm_start"):
+            search = lang_entry.get("search", {})
+            coherence = next((row["coherence"] for row in search.get("scores", []) if row["k"] == k), None)
+            metric = search.get("metric")
+        else:
+            coherence, metric = None, None
+        models[str(k)] = {
+            "num_topics": k,
+            "mode": result["mode"],
+            "passes": result.get("passes"),
+            "seconds": round(result["seconds"], 3),
+            "n_docs": result.get("n_docs", previous.get("n_docs")),
+            "warm_start": result.get("warm_start", previous.get("warm_start", False)),
+            "metric": metric,
+            "coherence": coherence,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+    update_manifest(result["lang"], apply)
+
+def peak_rss_mb() -> tuple:
+    """Peak resident memory of this process and of its (finished) workers, in MB."""
+    if resource is None:
+        return None, None
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+def report(result: dict):
+    lang_name = LANG_NAMES[result["lang"]]
+    if not result["ok"]:
+        print(f"Failed to train LDA for {lang_name} with {result['num_topics']} topics")
+        return
+    print(f"✓ Saved topics -> {result['topics_path']}")
+    if result["mode"] == "update":
+        print(f"✓ Appended {result['n_new']} assignments -> {result['assign_path']}")
+        if result["doc_topics_path"] is None:
+            print("  Doc-topic matrix missing or out of date; rerun without --incremental to rebuild it")
+    else:
+        print(f"✓ Saved assignments -> {result['assign_path']}")
+        print(f"✓ Saved doc-topic matrix -> {result['doc_topics_path']}")
+    print(f"  {lang_name}, {result['num_topics']} topics: {result['seconds']:.1f}s wall")
 
 def main():
     parser = argparse.ArgumentParser(description="Precompute LDA topics for reviews dashboard")
@@ -66,55 +583,203 @@ def main():
                         help="Minimum word frequency to include in dictionary (default: 2)")
     parser.add_argument("--languages", nargs="+", choices=["en", "pt"], default=["en", "pt"],
                         help="Languages to process (default: en pt)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="CPU cores to use across the whole grid (default: all cores)")
+    parser.add_argument("--lda-workers", type=int, default=1,
+                        help="LdaMulticore workers per model (default: 1, reproducible; "
+                             "0 = give spare cores to each model, not reproducible)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fold only new reviews into the saved models instead of retraining")
+    parser.add_argument("--drift-threshold", type=float, default=0.10,
+                        help="With --incremental, retrain from scratch when the out-of-vocabulary "
+                             "rate of new reviews exceeds the training rate by more than this (default: 0.10)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Out-of-core mode: read the CSV in chunks and never hold the whole corpus in memory")
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNKSIZE,
+                        help=f"Rows per CSV chunk with --stream and per assignment row group (default: {STREAM_CHUNKSIZE})")
+    parser.add_argument("--auto-k", action="store_true",
+                        help="Choose topic counts by a coherence search (instead of --topics) and train only those")
+    parser.add_argument("--k-range", nargs=2, type=int, default=list(K_RANGE), metavar=("MIN", "MAX"),
+                        help=f"With --auto-k, topic counts to search (default: {K_RANGE[0]} {K_RANGE[1]})")
+    parser.add_argument("--k-step", type=int, default=1, help="With --auto-k, step between searched k (default: 1)")
+    parser.add_argument("--coherence", choices=["u_mass", "c_npmi"], default="u_mass",
+                        help="With --auto-k, coherence measure (default: u_mass)")
+    parser.add_argument("--search-sample", type=int, default=SEARCH_SAMPLE,
+                        help=f"With --auto-k, reviews sampled per language for the search (default: {SEARCH_SAMPLE})")
+    parser.add_argument("--search-passes", type=int, default=SEARCH_PASSES,
+                        help=f"With --auto-k, LDA passes of each search model (default: {SEARCH_PASSES})")
+    parser.add_argument("--patience", type=int, default=PATIENCE,
+                        help=f"With --auto-k, stop after this many k without a better score (default: {PATIENCE})")
+    parser.add_argument("--keep", type=int, default=1,
+                        help="With --auto-k, best k values to train with --passes (default: 1)")
+    parser.add_argument("--trace", type=Path, default=None,
+                        help="Also write the timing spans as Chrome trace JSON (chrome://tracing, Perfetto)")
     args = parser.parse_args()
+    if args.stream and args.incremental:
+        parser.error("--stream and --incremental cannot be combined")
+    if args.auto_k and args.incremental:
+        parser.error("--auto-k and --incremental cannot be combined")
+    if args.auto_k and not 1 <= args.k_range[0] <= args.k_range[1]:
+        parser.error("--k-range needs 1 <= MIN <= MAX")
+    if args.auto_k and args.k_step < 1:
+        parser.error("--k-step must be at least 1")
 
     if not ENRICHED_CSV.exists():
         print(f"Missing enriched CSV: {ENRICHED_CSV}")
         return
-    df = pd.read_csv(ENRICHED_CSV, low_memory=False)
 
-    lang_map = {"en": "English", "pt": "Portuguese"}
-    
+    tracer = Tracer().activate()
+    if args.stream:
+        tasks = stream_tasks(args)
+    else:
+        tasks = memory_tasks(args)
+
+    run_tasks(tasks, args)
+
+    # Worker spans were merged by run_tasks; parallel configurations overlap in wall time
+    print("\nTiming breakdown:")
+    for line in format_summary(tracer):
+        print(f"  {line}")
+    if args.trace:
+        print(f"✓ Saved Chrome trace -> {write_chrome_trace(args.trace, tracer.spans)}")
+
+def stream_tasks(args) -> list:
+    """Scheduler tasks for --stream mode: one scan per language, nothing held in memory."""
+    # The dashboard joins assignments to reviews.parquet by row_idx, so it must match the CSV
+    with span("update review table"):
+        ensure_reviews_table(chunksize=args.chunksize)
+    tasks = []
     for lang_code in args.languages:
-        lang_name = lang_map[lang_code]
+        lang_name = LANG_NAMES[lang_code]
+        scan = scan_language(ENRICHED_CSV, lang_code, args.min_word_freq, args.chunksize)
+        if scan["n_docs"] < 5:
+            print(f"Skipping {lang_name}: insufficient reviews ({scan['n_docs']})")
+            continue
+        if not scan["n_nonempty"]:
+            print(f"Skipping {lang_name}: insufficient tokens")
+            continue
+
+        dict_path, mm_path, cached = build_corpus(
+            lang_code, scan["key"],
+            lambda: StreamingTexts(ENRICHED_CSV, lang_code, args.chunksize), args.min_word_freq)
+        print(f"{'Reusing' if cached else 'Built'} {lang_name} corpus -> {mm_path}")
+        counts, init = args.topics, {}
+        if args.auto_k:
+            counts, init = auto_k(lang_code, (dict_path, mm_path), args)
+        for num_topics in counts:
+            tasks.append((run_config, dict(
+                lang_code=lang_code, num_topics=num_topics, corpus_paths=(dict_path, mm_path),
+                keys=scan["keys"], n_tokens=scan["n_tokens"],
+                passes=args.passes, chunksize=args.chunksize, init_sstats=init.get(num_topics)), scan["n_docs"]))
+    return tasks
+
+def memory_tasks(args) -> list:
+    """Scheduler tasks for the default mode, which loads the needed columns into memory."""
+    with span("load reviews"):
+        ensure_reviews_table()
+        columns = ["lang", "text_processed"] + REVIEW_KEY_COLS
+        if not all(c in review_columns() for c in REVIEW_KEY_COLS):
+            columns.append("review_text")
+        df = read_reviews(columns)
+
+    tasks = []
+    for lang_code in args.languages:
+        lang_name = LANG_NAMES[lang_code]
         df_lang = df[df["lang"].eq(lang_code)].copy()
         if df_lang.empty or len(df_lang) < 5:
             print(f"Skipping {lang_name}: insufficient reviews ({len(df_lang)})")
             continue
 
-        texts = prepare_texts(df_lang)
-        if len(texts) < 5 or all(len(t) == 0 for t in texts):
+        if df_lang["text_processed"].fillna("").astype(str).str.split().str.len().eq(0).all():
             print(f"Skipping {lang_name}: insufficient tokens")
             continue
 
-        for num_topics in args.topics:
-            print(f"\nTraining LDA for {lang_name} ({num_topics} topics, {args.passes} passes, {len(texts)} reviews)...")
-            lda, dictionary = train_lda(texts, num_topics, args.passes, args.min_word_freq)
-            if lda is None:
-                print(f"Failed to train LDA for {lang_name} with {num_topics} topics")
-                continue
-
-            # Save topics JSON
-            topics_df = topics_to_df(lda, 10)
-            topics_path = OUTPUT_DIR / f"topics_{lang_code}_{num_topics}.json"
-            topics_df.to_json(topics_path, orient="records")
-            print(f"✓ Saved topics -> {topics_path}")
-
-            # Save dominant topics CSV with review context
-            dom_df = dominant_topics_df(texts, lda, dictionary)
-            # attach review context columns for easy display
-            keep_cols = [
-                "place_name", "rating", "review_text", "publish_time",
-            ]
-            for c in keep_cols:
-                if c in df_lang.columns:
-                    dom_df[c] = df_lang[c].values
-            dom_path = OUTPUT_DIR / f"dom_{lang_code}_{num_topics}.csv"
-            dom_df.to_csv(dom_path, index=False)
-            print(f"✓ Saved assignments -> {dom_path}")
-    
+        keys = review_keys(df_lang)
+        corpus_paths = None
+        counts, init = args.topics, {}
+        if args.auto_k:
+            corpus_paths = memory_corpus(lang_code, df_lang, args)
+            counts, init = auto_k(lang_code, corpus_paths, args)
+        for num_topics in counts:
+            if args.incremental:
+                mode, reason, first_row = plan_incremental(lang_code, num_topics, df_lang, keys,
+                                                           args.drift_threshold)
+                print(f"{lang_name}, {num_topics} topics: {mode} ({reason})")
+                if mode == "skip":
+                    continue
+                if mode == "update":
+                    tasks.append((update_config, dict(
+                        lang_code=lang_code, num_topics=num_topics,
+                        new_texts=prepare_texts(df_lang.iloc[first_row:]), first_row=first_row,
+                        keys=keys,
+                        passes=args.passes), len(df_lang) - first_row))
+                    continue
+
+            if corpus_paths is None:
+                corpus_paths = memory_corpus(lang_code, df_lang, args)
+            tasks.append((run_config, dict(
+                lang_code=lang_code, num_topics=num_topics, corpus_paths=corpus_paths,
+                keys=keys, n_tokens=count_tokens(df_lang["text_processed"]),
+                passes=args.passes, chunksize=args.chunksize, init_sstats=init.get(num_topics)), len(df_lang)))
+    return tasks
+
+def memory_corpus(lang_code: str, df_lang: pd.DataFrame, args) -> tuple:
+    dict_path, mm_path, cached = build_corpus(
+        lang_code, corpus_key(df_lang["text_processed"], args.min_word_freq),
+        lambda: prepare_texts(df_lang), args.min_word_freq)
+    print(f"{'Reusing' if cached else 'Built'} {LANG_NAMES[lang_code]} corpus -> {mm_path}")
+    return dict_path, mm_path
+
+def auto_k(lang_code: str, corpus_paths: tuple, args) -> tuple:
+    """Run the --auto-k search for one language and record it; returns (chosen k, warm starts)."""
+    lang_name = LANG_NAMES[lang_code]
+    print(f"Searching topic counts for {lang_name}: k {args.k_range[0]}-{args.k_range[1]}, "
+          f"{args.coherence} on up to {args.search_sample} reviews, {args.search_passes} passes")
+    search = search_topic_counts(corpus_paths, args)
+    record_search(lang_code, search)
+    print(f"{lang_name}: chose k = {', '.join(map(str, search['chosen'])) or 'none'} ({search['stopped']})")
+    return search["chosen"], search["init"]
+
+def merge_spans(result: dict) -> dict:
+    """Move a task's spans (recorded in its own process) into this process's tracer."""
+    spans = result.pop("spans", [])
+    tracer = current()
+    if tracer is not None:
+        tracer.spans.extend(spans)
+    return result
+
+def complete(result: dict):
+    """Merge a finished task's spans, record its model in the manifest and print its outputs."""
+    merge_spans(result)
+    if result["ok"]:
+        record_model(result)
+    report(result)
+
+def run_tasks(tasks: list, args):
+    n_jobs, lda_workers = plan_workers(len(tasks), args.jobs, args.lda_workers)
+    print(f"Training {len(tasks)} configurations: {n_jobs} concurrent model(s) x {lda_workers} LDA worker(s)")
+
+    t0 = time.perf_counter()
+    if n_jobs == 1:
+        for fn, kwargs, n_docs in tasks:
+            verb = "Updating" if fn is update_config else "Training"
+            print(f"\n{verb} LDA for {LANG_NAMES[kwargs['lang_code']]} ({kwargs['num_topics']} topics, {args.passes} passes, {n_docs} reviews)...")
+            complete(fn(lda_workers=lda_workers, **kwargs))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = []
+            for fn, kwargs, n_docs in tasks:
+                print(f"Queued {'update' if fn is update_config else 'training'} of LDA for {LANG_NAMES[kwargs['lang_code']]} ({kwargs['num_topics']} topics, {args.passes} passes, {n_docs} reviews)")
+                futures.append(pool.submit(fn, lda_workers=lda_workers, **kwargs))
+            for fut in as_completed(futures):
+                print()
+                complete(fut.result())
+
     print("\n" + "="*60)
-    print("Precomputation complete!")
+    print(f"Precomputation complete! ({time.perf_counter() - t0:.1f}s total)")
+    rss_main, rss_workers = peak_rss_mb()
+    if rss_main is not None:
+        print(f"Peak RSS: {rss_main:.0f} MB main process, {rss_workers:.0f} MB largest worker")
     print("="*60)
 
 if __name__ == "__main__":
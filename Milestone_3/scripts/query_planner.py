@@ -0,0 +1,114 @@
+"""Coalesce per-POI Nearby Search circles into fewer, larger query circles.
+
+The notebook sends one RADIUS_METERS search per POI. In dense streets those
+circles overlap and return the same places again and again. The planner puts
+the POIs on a grid index and groups every POI whose circle fits inside a
+shared query circle of at most `query_radius` meters, greedily and in POI
+order. Each group is one request. Returned places are mapped back to every
+member POI whose own circle contains them, so poi_row_index / poi_gid
+attribution stays the same as with per-POI requests.
+
+A request returns at most MAX_RESULTS places, so a full page may have hidden
+some. When that happens the fetcher splits the group into circles of half the
+size (split_group) and queries those, down to single POIs.
+"""
+import math
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+# Default radius of a coalesced query circle
+QUERY_RADIUS = 100
+# Nearby Search page size cap (maxResultCount <= 20)
+MAX_RESULTS = 20
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def plan_queries(targets: list, radius: float, query_radius: float = QUERY_RADIUS) -> List[Dict[str, Any]]:
+    """Group [(poi, lat, lon)] into query circles.
+
+    Returns [{"lat", "lon", "radius", "members": [(poi, lat, lon), ...]}] in
+    POI order. A member's own `radius` circle always lies inside its group's
+    circle; single-POI groups are exactly the per-POI request.
+    """
+    reach = query_radius - radius  # max distance from a group center to a member POI
+    if not targets:
+        return []
+    if reach <= 0:
+        return [{"lat": lat, "lon": lon, "radius": radius, "members": [(idx, lat, lon)]}
+                for idx, lat, lon in targets]
+
+    lat = np.array([t[1] for t in targets], dtype=np.float64)
+    lon = np.array([t[2] for t in targets], dtype=np.float64)
+    # Local equirectangular projection is accurate enough at city scale
+    m_per_deg = math.radians(1) * EARTH_RADIUS_M
+    y = lat * m_per_deg
+    x = lon * m_per_deg * math.cos(math.radians(float(lat.mean())))
+    cells = defaultdict(list)
+    for i, (cx, cy) in enumerate(zip(np.floor(x / reach).astype(np.int64), np.floor(y / reach).astype(np.int64))):
+        cells[(cx, cy)].append(i)
+
+    assigned = np.zeros(len(targets), dtype=bool)
+    groups = []
+    for seed in range(len(targets)):
+        if assigned[seed]:
+            continue
+        cx, cy = int(np.floor(x[seed] / reach)), int(np.floor(y[seed] / reach))
+        near = [i for dx in (-1, 0, 1) for dy in (-1, 0, 1) for i in cells.get((cx + dx, cy + dy), ())
+                if not assigned[i]]
+        near = np.array(sorted(near), dtype=np.int64)
+        members = near[np.hypot(x[near] - x[seed], y[near] - y[seed]) <= reach]
+        assigned[members] = True
+
+        # Center on the seed or on the members' centroid, whichever needs the smaller circle
+        centers = [(lat[seed], lon[seed]), (lat[members].mean(), lon[members].mean())]
+        spans = [haversine_m(c_lat, c_lon, lat[members], lon[members]).max() for c_lat, c_lon in centers]
+        best = int(np.argmin(spans))
+        groups.append({
+            "lat": float(centers[best][0]),
+            "lon": float(centers[best][1]),
+            "radius": float(spans[best] + radius) if len(members) > 1 else radius,
+            "members": [targets[i] for i in members],
+        })
+    return groups
+
+
+def split_group(group: dict, radius: float) -> list:
+    """Re-plan a group's POIs with half its reach; always yields more than one group."""
+    reach = group["radius"] - radius
+    subgroups = plan_queries(group["members"], radius, radius + reach / 2)
+    if len(subgroups) > 1:
+        return subgroups
+    return plan_queries(group["members"], radius, radius)
+
+
+def assign_places(places: list, members: list, radius: float) -> dict:
+    """{poi: places inside that POI's own `radius` circle}, keeping the response order."""
+    out = {idx: [] for idx, _, _ in members}
+    if not places:
+        return out
+    p_lat = np.array([(p.get("location") or {}).get("latitude", np.nan) for p in places], dtype=np.float64)
+    p_lon = np.array([(p.get("location") or {}).get("longitude", np.nan) for p in places], dtype=np.float64)
+    for idx, lat, lon in members:
+        inside = haversine_m(lat, lon, p_lat, p_lon) <= radius
+        out[idx] = [p for p, ok in zip(places, inside) if ok]
+    return out
+
+
+def saturated(places: list, max_results: int = MAX_RESULTS) -> bool:
+    """True if a response filled the page, so more places may exist in the circle."""
+    return len(places) >= max_results
+
+
+def plan_summary(groups: list) -> str:
+    n_pois = sum(len(g["members"]) for g in groups)
+    saved = n_pois - len(groups)
+    pct = 100.0 * saved / n_pois if n_pois else 0.0
+    return f"{len(groups):,} queries for {n_pois:,} POIs (saves {saved:,} calls, {pct:.0f}%)"
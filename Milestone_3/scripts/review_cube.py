@@ -0,0 +1,199 @@
+"""Aggregate cube behind the dashboard KPIs and charts.
+
+One cell per (lang, place_primary_type, rating bucket, place) holding
+review counts, rating sums/sums of squares, and sentiment_compound counts,
+sums, sums of squares and a fixed-bin histogram. The rating bucket
+dimension (0.1 steps) doubles as the rating histogram. The place is the
+place_id; reviews without one are keyed by their place_name instead (negative
+codes into orphan_names), so they are not counted as places but still show
+up under their own name in the top places.
+
+The sidebar's language, rating and type filters are cube dimensions, so the
+dashboard answers them by slicing and summing cells. Free-text place search
+is not a dimension; for it the dashboard builds a cube from the matching
+rows instead.
+
+Run as a script to (re)build output/review_cube.npz:
+    python3 scripts/review_cube.py
+"""
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import (
+    ENRICHED_CSV, OUTPUT_DIR, REVIEWS_PARQUET, atomic_write, ensure_reviews_table, read_reviews,
+)
+from geo_pyramid import RATING_SCALE, dictionary, matching_codes
+
+CUBE_PATH = OUTPUT_DIR / "review_cube.npz"
+# Sentiment histogram: SENTIMENT_BINS equal bins over [-1, 1]
+SENTIMENT_BINS = 30
+SENTIMENT_EDGES = np.linspace(-1.0, 1.0, SENTIMENT_BINS + 1)
+
+KEY_COLS = ["lang", "ptype", "rating_bucket", "place"]
+SUM_COLS = ["count", "rating_sum", "rating_sq", "sent_count", "sent_sum", "sent_sq"]
+CELL_ARRAYS = KEY_COLS + SUM_COLS + ["sent_hist"]
+SOURCE_COLS = ["lat", "lon", "place_id", "place_name", "place_primary_type", "rating",
+               "lang", "sentiment_compound"]
+
+
+# ---------- Build ----------
+def build_cube(df: pd.DataFrame) -> dict:
+    """Cube arrays plus the language/type/place dictionaries for the rows of `df`."""
+    df = df.dropna(subset=["lat", "lon", "place_name", "rating"])
+    rating = pd.to_numeric(df["rating"], errors="coerce").to_numpy(dtype=np.float64)
+    sent = pd.to_numeric(df["sentiment_compound"], errors="coerce").to_numpy(dtype=np.float64)
+    has_sent = ~np.isnan(sent)
+    lang_codes, langs = dictionary(df["lang"])
+    ptype_codes, ptypes = dictionary(df["place_primary_type"])
+    place_codes, place_ids = dictionary(df["place_id"])
+    # Reviews without a place_id are keyed by their own place_name, as code -1 - name code
+    no_id = place_codes < 0
+    orphan_codes, orphan_names = dictionary(df.loc[no_id, "place_name"])
+    place_codes[no_id] = -1 - orphan_codes
+    sent_bin = np.clip(np.searchsorted(SENTIMENT_EDGES, sent, side="right") - 1, 0, SENTIMENT_BINS - 1)
+
+    frame = pd.DataFrame({
+        "lang": lang_codes.astype(np.int8),
+        "ptype": ptype_codes.astype(np.int16),
+        "rating_bucket": np.rint(rating * RATING_SCALE).astype(np.int16),
+        "place": place_codes.astype(np.int32),
+        "count": np.ones(len(df), dtype=np.int64),
+        "rating_sum": rating,
+        "rating_sq": rating * rating,
+        "sent_count": has_sent.astype(np.int64),
+        "sent_sum": np.where(has_sent, sent, 0.0),
+        "sent_sq": np.where(has_sent, sent * sent, 0.0),
+    })
+    groups = frame.groupby(KEY_COLS, sort=True)
+    cells = groups[SUM_COLS].sum().reset_index()
+
+    # Histogram counts as an (n_cells, SENTIMENT_BINS) matrix
+    cell_of_row = groups.ngroup().to_numpy()
+    hist = np.zeros((len(cells), SENTIMENT_BINS), dtype=np.int32)
+    np.add.at(hist, (cell_of_row[has_sent], sent_bin[has_sent]), 1)
+
+    # Display name per place: its most common name in the data
+    names = (
+        pd.DataFrame({"place": place_codes, "name": df["place_name"].astype(str).to_numpy()})
+        .groupby("place")["name"].agg(lambda s: s.mode().iat[0])
+    )
+    arrays = {c: cells[c].to_numpy(dtype=frame[c].dtype) for c in KEY_COLS + SUM_COLS}
+    arrays.update({
+        "sent_hist": hist,
+        "langs": langs,
+        "ptypes": ptypes,
+        "place_ids": place_ids,
+        "place_names": names.reindex(range(len(place_ids))).fillna("").to_numpy(dtype=str),
+        "orphan_names": orphan_names,
+    })
+    return arrays
+
+
+def save_cube(cube: dict, path: Path = CUBE_PATH) -> Path:
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.savez(f, **cube)
+    return atomic_write(path, write)
+
+
+def cube_stale(path: Path = CUBE_PATH, sources: Iterable[Path] = (ENRICHED_CSV, REVIEWS_PARQUET)) -> bool:
+    """True if the cube is missing or older than any of the review files."""
+    if not path.exists():
+        return True
+    built = path.stat().st_mtime
+    return any(p.exists() and p.stat().st_mtime > built for p in sources)
+
+
+def load_cube(path: Path = CUBE_PATH) -> dict:
+    with np.load(path, allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+# ---------- Slicing ----------
+def slice_cube(cube: dict, langs: Iterable, rating_range: tuple, ptypes: Optional[Iterable] = None) -> dict:
+    """Cells matching the sidebar filters (same dictionaries, fewer rows)."""
+    lo = int(round(rating_range[0] * RATING_SCALE))
+    hi = int(round(rating_range[1] * RATING_SCALE))
+    mask = np.isin(cube["lang"], matching_codes(cube["langs"], langs))
+    mask &= (cube["rating_bucket"] >= lo) & (cube["rating_bucket"] <= hi)
+    if ptypes:
+        mask &= np.isin(cube["ptype"], matching_codes(cube["ptypes"], ptypes))
+    return {k: (v[mask] if k in CELL_ARRAYS else v) for k, v in cube.items()}
+
+
+def lang_mask(cube: dict, lang_code: str) -> np.ndarray:
+    return np.isin(cube["lang"], matching_codes(cube["langs"], [lang_code]))
+
+
+# ---------- Measures ----------
+def summary(cube: dict) -> dict:
+    """Review count, distinct places, mean rating and English share."""
+    n = int(cube["count"].sum())
+    n_en = int(cube["count"][lang_mask(cube, "en")].sum())
+    return {
+        "reviews": n,
+        "places": len(np.unique(cube["place"][cube["place"] >= 0])),
+        "avg_rating": float(cube["rating_sum"].sum() / n) if n else float("nan"),
+        "pct_en": 100.0 * n_en / n if n else float("nan"),
+    }
+
+
+def rating_counts(cube: dict) -> pd.DataFrame:
+    """Reviews per (rating, lang) from the rating bucket dimension."""
+    labels = np.append(cube["langs"], "n/a")  # code -1 (missing) picks the last label
+    frame = pd.DataFrame({
+        "rating": cube["rating_bucket"] / RATING_SCALE,
+        "lang": labels[cube["lang"]],
+        "n_reviews": cube["count"],
+    })
+    return frame.groupby(["rating", "lang"], as_index=False)["n_reviews"].sum()
+
+
+def sentiment_stats(cube: dict, lang_code: str) -> tuple:
+    """(count, mean, sample std) of sentiment_compound for one language."""
+    m = lang_mask(cube, lang_code)
+    n = int(cube["sent_count"][m].sum())
+    if n == 0:
+        return 0, float("nan"), float("nan")
+    total = cube["sent_sum"][m].sum()
+    mean = total / n
+    if n == 1:
+        return n, float(mean), float("nan")
+    var = (cube["sent_sq"][m].sum() - total * mean) / (n - 1)
+    return n, float(mean), float(np.sqrt(max(var, 0.0)))
+
+
+def sentiment_hist(cube: dict, lang_code: str) -> np.ndarray:
+    return cube["sent_hist"][lang_mask(cube, lang_code)].sum(axis=0)
+
+
+def top_places(cube: dict, n: int = 12) -> pd.DataFrame:
+    """Places with the most reviews, grouped by display name like value_counts()."""
+    place, own = cube["place"], cube["place"] >= 0
+    names = np.empty(len(place), dtype=object)
+    names[own] = cube["place_names"][place[own]]
+    keep = own
+    if "orphan_names" in cube:  # older cubes leave out reviews without a place_id
+        names[~own] = cube["orphan_names"][-1 - place[~own]]
+        keep = np.ones(len(place), dtype=bool)
+    counts = pd.Series(cube["count"][keep]).groupby(names[keep]).sum()
+    top = counts.sort_values(ascending=False, kind="stable").head(n)
+    return pd.DataFrame({"place_name": top.index, "n_reviews": top.to_numpy()})
+
+
+def main():
+    t0 = time.time()
+    ensure_reviews_table()
+    df = read_reviews(SOURCE_COLS)
+    cube = build_cube(df)
+    save_cube(cube)
+    print(f"✓ Saved review cube ({len(df):,} reviews -> {len(cube['count']):,} cells) -> {CUBE_PATH}")
+    print(f"  ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Inverted index over the reviews' text_processed tokens, ranked with BM25.
+
+One index per language under output/search/{lang}/, as plain .npy files the
+dashboard memory-maps:
+- terms.npy: sorted vocabulary (UTF-8 bytes)
+- offsets.npy: term i's postings are positions offsets[i]:offsets[i + 1]
+- doc_ids.npy: posting doc ids, sorted within each term, in the narrowest
+  unsigned dtype that holds the language's row count
+- tfs.npy: term frequency per posting (uint8, saturating at 255)
+- doc_len.npy: tokens per review
+- meta.json: review count, mean length and the BM25 parameters
+
+Doc ids are positions among the language's rows in reviews.parquet, i.e. the
+row_idx of the topic assignments. The stored tokens come from
+enrich_reviews.tokens_for_lang, so query words go through the same analyzer
+(stopwords, then RSLP stems for Portuguese, WordNet lemmas for English). A
+word whose analyzed form is not indexed but whose plain form is (texts
+enriched without stemming) is looked up as is; without the NLTK data the
+analyzer falls back to lowercased words.
+
+Run as a script to (re)build the indexes:
+    python3 scripts/review_search.py
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import (
+    ENRICHED_CSV, OUTPUT_DIR, REVIEWS_PARQUET, atomic_write, ensure_reviews_table, read_reviews,
+)
+from tracing import span, traced
+
+SEARCH_DIR = OUTPUT_DIR / "search"
+INDEX_FILES = ["terms", "offsets", "doc_ids", "tfs", "doc_len"]
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+MAX_TF = 255
+
+# Query analyzer, set up on first use
+_analyzer = {}
+
+
+def narrow_uint(max_value: int) -> np.dtype:
+    return np.min_scalar_type(max(int(max_value), 0))
+
+
+# ---------- Build ----------
+@traced("build search index")
+def build_index(texts: pd.Series, k1: float = K1, b: float = B) -> dict:
+    """Index arrays and meta for one language's processed texts (whitespace-separated tokens)."""
+    tokens = texts.fillna("").astype(str).reset_index(drop=True).str.split()
+    doc_len = tokens.str.len().to_numpy(dtype=np.int64)
+    n_docs = len(tokens)
+    flat = tokens.explode().dropna()
+    docs = flat.index.to_numpy(dtype=np.int64)
+    codes, terms = pd.factorize(flat.to_numpy(dtype=object), sort=True)
+
+    # (term, doc) pairs sorted by term, then doc: the postings in order
+    keys, tf = np.unique(codes.astype(np.int64) * max(n_docs, 1) + docs, return_counts=True)
+    term_of = keys // max(n_docs, 1)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_of, minlength=len(terms)), out=offsets[1:])
+    return {
+        "terms": np.asarray([t.encode("utf-8") for t in terms], dtype=bytes),
+        "offsets": offsets,
+        "doc_ids": (keys % max(n_docs, 1)).astype(narrow_uint(n_docs - 1)),
+        "tfs": np.minimum(tf, MAX_TF).astype(np.uint8),
+        "doc_len": doc_len.astype(narrow_uint(doc_len.max() if n_docs else 0)),
+        "meta": {
+            "n_docs": n_docs,
+            "avg_len": float(doc_len.mean()) if n_docs else 0.0,
+            "n_terms": len(terms),
+            "n_postings": len(keys),
+            "k1": k1,
+            "b": b,
+        },
+    }
+
+
+def save_index(index: dict, lang_code: str, root: Path = SEARCH_DIR) -> Path:
+    """Write the arrays, then meta.json last: a complete meta.json marks a complete index."""
+    def writer(array):
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+        return write
+
+    path = root / lang_code
+    path.mkdir(parents=True, exist_ok=True)
+    for name in INDEX_FILES:
+        atomic_write(path / f"{name}.npy", writer(index[name]))
+    atomic_write(path / "meta.json", lambda tmp: tmp.write_text(json.dumps(index["meta"], indent=2)))
+    return path
+
+
+def index_stale(lang_code: str, root: Path = SEARCH_DIR,
+                sources: Iterable[Path] = (ENRICHED_CSV, REVIEWS_PARQUET)) -> bool:
+    """True if the language's index is missing or older than any of the review files."""
+    meta = root / lang_code / "meta.json"
+    if not meta.exists():
+        return True
+    built = meta.stat().st_mtime
+    return any(p.exists() and p.stat().st_mtime > built for p in sources)
+
+
+def load_index(lang_code: str, root: Path = SEARCH_DIR) -> Optional[dict]:
+    """Memory-mapped index arrays plus meta; None if the index is missing or unreadable."""
+    path = root / lang_code
+    try:
+        index = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in INDEX_FILES}
+        index["meta"] = json.loads((path / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+    return index
+
+
+# ---------- Query ----------
+def analyze_query(query: str, lang_code: str) -> list:
+    """Query terms as the index stores them: enrich_reviews.tokens_for_lang on the cleaned query."""
+    from enrich_reviews import clean_text
+
+    if "tokens" not in _analyzer:
+        try:
+            from enrich_reviews import init_worker, tokens_for_lang
+
+            init_worker()
+            tokens_for_lang("checking", "en")  # WordNet loads lazily
+            tokens_for_lang("checking", "pt")
+            _analyzer["tokens"] = tokens_for_lang
+        except LookupError:
+            # NLTK data missing: unstemmed lowercased words
+            _analyzer["tokens"] = lambda s, lang: [t for t in re.findall(r"\w+", s) if t.isalpha() and len(t) > 2]
+    return list(dict.fromkeys(_analyzer["tokens"](clean_text(query), lang_code)))
+
+
+def term_position(index: dict, term: str) -> Optional[int]:
+    """Position of `term` in the sorted vocabulary (binary search), None if absent."""
+    key = term.encode("utf-8")
+    i = int(np.searchsorted(index["terms"], key))
+    if i == len(index["terms"]) or index["terms"][i] != key:
+        return None
+    return i
+
+
+def query_terms(index: dict, query: str, lang_code: str) -> list:
+    """Terms to look up: each query word's analyzed form, or the word itself if only that is indexed."""
+    from enrich_reviews import clean_text
+
+    terms = []
+    for word in clean_text(query).split():
+        analyzed = analyze_query(word, lang_code)
+        if not analyzed:
+            continue  # stopword or too short
+        terms.append(next((t for t in (analyzed[0], word) if term_position(index, t) is not None), analyzed[0]))
+    return list(dict.fromkeys(terms))
+
+
+def postings(index: dict, term: str) -> tuple:
+    """(doc_ids, tfs) of a term; empty arrays if it is not in the vocabulary."""
+    i = term_position(index, term)
+    if i is None:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8)
+    lo, hi = index["offsets"][i], index["offsets"][i + 1]
+    return np.asarray(index["doc_ids"][lo:hi], dtype=np.int64), np.asarray(index["tfs"][lo:hi])
+
+
+@traced("bm25 search")
+def search(index: dict, terms: list) -> tuple:
+    """(doc_ids, scores) of reviews containing any of `terms`, best BM25 score first."""
+    meta = index["meta"]
+    n_docs, avg_len, k1, b = meta["n_docs"], max(meta["avg_len"], 1e-9), meta["k1"], meta["b"]
+    hit_docs, hit_scores = [], []
+    for term in terms:
+        docs, tf = postings(index, term)
+        if not len(docs):
+            continue
+        df = len(docs)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        tf = tf.astype(np.float64)
+        norm = k1 * (1.0 - b + b * index["doc_len"][docs] / avg_len)
+        hit_docs.append(docs)
+        hit_scores.append(idf * tf * (k1 + 1.0) / (tf + norm))
+    if not hit_docs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    docs, inverse = np.unique(np.concatenate(hit_docs), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+    order = np.lexsort((docs, -scores))
+    return docs[order], scores[order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 review search indexes for the dashboard")
+    parser.add_argument("--langs", nargs="+", default=None,
+                        help="Languages to index (default: every language in the review table)")
+    parser.add_argument("--k1", type=float, default=K1, help=f"BM25 k1 (default: {K1})")
+    parser.add_argument("--b", type=float, default=B, help=f"BM25 b (default: {B})")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    ensure_reviews_table()
+    with span("load reviews"):
+        df = read_reviews(["lang", "text_processed"])
+    langs = args.langs or sorted(df["lang"].dropna().astype(str).unique())
+    for lang_code in langs:
+        index = build_index(df.loc[df["lang"].eq(lang_code), "text_processed"], args.k1, args.b)
+        path = save_index(index, lang_code)
+        meta = index["meta"]
+        print(f"✓ Saved {lang_code} search index ({meta['n_docs']:,} reviews, {meta['n_terms']:,} terms, "
+              f"{meta['n_postings']:,} postings) -> {path}")
+    print(f"  ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
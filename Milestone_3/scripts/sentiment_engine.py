@@ -0,0 +1,214 @@
+"""Sentiment scorers for the enrichment pipeline, one per language behind the same interface.
+
+Every scorer has `name`, `version` (used to key cached results, see
+nlp_cache) and `score(texts) -> np.ndarray` (compound scores in [-1, 1], NaN
+where a text cannot be scored):
+
+- VaderScorer — English, VADER compound score (as in the notebook)
+- BertweetPTScorer — Portuguese, pysentimiento/bertweet-pt-sentiment with
+  P(POS) - P(NEG) as the compound score. Texts are tokenized once, sorted by
+  token length and run in batches padded only to the longest text of the
+  batch, under torch.inference_mode. Batch size, torch thread count and
+  dynamic int8 quantization of the Linear layers are configurable.
+- TextBlobScorer — Portuguese fallback when transformers/torch are missing
+
+Run as a script to benchmark the scorers side by side on enriched reviews:
+    python3 scripts/sentiment_engine.py --sample 1000 --batch-size 32
+"""
+import argparse
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import ENRICHED_CSV
+from nlp_cache import dist_version, text_key
+
+PT_MODEL = "pysentimiento/bertweet-pt-sentiment"
+BATCH_SIZE = 32
+# BERTweet's position limit; longer reviews are truncated like pipeline(truncation=True)
+MAX_TOKENS = 128
+
+
+def _is_text(t) -> bool:
+    return isinstance(t, str)
+
+
+class VaderScorer:
+    name = "vader"
+
+    def __init__(self):
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        self.analyzer = SentimentIntensityAnalyzer()
+        self.version = f"vader-{dist_version('vaderSentiment')}"
+
+    def score(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(
+            [self.analyzer.polarity_scores(t)["compound"] if _is_text(t) else np.nan for t in texts],
+            dtype=np.float64,
+        )
+
+
+class TextBlobScorer:
+    name = "textblob"
+
+    def __init__(self):
+        from textblob import TextBlob
+        self.blob = TextBlob
+        self.version = f"textblob-{dist_version('textblob')}"
+
+    def score(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(
+            [self.blob(t).sentiment.polarity if _is_text(t) else np.nan for t in texts],
+            dtype=np.float64,
+        )
+
+
+class BertweetPTScorer:
+    name = "bertweet-pt"
+
+    def __init__(self, model_name: str = PT_MODEL, batch_size: int = BATCH_SIZE,
+                 threads: Optional[int] = None, quantize: bool = False):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.batch_size = max(1, batch_size)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.name = "bertweet-pt-int8"
+        self.version = f"{model_name}-{'int8' if quantize else 'fp32'}-transformers-{dist_version('transformers')}"
+        self.model = model
+        self.max_length = min(self.tokenizer.model_max_length, MAX_TOKENS)
+        labels = {int(i): str(label).upper() for i, label in model.config.id2label.items()}
+        self.pos = [i for i, label in labels.items() if "POS" in label]
+        self.neg = [i for i, label in labels.items() if "NEG" in label]
+
+    def score(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.full(len(texts), np.nan)
+        idx = np.asarray([i for i, t in enumerate(texts) if _is_text(t) and t.strip()], dtype=np.int64)
+        if not len(idx):
+            return out
+        enc = self.tokenizer([texts[i] for i in idx], truncation=True, max_length=self.max_length)
+        input_ids, attention = enc["input_ids"], enc["attention_mask"]
+        # Similar lengths share a batch, so padding stays close to the real text length
+        order = np.argsort([len(ids) for ids in input_ids], kind="stable")
+        with self.torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                padded = self.tokenizer.pad(
+                    {"input_ids": [input_ids[j] for j in batch], "attention_mask": [attention[j] for j in batch]},
+                    return_tensors="pt",
+                )
+                probs = self.model(**padded).logits.softmax(dim=-1)
+                compound = probs[:, self.pos].sum(dim=-1) - probs[:, self.neg].sum(dim=-1)
+                out[idx[batch]] = compound.numpy()
+        return out
+
+
+def load_scorers(batch_size: int = BATCH_SIZE, threads: Optional[int] = None, quantize: bool = False) -> dict:
+    """{lang: scorer} with the notebook's fallbacks; languages without a scorer are left out."""
+    scorers = {}
+    try:
+        scorers["en"] = VaderScorer()
+    except Exception:
+        pass
+    try:
+        scorers["pt"] = BertweetPTScorer(batch_size=batch_size, threads=threads, quantize=quantize)
+    except Exception:
+        try:
+            scorers["pt"] = TextBlobScorer()
+        except ImportError:
+            pass
+    return scorers
+
+
+def score_frame(df: pd.DataFrame, scorers: dict, text_col: str = "review_text_clean",
+                cache=None) -> pd.DataFrame:
+    """Fill df["sentiment_compound"] per language; rows without a scorer stay NaN.
+
+    With an NLPCache only texts without a result for the scorer's version are scored.
+    """
+    df["sentiment_compound"] = np.nan
+    for lang, scorer in scorers.items():
+        mask = df["lang"].eq(lang)
+        if not mask.any():
+            continue
+        texts = df.loc[mask, text_col].tolist()
+        if cache is None:
+            scores = scorer.score(texts)
+        else:
+            keys = [text_key(t, lang) for t in texts]
+            scores = cache.get_or_compute(
+                "sentiment", scorer.version, keys, lambda todo: scorer.score([texts[i] for i in todo]).tolist()
+            )
+        df.loc[mask, "sentiment_compound"] = scores
+    return df
+
+
+# ---------- Benchmark ----------
+def pipeline_scores(texts: Sequence[str]) -> np.ndarray:
+    """Per-text transformers pipeline, as the notebook ran it (for comparison)."""
+    from transformers import pipeline
+
+    pt_pipeline = pipeline("text-classification", model=PT_MODEL, truncation=True)
+    out = np.full(len(texts), np.nan)
+    for i, text in enumerate(texts):
+        if not _is_text(text) or not text.strip():
+            continue
+        scores = {}
+        for item in pt_pipeline(text, top_k=None):
+            label = str(item.get("label", "")).upper()
+            for key in ("POS", "NEG"):
+                if key in label:
+                    scores[key] = float(item.get("score", 0.0))
+        out[i] = scores.get("POS", 0.0) - scores.get("NEG", 0.0)
+    return out
+
+
+def timed_scores(fn, texts: list) -> tuple:
+    t0 = time.perf_counter()
+    scores = fn(texts)
+    return scores, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sentiment scorers on enriched reviews")
+    parser.add_argument("--sample", type=int, default=1000, help="Reviews per language (default: 1000)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Transformer batch size (default: {BATCH_SIZE})")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch's)")
+    parser.add_argument("--quantize", action="store_true", help="Dynamic int8 quantization of the PT model")
+    parser.add_argument("--compare-pipeline", action="store_true",
+                        help="Also run the per-text pipeline on the PT sample and report the score difference")
+    args = parser.parse_args()
+
+    if not ENRICHED_CSV.exists():
+        print(f"Missing enriched reviews CSV: {ENRICHED_CSV}")
+        return
+    df = pd.read_csv(ENRICHED_CSV, usecols=["lang", "review_text_clean"], low_memory=False)
+    scorers = load_scorers(args.batch_size, args.threads, args.quantize)
+    if not scorers:
+        print("No sentiment scorer available (install vaderSentiment and transformers/torch or textblob)")
+        return
+
+    print(f"{'lang':<5} {'scorer':<18} {'texts':>7} {'seconds':>9} {'texts/s':>9}")
+    for lang, scorer in scorers.items():
+        texts = df.loc[df["lang"].eq(lang), "review_text_clean"].head(args.sample).tolist()
+        scores, secs = timed_scores(scorer.score, texts)
+        print(f"{lang:<5} {scorer.name:<18} {len(texts):>7,} {secs:>9.2f} {len(texts) / max(secs, 1e-9):>9,.1f}")
+        if lang == "pt" and args.compare_pipeline:
+            ref, ref_secs = timed_scores(pipeline_scores, texts)
+            print(f"{lang:<5} {'pipeline (1 text)':<18} {len(texts):>7,} {ref_secs:>9.2f} "
+                  f"{len(texts) / max(ref_secs, 1e-9):>9,.1f}")
+            diff = np.nanmax(np.abs(scores - ref)) if np.isfinite(ref).any() else float("nan")
+            print(f"  max |batched - pipeline| = {diff:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Lightweight tracing: wall time, CPU time and RSS delta per named span.
+
+    tracer = Tracer().activate()          # spans of this thread/context go here
+    with span("load reviews"):
+        ...
+
+    @traced("train lda")
+    def train_lda(...): ...
+
+span() and traced() record into the active tracer and cost nothing when
+none is active, so library functions can be decorated unconditionally.
+Spans nest; flat scripts (the Streamlit app) can use Tracer.stage() to open
+one top-level span after another without re-indenting their code. CPU time
+is process time (all threads of this process, not child processes); memory
+is the change in resident set size, read from /proc (None elsewhere).
+chrome_trace() exports spans in the Trace Event format for chrome://tracing
+or Perfetto.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from artifact_store import atomic_write
+
+PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2 ** 20 if hasattr(os, "sysconf") else None
+
+_active: contextvars.ContextVar = contextvars.ContextVar("tracer", default=None)
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_MB
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+        self.created = time.perf_counter()
+        self._depth = 0
+        self._stage = None
+        self._token = None
+
+    # ---------- Activation ----------
+    def activate(self) -> "Tracer":
+        """Make this the tracer span()/traced() record into, for the current thread/context."""
+        _active.set(self)
+        return self
+
+    def __enter__(self) -> "Tracer":
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.end_stage()
+        _active.reset(self._token)
+
+    # ---------- Spans ----------
+    @contextmanager
+    def span(self, name: str, **args):
+        depth = self._depth
+        self._depth += 1
+        rss0 = rss_mb()
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - t0
+            cpu = time.process_time() - cpu0
+            rss1 = rss_mb()
+            self._depth = depth
+            self.spans.append({
+                "name": name,
+                "args": args,
+                "start": t0,
+                "wall": wall,
+                "cpu": cpu,
+                "rss_delta_mb": None if rss0 is None or rss1 is None else rss1 - rss0,
+                "depth": depth,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            })
+
+    def stage(self, name: str, **args):
+        """End the current stage (if any) and start `name` as the next top-level span."""
+        self.end_stage()
+        self._stage = self.span(name, **args)
+        self._stage.__enter__()
+
+    def end_stage(self):
+        if self._stage is not None:
+            stage, self._stage = self._stage, None
+            stage.__exit__(None, None, None)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.created
+
+    def ordered(self) -> list:
+        """Spans in start order (parents before their children)."""
+        return sorted(self.spans, key=lambda s: (s["start"], s["depth"]))
+
+    def summary(self) -> list:
+        """Per span name: calls and total wall/CPU seconds and RSS delta, in first-start order."""
+        rows = {}
+        for s in self.ordered():
+            row = rows.setdefault(s["name"], {"span": s["name"], "depth": s["depth"], "calls": 0,
+                                              "wall_s": 0.0, "cpu_s": 0.0, "rss_delta_mb": None})
+            row["calls"] += 1
+            row["wall_s"] += s["wall"]
+            row["cpu_s"] += s["cpu"]
+            if s["rss_delta_mb"] is not None:
+                row["rss_delta_mb"] = (row["rss_delta_mb"] or 0.0) + s["rss_delta_mb"]
+        return list(rows.values())
+
+
+# ---------- Module-level helpers ----------
+def current() -> Optional[Tracer]:
+    return _active.get()
+
+
+@contextmanager
+def span(name: str, **args):
+    """Record a span in the active tracer; a no-op when there is none."""
+    tracer = _active.get()
+    if tracer is None:
+        yield
+        return
+    with tracer.span(name, **args):
+        yield
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording every call of a function as a span (default name: the function's)."""
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def collect_spans(fn):
+    """Decorator for task functions returning a dict, which may run in a worker process.
+
+    Each call records into its own Tracer, as one span named after the
+    function (scalar keyword arguments as span args), and returns its spans
+    under "spans" for the parent to merge.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        labels = {k: v for k, v in kwargs.items() if isinstance(v, (str, int, float, bool))}
+        with Tracer() as tracer:
+            with tracer.span(fn.__name__, **labels):
+                result = fn(*args, **kwargs)
+        result["spans"] = tracer.spans
+        return result
+    return wrapper
+
+
+def format_summary(tracer: Tracer) -> list:
+    """Text lines of Tracer.summary(), nested spans indented."""
+    lines = [f"{'span':<28} {'calls':>5} {'wall s':>9} {'cpu s':>9} {'RSS MB':>9}"]
+    for row in tracer.summary():
+        label = "  " * row["depth"] + row["span"]
+        rss = "n/a" if row["rss_delta_mb"] is None else f"{row['rss_delta_mb']:+.1f}"
+        lines.append(f"{label:<28} {row['calls']:>5} {row['wall_s']:>9.3f} {row['cpu_s']:>9.3f} {rss:>9}")
+    return lines
+
+
+# ---------- Chrome trace export ----------
+def _json_value(value):
+    return value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+
+
+def chrome_trace(spans: list) -> dict:
+    """Trace Event format ("X" complete events, microseconds from the earliest span)."""
+    origin = min((s["start"] for s in spans), default=0.0)
+    events = []
+    for s in spans:
+        args = {k: _json_value(v) for k, v in s["args"].items()}
+        args["cpu_ms"] = round(s["cpu"] * 1000, 3)
+        if s["rss_delta_mb"] is not None:
+            args["rss_delta_mb"] = round(s["rss_delta_mb"], 2)
+        events.append({
+            "name": s["name"],
+            "cat": "span",
+            "ph": "X",
+            "ts": round((s["start"] - origin) * 1e6, 1),
+            "dur": round(s["wall"] * 1e6, 1),
+            "pid": s["pid"],
+            "tid": s["tid"],
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path: Path, spans: list) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return atomic_write(path, lambda p: p.write_text(json.dumps(chrome_trace(spans))))